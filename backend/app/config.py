@@ -6,6 +6,18 @@ class Settings(BaseSettings):
     # Database
     # Default to SQLite if DATABASE_URL is not set in .env
     DATABASE_URL: str = "sqlite:///./farmer_app.db"
+    READ_DATABASE_URL: Optional[str] = None  # read replica for the GET-heavy routes
+    READ_YOUR_WRITES_SECONDS: float = 5.0  # after a write, the same user reads from the primary this long
+    SCHEMA_CHECK_ENABLED: bool = True  # refuse to start unless the database is at the latest migration
+    # SQLite tuning ("production" = WAL + the pragmas below, "default" = SQLite's own defaults)
+    SQLITE_PROFILE: str = "production"
+    SQLITE_CACHE_SIZE_KB: int = 65536  # page cache per connection
+    SQLITE_MMAP_SIZE: int = 268435456  # bytes of the database file to memory-map
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000  # wait this long for a lock before "database is locked"
+    SQLITE_POOL_SIZE: int = 8
+    SQLITE_WRITE_QUEUE: bool = False  # funnel the busiest write endpoints through one group-committing writer
+    SQLITE_WRITE_BATCH_MAX: int = 64  # most requests committed together
+    SQLITE_WRITE_LINGER_MS: float = 0  # wait this long for more writes before committing a batch
     
     # JWT Security - Use environment variables with secure defaults
     JWT_SECRET: str = secrets.token_urlsafe(32)  # Generate secure secret if not provided
@@ -25,6 +37,56 @@ class Settings(BaseSettings):
     
     # External APIs
     WEATHER_API_KEY: Optional[str] = None
+    OPENWEATHER_BASE_URL: str = "https://api.openweathermap.org"
+    UPSTREAM_HTTP2: bool = True  # use HTTP/2 when the h2 package is installed
+    UPSTREAM_MAX_CONNECTIONS: int = 20  # per worker, across all upstream hosts
+    UPSTREAM_MAX_KEEPALIVE: int = 10  # idle connections kept open for reuse
+    UPSTREAM_KEEPALIVE_EXPIRY: float = 30.0  # seconds an idle connection is kept
+    UPSTREAM_CONNECT_TIMEOUT: float = 3.0
+    UPSTREAM_READ_TIMEOUT: float = 10.0
+    UPSTREAM_POOL_TIMEOUT: float = 5.0  # seconds to wait for a free connection when all are busy
+    WEATHER_CACHE_ENABLED: bool = True
+    WEATHER_CACHE_GRID: float = 0.05  # degrees; coordinates in one cell share a cache entry (0 = exact)
+    WEATHER_CACHE_TTL_CURRENT: float = 600.0
+    WEATHER_CACHE_TTL_FORECAST: float = 1800.0
+    WEATHER_CACHE_TTL_GEOCODE: float = 30 * 24 * 3600.0  # place names don't move
+    WEATHER_CACHE_MAX_STALE: float = 3600.0  # seconds past its TTL an entry is still served while it refreshes
+    WEATHER_CACHE_MAX_ENTRIES: int = 10000
+    WEATHER_FIELDS_CONCURRENCY: int = 8  # upstream calls in flight for one /weather/fields request or pre-warm run
+    WEATHER_PREWARM_ENABLED: bool = True
+    WEATHER_PREWARM_INTERVAL: float = 600.0  # seconds between runs; keep it below WEATHER_CACHE_TTL_FORECAST
+    WEATHER_DEADLINE_SECONDS: float = 4.0  # a weather request answers within this, with the last good response if need be
+    WEATHER_BREAKER_FAILURE_RATE: float = 0.5  # open once this share of recent upstream calls failed or were slow...
+    WEATHER_BREAKER_MIN_CALLS: int = 5  # ...out of at least this many...
+    WEATHER_BREAKER_WINDOW: float = 60.0  # ...in the last this many seconds
+    WEATHER_BREAKER_SLOW_SECONDS: float = 4.0  # an upstream call taking longer counts as failed
+    WEATHER_BREAKER_OPEN_SECONDS: float = 30.0  # refuse upstream calls this long before probing
+    WEATHER_BREAKER_HALF_OPEN_CALLS: int = 2  # probe calls that must succeed to close again
+    GEOCODE_RETRY_SECONDS: float = 7 * 24 * 3600.0  # look a location the geocoder didn't know up again after this
+    
+    # Admin / monitoring endpoints are disabled unless a token is configured
+    ADMIN_TOKEN: Optional[str] = None
+    
+    # Event-loop / threadpool monitor
+    LOOP_MONITOR_ENABLED: bool = True
+    LOOP_MONITOR_INTERVAL: float = 0.5  # seconds between lag samples
+    LOOP_STALL_THRESHOLD_MS: int = 250  # report the blocking route past this lag
+    
+    # Per-request SQL statement counting
+    SERVER_TIMING_ENABLED: bool = True  # send db/app timings in a Server-Timing header
+    QUERY_COUNT_WARN_THRESHOLD: int = 25  # log requests issuing at least this many statements
+    METRICS_ENABLED: bool = True
+    METRICS_TOKEN: Optional[str] = None  # require "Authorization: Bearer <token>" on /metrics
+    METRICS_MULTIPROC_DIR: Optional[str] = None  # shared directory for aggregating across workers
+    METRICS_FLUSH_INTERVAL: float = 5.0  # seconds between per-worker flushes
+    
+    # Live change notifications (/events)
+    EVENTS_ENABLED: bool = True
+    EVENTS_BROKER_URL: Optional[str] = None  # tcp://host:port of the shared broker; unset = this worker's streams only
+    EVENTS_HEARTBEAT_SECONDS: float = 15.0  # comment line on idle streams so proxies keep them open
+    EVENTS_MAX_STREAM_SECONDS: float = 900.0  # end a stream after this long; EventSource reconnects (and lets workers restart)
+    EVENTS_QUEUE_SIZE: int = 100  # undelivered events per stream before it is told to resync
+    EVENTS_MAX_CONNECTIONS: int = 10000  # open streams per worker; more get 503
     
     class Config:
         env_file = ".env"
@@ -1,12 +1,98 @@
-from sqlalchemy import create_engine
+import asyncio
+import contextvars
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Optional, TypeVar
+from fastapi import Depends
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from app.config import settings
+from app.utils.query_stats import instrument_engine
+from app.utils.metrics import instrument_pool, WRITE_QUEUE_BATCH_SIZE, WRITE_QUEUE_WAIT
+from app.utils.jwt import get_current_user
+from app.utils.security import verify_token
+
+logger = logging.getLogger("app.db")
+T = TypeVar("T")
+
+
+def get_async_database_url(url: str) -> str:
+    """Map a sync DATABASE_URL onto the matching async driver (aiosqlite / asyncpg)."""
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if url.startswith("postgres://"):
+        # Render/Heroku style URLs use the legacy "postgres" scheme
+        return url.replace("postgres://", "postgresql+asyncpg://", 1)
+    if url.startswith("postgresql://") or url.startswith("postgresql+psycopg2://"):
+        return "postgresql+asyncpg://" + url.split("://", 1)[1]
+    return url
+
+def sqlite_pragmas() -> list:
+    """Per-connection PRAGMAs for the configured SQLITE_PROFILE."""
+    if settings.SQLITE_PROFILE == "default":
+        return []
+    return [
+        # Readers no longer block behind the writer (or it behind them)
+        "PRAGMA journal_mode=WAL",
+        # Durable at checkpoints rather than every commit; safe with WAL
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KB}",
+        f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}",
+        f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+
+
+def apply_sqlite_profile(engine):
+    """Run the profile's PRAGMAs on every new connection of a (sync) Engine."""
+    pragmas = sqlite_pragmas()
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def sqlite_engine_options(url: str) -> dict:
+    """Pool settings for SQLite: one shared connection for :memory:, a bounded pool for files."""
+    if ":memory:" in url or url.rstrip("/").endswith(":"):
+        return {"poolclass": StaticPool}
+    # Connections are cheap to open but each carries its own page cache and mmap,
+    # so keep a fixed set warm instead of reopening per request.
+    return {"pool_size": settings.SQLITE_POOL_SIZE, "max_overflow": settings.SQLITE_POOL_SIZE}
+
+
+def make_async_engine(url: str):
+    """Async engine with the same pool/SQLite settings as the primary, for any DATABASE_URL-style URL."""
+    if "sqlite" in url:
+        async_engine = create_async_engine(get_async_database_url(url), **sqlite_engine_options(url))
+        apply_sqlite_profile(async_engine.sync_engine)
+        return async_engine
+    # PostgreSQL optimized settings
+    return create_async_engine(
+        get_async_database_url(url),
+        pool_size=10,
+        max_overflow=20,
+        pool_pre_ping=True
+    )
 
 # Create the SQLAlchemy engine
 if "sqlite" in settings.DATABASE_URL:
     connect_args = {"check_same_thread": False}
-    engine = create_engine(settings.DATABASE_URL, connect_args=connect_args)
+    engine = create_engine(settings.DATABASE_URL, connect_args=connect_args, **sqlite_engine_options(settings.DATABASE_URL))
+    apply_sqlite_profile(engine)
 else:
     # PostgreSQL optimized settings
     engine = create_engine(
@@ -15,10 +101,42 @@ else:
         max_overflow=20,
         pool_pre_ping=True
     )
+async_engine = make_async_engine(settings.DATABASE_URL)
+
+# Optional read replica for the GET-heavy routes (see get_read_db)
+read_async_engine = make_async_engine(settings.READ_DATABASE_URL) if settings.READ_DATABASE_URL else None
+
+# Count statements and DB time per request (Server-Timing header, /admin/queries)
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+
+# Pool checkouts / overflow in /metrics
+instrument_pool(engine, "sync")
+instrument_pool(async_engine.sync_engine, "async")
+
+if read_async_engine is not None:
+    instrument_engine(read_async_engine.sync_engine)
+    instrument_pool(read_async_engine.sync_engine, "read")
 
 # Create a session maker
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async sessions keep attributes loaded after commit so responses can be
+# serialised without triggering lazy loads outside the event loop.
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+ReadSessionLocal = async_sessionmaker(
+    bind=read_async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+) if read_async_engine is not None else None
+
 # Create the Base class for models
 Base = declarative_base()
 
@@ -29,3 +147,256 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Dependency to get an async database session (used by the async routers)
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+class RecentWriters:
+    """Users who changed something in the last ``window`` seconds (this worker only).
+
+    A replica lags the primary by a moment, so a user who just saved a
+    transportation and goes back to the list must not be served the old one.
+    Their reads go to the primary until the window has passed.
+    """
+
+    def __init__(self, window: float):
+        self.window = window
+        self._last_write = {}
+        self._lock = threading.Lock()
+
+    def mark(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            self._last_write[str(user_id)] = now
+            if len(self._last_write) > 10000:
+                # Drop users whose window closed long ago
+                self._last_write = {u: t for u, t in self._last_write.items() if now - t < self.window}
+
+    def wrote_recently(self, user_id) -> bool:
+        last = self._last_write.get(str(user_id))
+        return last is not None and time.monotonic() - last < self.window
+
+
+recent_writers = RecentWriters(settings.READ_YOUR_WRITES_SECONDS)
+
+_SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class ReadYourWritesMiddleware:
+    """Pure ASGI middleware marking the caller as a recent writer after a successful mutation."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in _SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_and_mark(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                user_id = _token_subject(scope)
+                if user_id is not None:
+                    # Marked before the client sees the response, so its next read can't race it
+                    recent_writers.mark(user_id)
+            await send(message)
+
+        await self.app(scope, receive, send_and_mark)
+
+
+def _token_subject(scope):
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer" or not token:
+                return None
+            try:
+                return verify_token(token).get("sub")
+            except ValueError:
+                return None
+    return None
+
+
+async def get_read_db(current_user: dict = Depends(get_current_user)):
+    """Session for read-only routes: the replica, or the primary if this user wrote recently."""
+    factory = ReadSessionLocal
+    if factory is None or recent_writers.wrote_recently(current_user["id"]):
+        factory = AsyncSessionLocal
+    async with factory() as db:
+        yield db
+
+
+class SQLiteWriteQueue:
+    """Serialise write transactions onto one connection and group-commit them.
+
+    SQLite allows a single writer at a time, so concurrent write requests on
+    pooled connections mostly wait on (or fail with) the database lock and pay
+    one fsync each. Instead, requests hand a ``fn(session)`` to the queue; a
+    writer thread takes everything queued, runs each job inside its own
+    SAVEPOINT - a failing job (404, validation) rolls back alone - and commits
+    the batch once.
+
+    Jobs run in a copy of the submitting request's context, so their
+    statements still show up in that request's Server-Timing counts.
+    """
+
+    def __init__(self, engine, max_batch: int = 64, linger: float = 0.0):
+        self.engine = engine
+        self.max_batch = max_batch
+        self.linger = linger
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        """Finish everything already queued, then stop the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    async def submit(self, fn: Callable[[Session], T]) -> T:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.start()
+        self._queue.put((fn, contextvars.copy_context(), loop, future, time.perf_counter()))
+        return await future
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            job = self._queue.get()
+            if job is None:
+                break
+            batch = [job]
+            deadline = time.perf_counter() + self.linger
+            while len(batch) < self.max_batch:
+                try:
+                    job = self._queue.get(timeout=max(0.0, deadline - time.perf_counter())) if self.linger else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    stopping = True
+                    break
+                batch.append(job)
+            self._commit_batch(batch)
+
+    def _commit_batch(self, batch):
+        started = time.perf_counter()
+        outcomes = []
+        try:
+            with Session(self.engine, autoflush=False, expire_on_commit=False) as session, session.begin():
+                for fn, context, _, _, queued_at in batch:
+                    WRITE_QUEUE_WAIT.observe(started - queued_at)
+                    try:
+                        with session.begin_nested():
+                            outcomes.append((True, context.run(fn, session)))
+                    except Exception as exc:
+                        outcomes.append((False, exc))
+        except Exception as exc:
+            logger.exception("Group commit of %d writes failed", len(batch))
+            outcomes = [(False, exc)] * len(batch)
+        WRITE_QUEUE_BATCH_SIZE.observe(len(batch))
+
+        for (_, _, loop, future, _), (ok, value) in zip(batch, outcomes):
+            loop.call_soon_threadsafe(_resolve_future, future, ok, value)
+
+
+def _resolve_future(future, ok, value):
+    if future.cancelled():
+        # Client went away; the write itself is already committed
+        return
+    if ok:
+        future.set_result(value)
+    else:
+        future.set_exception(value)
+
+
+def _begin_immediate(conn):
+    # Take the write lock up front so another process's writer can't make this
+    # transaction's first write fail with SQLITE_BUSY half way through a batch.
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+write_queue: Optional[SQLiteWriteQueue] = None
+if "sqlite" in settings.DATABASE_URL and settings.SQLITE_WRITE_QUEUE:
+    # pysqlite's own implicit BEGIN is disabled so the "begin" hook controls the transaction
+    writer_engine = create_engine(
+        settings.DATABASE_URL,
+        connect_args={"check_same_thread": False, "isolation_level": None},
+        pool_size=1,
+        max_overflow=0,
+    )
+    apply_sqlite_profile(writer_engine)
+    instrument_engine(writer_engine)
+    event.listen(writer_engine, "begin", _begin_immediate)
+    write_queue = SQLiteWriteQueue(
+        writer_engine,
+        max_batch=settings.SQLITE_WRITE_BATCH_MAX,
+        linger=settings.SQLITE_WRITE_LINGER_MS / 1000,
+    )
+
+
+_sqlite_write_lock = asyncio.Lock()
+SQLITE_BEGIN_ATTEMPTS = 3  # each waits up to SQLITE_BUSY_TIMEOUT_MS for the write lock
+
+
+def _write_immediately(fn: Callable[[Session], T]) -> Callable[[Session], T]:
+    """Wrap ``fn`` so that, on SQLite, its transaction takes the write lock before ``fn`` reads anything."""
+    def write(session: Session) -> T:
+        connection = session.connection()
+        # A deferred transaction that reads and then writes can't wait for the lock: when
+        # another connection committed in between, SQLite fails the upgrade with
+        # SQLITE_BUSY straight away instead of honouring busy_timeout.
+        if connection.dialect.name == "sqlite" and not connection.connection.driver_connection.in_transaction:
+            for attempt in range(1, SQLITE_BEGIN_ATTEMPTS + 1):
+                try:
+                    connection.exec_driver_sql("BEGIN IMMEDIATE")
+                    break
+                except OperationalError as exc:
+                    # Nothing has run yet, so waiting another busy_timeout is safe
+                    if "locked" not in str(exc.orig) or attempt == SQLITE_BEGIN_ATTEMPTS:
+                        raise
+                    logger.warning("Waited busy_timeout for the SQLite write lock (attempt %d)", attempt)
+        return fn(session)
+    return write
+
+
+async def run_write(db: AsyncSession, fn: Callable[[Session], T]) -> T:
+    """Run ``fn(session)`` as one write transaction and return its result.
+
+    With SQLITE_WRITE_QUEUE enabled the work goes to the writer thread and is
+    group-committed with other requests' writes; otherwise it runs on the
+    request's own session and commits straight away, on SQLite in a
+    ``BEGIN IMMEDIATE`` transaction. ``fn`` should flush and refresh whatever it
+    returns - the caller gets detached, fully loaded objects.
+    """
+    if write_queue is not None:
+        return await write_queue.submit(fn)
+    if db.bind.dialect.name != "sqlite":
+        return await _run_and_commit(db, fn)
+    # SQLite takes one writer at a time anyway. Queue this worker's writers in
+    # order here, so only one per process polls for the database lock; with all
+    # of them polling, some lose every retry until busy_timeout runs out.
+    async with _sqlite_write_lock:
+        return await _run_and_commit(db, _write_immediately(fn))
+
+
+async def _run_and_commit(db: AsyncSession, fn: Callable[[Session], T]) -> T:
+    try:
+        result = await db.run_sync(fn)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    return result
@@ -1,27 +1,65 @@
-from fastapi import FastAPI
+import asyncio
+import secrets
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI, Header, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes import auth, field, money, dashboard, yield_routes, borrowing, lot_numbers, labour, transportation, weather
-from app.db import Base, engine
+from starlette.datastructures import MutableHeaders
+from app.routes import auth, field, money, dashboard, yield_routes, borrowing, lot_numbers, labour, transportation, weather, admin, events
+from app.db import async_engine, read_async_engine, write_queue, ReadYourWritesMiddleware
 from app.models import user, field as field_model, lot_number, labour as labour_model
 from app.config import settings
-from sqlalchemy import text
+from app.utils.loop_monitor import loop_monitor, RequestTrackingMiddleware
+from app.utils.query_stats import QueryStatsMiddleware
+from app.utils import metrics
+from app.utils.schema_version import check_schema_version
+from app.utils.events import hub as event_hub
+from app.utils.http_client import start_http_client, close_http_client
 
-# Initialize the database
-Base.metadata.create_all(bind=engine)
-
-# Run migrations only if using SQLite
-if "sqlite" in settings.DATABASE_URL:
-    migrate_lot_numbers_table()
-    migrate_labour_tables()
-else:
-    print("ℹ️ Skipping manual migrations for non-SQLite database. Schema will be handled by SQLAlchemy.")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schema changes are applied out of band (`alembic upgrade head`); just make sure they were
+    if settings.SCHEMA_CHECK_ENABLED:
+        await check_schema_version(async_engine)
+    if settings.LOOP_MONITOR_ENABLED:
+        await loop_monitor.start()
+    if write_queue is not None:
+        write_queue.start()
+    if settings.EVENTS_ENABLED:
+        await event_hub.start()
+    await start_http_client()
+    prewarm = None
+    if settings.WEATHER_API_KEY and settings.WEATHER_CACHE_ENABLED and settings.WEATHER_PREWARM_ENABLED:
+        prewarm = asyncio.create_task(weather.run_prewarm(settings.WEATHER_PREWARM_INTERVAL))
+    flusher = None
+    if settings.METRICS_ENABLED and settings.METRICS_MULTIPROC_DIR:
+        # Drop files left by workers of an earlier run (or that crashed) before ours joins them
+        await asyncio.to_thread(metrics.registry.prune, settings.METRICS_MULTIPROC_DIR)
+        flusher = asyncio.create_task(metrics.run_flusher(settings.METRICS_MULTIPROC_DIR, settings.METRICS_FLUSH_INTERVAL))
+    yield
+    if flusher is not None:
+        flusher.cancel()
+        # This worker's samples leave the merged totals with it
+        metrics.registry.remove(settings.METRICS_MULTIPROC_DIR)
+    await loop_monitor.stop()
+    await event_hub.stop()
+    if prewarm is not None:
+        prewarm.cancel()
+    await close_http_client()
+    if write_queue is not None:
+        # Commit whatever is still queued before the worker exits
+        await asyncio.to_thread(write_queue.stop)
+    await async_engine.dispose()
+    if read_async_engine is not None:
+        await read_async_engine.dispose()
 
 app = FastAPI(
     title="FarmManager API",
     description="Secure Farm Management System API",
     version="2.0.0",
     docs_url="/docs",
-    redoc_url="/redoc" 
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Health check endpoint
@@ -29,24 +67,53 @@ app = FastAPI(
 def health_check():
     return {"status": "healthy", "message": "Backend is running"}
 
-# Security headers middleware
-@app.middleware("http")
-async def add_security_headers(request, call_next):
-    response = await call_next(request)
-    response.headers["X-Content-Type-Options"] = "nosniff"
-    response.headers["X-Frame-Options"] = "DENY"
-    response.headers["X-XSS-Protection"] = "1; mode=block"
-    response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-    response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-    response.headers["Content-Security-Policy"] = (
-    "default-src 'self'; "
-    "script-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; "
-    "style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; "
-    "img-src 'self' data:; "
-    "font-src 'self' https://cdn.jsdelivr.net"
-)
+# Prometheus scrape endpoint
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    def get_metrics(authorization: Optional[str] = Header(None)):
+        if settings.METRICS_TOKEN and not secrets.compare_digest(authorization or "", f"Bearer {settings.METRICS_TOKEN}"):
+            raise HTTPException(status_code=401, detail="Invalid metrics token")
+        return Response(
+            content=metrics.registry.render(settings.METRICS_MULTIPROC_DIR),
+            media_type="text/plain; version=0.0.4; charset=utf-8"
+        )
+
+# Security headers middleware (pure ASGI, so long-lived /events streams don't
+# pay for BaseHTTPMiddleware's per-message task hand-off)
+SECURITY_HEADERS = {
+    "X-Content-Type-Options": "nosniff",
+    "X-Frame-Options": "DENY",
+    "X-XSS-Protection": "1; mode=block",
+    "Strict-Transport-Security": "max-age=31536000; includeSubDomains",
+    "Referrer-Policy": "strict-origin-when-cross-origin",
+    "Content-Security-Policy": (
+        "default-src 'self'; "
+        "script-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; "
+        "style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net; "
+        "img-src 'self' data:; "
+        "font-src 'self' https://cdn.jsdelivr.net"
+    ),
+}
+
+class SecurityHeadersMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-    return response
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                for name, value in SECURITY_HEADERS.items():
+                    headers[name] = value
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+app.add_middleware(SecurityHeadersMiddleware)
 
 # CORS Middleware - More secure configuration
 allowed_origins = []
@@ -67,8 +134,24 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["Authorization", "Content-Type"],  # More restrictive
+    expose_headers=["Server-Timing", "Age", "X-Weather-Stale"],
 )
 
+# Count SQL statements per request and report them in a Server-Timing header
+app.add_middleware(QueryStatsMiddleware)
+
+# Request counts, status codes and latency per route for /metrics
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+# Send a user's reads to the primary for a few seconds after they write (replica lag)
+if read_async_engine is not None:
+    app.add_middleware(ReadYourWritesMiddleware)
+
+# Track in-flight requests so loop stalls can be attributed to a route
+if settings.LOOP_MONITOR_ENABLED:
+    app.add_middleware(RequestTrackingMiddleware, monitor=loop_monitor)
+
 # Include routes
 app.include_router(auth.router, prefix="/auth")
 app.include_router(field.router, prefix="/fields")
@@ -80,6 +163,9 @@ app.include_router(labour.router, prefix="/labour")
 app.include_router(dashboard.router, prefix="/dashboard")
 app.include_router(transportation.router, prefix="/transportations")
 app.include_router(weather.router, prefix="/weather")
+app.include_router(admin.router, prefix="/admin")
+if settings.EVENTS_ENABLED:
+    app.include_router(events.router, prefix="/events")
 
 print(f"FarmManager API started with security level: {'PRODUCTION' if settings.ALLOWED_ORIGINS else 'DEVELOPMENT'}")
 print(f"Allowed origins: {allowed_origins}")
@@ -5,8 +5,10 @@ from app.models.yield_model import Yield
 from app.models.labour import LabourGroup, Labourer, Payment, Task, LabourAttendance, GroupWork
 from app.models.money import MoneyRecord
 from app.models.borrowing import Borrowing
-from app.models.lot_number import LotNumber
+from app.models.lot_number import LotNumber, LotField, LotMovement
 from app.models.transportation import Transportation
+from app.models.rollup import UserRollup, FieldMonthStat
+from app.models.geocode import GeocodeResult
 
 # Make models available when importing from app.models
 __all__ = [
@@ -22,5 +24,10 @@ __all__ = [
     'MoneyRecord',
     'Borrowing',
     'LotNumber',
-    'Transportation'
+    'LotField',
+    'LotMovement',
+    'Transportation',
+    'UserRollup',
+    'FieldMonthStat',
+    'GeocodeResult'
 ]
@@ -8,11 +8,16 @@ class Field(Base):
     id = Column(Integer, primary_key=True, index=True)
     field_name = Column(String, nullable=False)
     location = Column(String, nullable=True)
+    # Entered by hand, or looked up from ``location`` (see app/utils/geocoding.py)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    # The location text the coordinates were geocoded from; NULL when entered by hand
+    geocoded_location = Column(String, nullable=True)
     area = Column(Float, nullable=False)
     potato_type = Column(String, nullable=True)
     season = Column(String, nullable=True)
     year = Column(Integer, nullable=False)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
 
     # Relationships
     user = relationship("User", back_populates="fields")
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, Float, DateTime
+from sqlalchemy.sql import func
+from app.db import Base
+
+class GeocodeResult(Base):
+    """A forward-geocoding answer for one place name, shared by every field (and user) with that location.
+
+    Keyed by the normalised location text. Latitude and longitude are NULL when
+    the geocoder found nothing; that is retried after GEOCODE_RETRY_SECONDS.
+    """
+    __tablename__ = "geocode_results"
+
+    query = Column(String, primary_key=True)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    name = Column(String, nullable=True)
+    country = Column(String, nullable=True)
+    fetched_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Float, Date, DateTime, Text, UniqueConstraint
+from sqlalchemy import Column, Integer, String, ForeignKey, Float, Date, DateTime, Text, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db import Base
@@ -8,7 +8,7 @@ class LabourGroup(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     group_name = Column(String, nullable=False)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationships
@@ -24,7 +24,7 @@ class Labourer(Base):
     village = Column(String, nullable=False)
     phone = Column(String, nullable=True)
     daily_wage = Column(Float, nullable=False)
-    group_id = Column(Integer, ForeignKey("labour_groups.id"))
+    group_id = Column(Integer, ForeignKey("labour_groups.id"), index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -36,9 +36,12 @@ class Labourer(Base):
 
 class Payment(Base):
     __tablename__ = "labour_payments"
+    __table_args__ = (
+        Index("ix_labour_payments_user_id_payment_date", "user_id", "payment_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    labourer_id = Column(Integer, ForeignKey("labourers.id"), nullable=False)
+    labourer_id = Column(Integer, ForeignKey("labourers.id"), nullable=False, index=True)
     amount = Column(Float, nullable=False)
     payment_date = Column(Date, nullable=False)
     working_days = Column(Integer, nullable=False)
@@ -56,10 +59,12 @@ class LabourAttendance(Base):
     __tablename__ = "labour_attendance"
     __table_args__ = (
         UniqueConstraint("user_id", "labourer_id", "attendance_date", name="uq_labour_attendance"),
+        # The unique constraint leads with labourer_id after user_id, so it can't serve date ranges
+        Index("ix_labour_attendance_user_id_attendance_date", "user_id", "attendance_date"),
     )
 
     id = Column(Integer, primary_key=True, index=True)
-    labourer_id = Column(Integer, ForeignKey("labourers.id"), nullable=False)
+    labourer_id = Column(Integer, ForeignKey("labourers.id"), nullable=False, index=True)
     attendance_date = Column(Date, nullable=False)
     status = Column(String, nullable=False)  # full, half, absent
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -75,9 +80,9 @@ class Task(Base):
     id = Column(Integer, primary_key=True, index=True)
     task_name = Column(String, nullable=False)
     field_id = Column(Integer, ForeignKey("fields.id"))
-    group_id = Column(Integer, ForeignKey("labour_groups.id"))
-    start_date = Column(String, nullable=False)
-    end_date = Column(String, nullable=False)
+    group_id = Column(Integer, ForeignKey("labour_groups.id"), index=True)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)
     payment_type = Column(String, nullable=False)  # daily or per_task
     rate = Column(Float, nullable=False)
 
@@ -87,6 +92,9 @@ class Task(Base):
 
 class GroupWork(Base):
     __tablename__ = "group_work"
+    __table_args__ = (
+        Index("ix_group_work_group_id_work_date", "group_id", "work_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     group_id = Column(Integer, ForeignKey("labour_groups.id"), nullable=False)
@@ -1,13 +1,18 @@
-from sqlalchemy import Column, Integer, String, Date, Text, DateTime, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Date, Text, DateTime, Float, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db import Base
 
 class LotNumber(Base):
     __tablename__ = "lot_numbers"
+    __table_args__ = (
+        # Lot lookups are always "this user's lot X"; unique so transportations can upsert their lot
+        Index("uq_lot_numbers_user_id_lot_number", "user_id", "lot_number", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     lot_number = Column(String(50), index=True, nullable=False)
+    # Display label: the lot's field names, comma-separated. Lookups by field go through LotField.
     field_name = Column(String(100), nullable=False)
     small_packets = Column(Integer, default=0)
     medium_packets = Column(Integer, default=0)
@@ -30,3 +35,62 @@ class LotNumber(Base):
 
     def __repr__(self):
         return f"<LotNumber(id={self.id}, lot_number='{self.lot_number}', field='{self.field_name}', total_packets={self.total_packets}, user_id={self.user_id})>"
+
+class LotField(Base):
+    """A field that packets in a lot came from, with how many it contributed per grade.
+
+    Linked when a transportation from the field first goes into the lot, or when
+    a hand-entered lot names the field. The counts are the field's transported
+    packets in the lot, kept in step by the transportation routes (see
+    app/utils/lot_fields.py); packets added by hand belong to no field.
+    """
+    __tablename__ = "lot_fields"
+    __table_args__ = (
+        # "Which lots hold packets from this field"
+        Index("ix_lot_fields_field_id", "field_id"),
+    )
+
+    lot_id = Column(Integer, ForeignKey("lot_numbers.id", ondelete="CASCADE"), primary_key=True)
+    field_id = Column(Integer, ForeignKey("fields.id", ondelete="CASCADE"), primary_key=True)
+    small_packets = Column(Integer, nullable=False, default=0)
+    medium_packets = Column(Integer, nullable=False, default=0)
+    large_packets = Column(Integer, nullable=False, default=0)
+    xlarge_packets = Column(Integer, nullable=False, default=0)
+
+    @property
+    def total_packets(self):
+        return self.small_packets + self.medium_packets + self.large_packets + self.xlarge_packets
+
+class LotMovement(Base):
+    """One change to a lot's packet counts, per grade, in an append-only journal.
+
+    Rows are only ever inserted: transportations created, edited, moved to
+    another lot or deleted, packets added by hand, and lot edits each add one
+    (see app/utils/lot_movements.py). Summed over a lot they give its current
+    counts. ``transportation_id`` is kept after the transportation is deleted.
+    """
+    __tablename__ = "lot_movements"
+    __table_args__ = (
+        # A lot's history is read newest first, a page at a time
+        Index("ix_lot_movements_lot_id_id", "lot_id", "id"),
+        # Covers lot reconciliation's per-lot (and per-kind) totals, so it never reads the table
+        Index("ix_lot_movements_lot_id_kind", "lot_id", "kind", "small_packets", "medium_packets", "large_packets",
+              "xlarge_packets"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    lot_id = Column(Integer, ForeignKey("lot_numbers.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    kind = Column(String(20), nullable=False)
+    field_id = Column(Integer, ForeignKey("fields.id", ondelete="SET NULL"), nullable=True)
+    transportation_id = Column(Integer, nullable=True)
+    small_packets = Column(Integer, nullable=False, default=0)
+    medium_packets = Column(Integer, nullable=False, default=0)
+    large_packets = Column(Integer, nullable=False, default=0)
+    xlarge_packets = Column(Integer, nullable=False, default=0)
+    note = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    @property
+    def total_packets(self):
+        return self.small_packets + self.medium_packets + self.large_packets + self.xlarge_packets
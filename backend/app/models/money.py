@@ -1,14 +1,17 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.db import Base
 
 class MoneyRecord(Base):
     __tablename__ = "money_records"
+    __table_args__ = (
+        Index("ix_money_records_user_id_payment_date", "user_id", "payment_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     paid_to = Column(String, nullable=False)
     amount = Column(Float, nullable=False)
-    payment_date = Column(String, nullable=False)
+    payment_date = Column(Date, nullable=False)
     payment_method = Column(String, nullable=False)  # cash, UPI, bank
     notes = Column(String, nullable=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
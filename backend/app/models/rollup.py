@@ -0,0 +1,47 @@
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.db import Base
+
+class UserRollup(Base):
+    """Running dashboard totals for one user, kept in step by the write routes.
+
+    Every route that changes a counted row applies the difference in the same
+    transaction (see app/utils/rollups.py), so /dashboard/ reads one row by
+    primary key instead of aggregating the base tables.
+    """
+    __tablename__ = "user_rollups"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    field_count = Column(Integer, nullable=False, default=0)
+    yield_large = Column(Float, nullable=False, default=0)
+    yield_medium = Column(Float, nullable=False, default=0)
+    yield_small = Column(Float, nullable=False, default=0)
+    yield_overlarge = Column(Float, nullable=False, default=0)
+    expenses = Column(Float, nullable=False, default=0)
+    labour_payments = Column(Float, nullable=False, default=0)
+    # Attendance-weighted wages: full day = daily_wage, half day = half of it
+    attendance_earnings = Column(Float, nullable=False, default=0)
+    transported_packets = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class FieldMonthStat(Base):
+    """One cell of the per-field stats cube: what a field produced and cost in a calendar month.
+
+    Maintained like ``UserRollup`` (see app/utils/field_stats.py). Area and
+    season are read from ``fields`` when the cube is queried, so editing a
+    field never touches its cells.
+    """
+    __tablename__ = "field_month_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    field_id = Column(Integer, ForeignKey("fields.id"), primary_key=True)
+    year = Column(Integer, primary_key=True)
+    month = Column(Integer, primary_key=True)
+    yield_large = Column(Float, nullable=False, default=0)
+    yield_medium = Column(Float, nullable=False, default=0)
+    yield_small = Column(Float, nullable=False, default=0)
+    yield_overlarge = Column(Float, nullable=False, default=0)
+    transported_packets = Column(Integer, nullable=False, default=0)
+    # Sum of task rates, booked in the month the task starts
+    task_labour_cost = Column(Float, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
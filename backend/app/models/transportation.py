@@ -1,10 +1,16 @@
-from sqlalchemy import Column, Integer, String, Date, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Date, Text, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db import Base
 
 class Transportation(Base):
     __tablename__ = "transportations"
+    __table_args__ = (
+        Index("ix_transportations_field_id_transport_date", "field_id", "transport_date"),
+        # Covers the per-(field, lot) packet totals lot reconciliation groups by, so it never reads the table
+        Index("ix_transportations_field_id_lot_number", "field_id", "lot_number", "small_packets", "medium_packets",
+              "large_packets", "overlarge_packets"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     field_id = Column(Integer, ForeignKey("fields.id"), nullable=False)
@@ -1,13 +1,16 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.db import Base
 
 class Yield(Base):
     __tablename__ = "yields"
+    __table_args__ = (
+        Index("ix_yields_field_id_date", "field_id", "date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     field_id = Column(Integer, ForeignKey("fields.id"))
-    date = Column(String, nullable=False)
+    date = Column(Date, nullable=False)
     large = Column(Float, nullable=False, default=0)
     medium = Column(Float, nullable=False, default=0)
     small = Column(Float, nullable=False, default=0)
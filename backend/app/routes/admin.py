@@ -0,0 +1,74 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+import secrets
+from app.config import settings
+from app.db import get_async_db
+from app.utils.rollups import check_rollups, rebuild_rollups
+from app.utils.field_stats import check_field_stats, rebuild_field_stats
+from app.utils.lot_reconciliation import check_lots, repair_lots
+from app.utils.loop_monitor import loop_monitor
+from app.utils.query_stats import route_query_histograms
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Admin endpoints are only reachable with the configured ADMIN_TOKEN."""
+    if not settings.ADMIN_TOKEN:
+        # Disabled unless explicitly configured - don't advertise the endpoint
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+router = APIRouter(tags=["admin"], dependencies=[Depends(require_admin)])
+
+@router.get("/monitor")
+async def get_monitor_snapshot():
+    """Event-loop lag, threadpool saturation and recent loop stalls with the route that caused them."""
+    return loop_monitor.snapshot()
+
+@router.get("/queries")
+async def get_query_histograms():
+    """Per-route histograms of SQL statements and DB time per request, chattiest routes first."""
+    return route_query_histograms.snapshot()
+
+@router.get("/rollups/check")
+async def check_user_rollups(user_id: Optional[int] = Query(None), db: AsyncSession = Depends(get_async_db)):
+    """Compare the dashboard rollups with totals recomputed from the base tables."""
+    mismatches = await db.run_sync(lambda session: check_rollups(session, user_id))
+    return {"consistent": not mismatches, "mismatches": mismatches}
+
+@router.post("/rollups/rebuild")
+async def rebuild_user_rollups(user_id: Optional[int] = Query(None), db: AsyncSession = Depends(get_async_db)):
+    """Recompute the dashboard rollups (all users, or one) from the base tables."""
+    rebuilt = await db.run_sync(lambda session: rebuild_rollups(session, user_id))
+    await db.commit()
+    return {"rebuilt": rebuilt}
+
+@router.get("/field-stats/check")
+async def check_field_month_stats(user_id: Optional[int] = Query(None), db: AsyncSession = Depends(get_async_db)):
+    """Compare the per-field monthly stats cube with cells recomputed from the base tables."""
+    mismatches = await db.run_sync(lambda session: check_field_stats(session, user_id))
+    return {"consistent": not mismatches, "mismatches": mismatches}
+
+@router.post("/field-stats/rebuild")
+async def rebuild_field_month_stats(user_id: Optional[int] = Query(None), db: AsyncSession = Depends(get_async_db)):
+    """Recompute the per-field monthly stats cube (all users, or one) from the base tables."""
+    rebuilt = await db.run_sync(lambda session: rebuild_field_stats(session, user_id))
+    await db.commit()
+    return {"rebuilt": rebuilt}
+
+@router.get("/lots/check")
+async def check_lot_counts(user_id: Optional[int] = Query(None), limit: int = Query(100, ge=1, le=10000),
+                           db: AsyncSession = Depends(get_async_db)):
+    """Compare lot packet counts and field contributions with their transportations and hand-entered stock.
+
+    Every difference is counted; the first ``limit`` are returned.
+    """
+    count, differences = await db.run_sync(lambda session: check_lots(session, user_id, limit))
+    return {"consistent": not count, "count": count, "differences": differences}
+
+@router.post("/lots/repair")
+async def repair_lot_counts(user_id: Optional[int] = Query(None), db: AsyncSession = Depends(get_async_db)):
+    """Set lot counts and field contributions (all users, or one) to the values recomputed from their transportations."""
+    repaired = await db.run_sync(lambda session: repair_lots(session, user_id))
+    await db.commit()
+    return repaired
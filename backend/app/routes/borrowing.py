@@ -1,11 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 from app.schemas.borrowing import BorrowingCreate, BorrowingUpdate, BorrowingResponse
 from app.models.borrowing import Borrowing
 from app.db import get_db
 from app.utils.jwt import get_current_user
-from datetime import datetime
+from datetime import date
+from typing import Optional
 import logging
 
 # Configure logging
@@ -34,9 +35,20 @@ def create_borrowing(borrowing: BorrowingCreate, db: Session = Depends(get_db),
         raise HTTPException(status_code=500, detail=f"An error occurred while creating borrowing: {str(e)}")
 
 @router.get("/", response_model=list[BorrowingResponse])
-def get_borrowings(db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
+def get_borrowings(
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
     try:
-        borrowings = db.query(Borrowing).filter(Borrowing.user_id == current_user["id"]).all()
+        # (user_id, borrow_date) index: the date bounds are a range scan
+        query = db.query(Borrowing).filter(Borrowing.user_id == current_user["id"])
+        if start_date:
+            query = query.filter(Borrowing.borrow_date >= start_date)
+        if end_date:
+            query = query.filter(Borrowing.borrow_date <= end_date)
+        borrowings = query.all()
         return borrowings
     except SQLAlchemyError as e:
         logger.error(f"Database error fetching borrowings: {str(e)}")
@@ -98,7 +110,7 @@ def mark_as_returned(id: int, db: Session = Depends(get_db), current_user: dict
             raise HTTPException(status_code=404, detail="Borrowing record not found")
         
         borrowing.status = "returned"
-        borrowing.actual_return_date = datetime.now().strftime("%Y-%m-%d")
+        borrowing.actual_return_date = date.today()
         db.commit()
         db.refresh(borrowing)
         
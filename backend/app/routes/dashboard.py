@@ -1,167 +1,254 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import func, case
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, case, cast, extract, literal, literal_column, null, true, union_all, Date, Integer, String
 from app.models.field import Field
 from app.models.yield_model import Yield
 from app.models.labour import Task, Payment, LabourAttendance, Labourer
 from app.models.money import MoneyRecord
 from app.models.transportation import Transportation
-from app.db import get_db
+from app.models.rollup import UserRollup, FieldMonthStat
+from app.db import get_read_db
+from app.config import settings
+from app.routes import weather
 from app.utils.jwt import get_current_user
-import requests
-from datetime import datetime, timedelta
+from app.utils.rollups import ROLLUP_COLUMNS, ATTENDANCE_WEIGHT
+from app.utils.field_stats import STAT_COLUMNS
+from datetime import date, timedelta
+from typing import List, Literal, Optional
+import math
 
 router = APIRouter()
 
-def get_weather_forecast():
-    """Get weather forecast for Delhi, India (7 days)"""
+async def get_weather_forecast(latitude: Optional[float], longitude: Optional[float]) -> list:
+    """Daily forecast for the user's fields, [] when there is none to show.
+
+    The same cached compact summary /weather/forecast?compact=true serves (and
+    the pre-warm job keeps fresh), so the dashboard doesn't wait on upstream;
+    past the deadline it gets the last good one.
+    """
+    if latitude is None or not settings.WEATHER_API_KEY:
+        return []
     try:
-        # Using OpenWeatherMap API (you'll need to add your API key)
-        # For demo purposes, returning mock data
-        # In production, you'd use: API_KEY = "your_openweather_api_key"
-        # url = f"http://api.openweathermap.org/data/2.5/forecast?q=Delhi,IN&appid={API_KEY}&units=metric"
-        
-        # Mock weather data for demonstration
-        base_date = datetime.now()
-        weather_data = []
-        
-        for i in range(7):
-            date = base_date + timedelta(days=i)
-            weather_data.append({
-                "date": date.strftime("%Y-%m-%d"),
-                "day": date.strftime("%A"),
-                "temp_max": 25 + (i % 5),
-                "temp_min": 15 + (i % 3),
-                "condition": ["Sunny", "Partly Cloudy", "Cloudy", "Light Rain"][i % 4],
-                "humidity": 60 + (i % 20),
-                "wind_speed": 10 + (i % 8)
-            })
-        
-        return weather_data
-    except Exception as e:
-        print(f"Weather API error: {e}")
+        summary, _ = await weather.upstream_or_last_good("forecast_compact", latitude, longitude, weather.request_deadline())
+    except weather.UPSTREAM_ERRORS:
         return []
+    return summary["days"][:7]
 
-@router.get("/")
-def get_dashboard_data(db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
-    # Total fields
-    total_fields = db.query(func.count(Field.id)).filter(Field.user_id == current_user["id"]).scalar()
-
-    # Total yield by potato type
-    yield_data = db.query(
-        func.sum(Yield.large),
-        func.sum(Yield.medium), 
-        func.sum(Yield.small),
-        func.sum(Yield.overlarge)
-    ).join(Field).filter(Field.user_id == current_user["id"]).first()
-    
-    if yield_data:
-        total_large = yield_data[0] or 0
-        total_medium = yield_data[1] or 0
-        total_small = yield_data[2] or 0
-        total_overlarge = yield_data[3] or 0
+TIMESERIES_METRICS = ("yield", "expenses", "labour_payments", "attendance_earnings", "transported_packets")
+
+def bucket_anchor(bucket: str, start_date: date) -> date:
+    """Start of the bucket containing ``start_date`` (weeks start on Monday)."""
+    if bucket == "week":
+        return start_date - timedelta(days=start_date.weekday())
+    if bucket == "month":
+        return start_date.replace(day=1)
+    return start_date
+
+def add_buckets(bucket: str, anchor: date, count: int) -> date:
+    if bucket == "month":
+        months = anchor.year * 12 + anchor.month - 1 + count
+        return date(months // 12, months % 12 + 1, 1)
+    return anchor + timedelta(days=count * (7 if bucket == "week" else 1))
+
+def bucket_count(bucket: str, anchor: date, end_date: date) -> int:
+    if bucket == "month":
+        return (end_date.year - anchor.year) * 12 + end_date.month - anchor.month + 1
+    return (end_date - anchor).days // (7 if bucket == "week" else 1) + 1
+
+def bucket_index(column, dialect_name: str, bucket: str, anchor: date, per_point: int):
+    """SQL for which output point a row's date falls in: whole buckets since ``anchor``, ``per_point`` to a point."""
+    if bucket == "month":
+        offset = (extract("year", column) - anchor.year) * 12 + extract("month", column) - anchor.month
+        size = per_point
     else:
-        total_large = total_medium = total_small = total_overlarge = 0
-    total_yield = total_large + total_medium + total_small + total_overlarge
+        if dialect_name == "sqlite":
+            offset = func.julianday(column) - func.julianday(literal(anchor, Date))
+        else:
+            # date - date is a whole number of days
+            offset = column - literal(anchor, Date)
+        size = per_point * (7 if bucket == "week" else 1)
+    return cast(offset, Integer) // size
 
-    # Total labour cost (sum of money records expenses and labour payments)
-    total_labour_payments = db.query(func.sum(Payment.amount)).filter(Payment.user_id == current_user["id"]).scalar() or 0
-    total_expenses = db.query(func.sum(MoneyRecord.amount)).filter(MoneyRecord.user_id == current_user["id"]).scalar() or 0
-    
-    total_labour_cost = total_expenses + total_labour_payments
-
-    # Total expenses (money records)
-    # Already fetched above as total_expenses
-
-    # Profit/loss estimate (assuming yield packets * some price per packet)
-    # Calculate Labour Earnings (Total wages earned by labourers based on attendance)
-    # Join Attendance with Labourer to get daily wage
-    # Optimized: Use SQL aggregation instead of fetching all records
-    total_earnings = db.query(
-    func.sum(
-        case(
-            (LabourAttendance.status == 'full', Labourer.daily_wage),
-            (LabourAttendance.status == 'half', Labourer.daily_wage * 0.5),
-            else_=0
+def timeseries_rows(user_id, dialect_name, bucket, anchor, start_date, end_date, per_point):
+    """Every metric summed per output point, as one UNION ALL of (metric, point, value) rows."""
+    def series(name, column, value, *criteria, source=None):
+        stmt = select(
+            literal(name).label("metric"),
+            bucket_index(column, dialect_name, bucket, anchor, per_point).label("point"),
+            func.sum(value).label("value")
         )
+        if source is not None:
+            stmt = stmt.select_from(source)
+        # Grouping by the output name keeps PostgreSQL from comparing two copies of the bound anchor
+        return stmt.filter(column >= start_date, column <= end_date, *criteria).group_by(literal_column("point"))
+
+    return union_all(
+        series("yield", Yield.date, Yield.large + Yield.medium + Yield.small + Yield.overlarge,
+               Field.user_id == user_id, source=Yield.__table__.join(Field.__table__)),
+        series("expenses", MoneyRecord.payment_date, MoneyRecord.amount, MoneyRecord.user_id == user_id),
+        series("labour_payments", Payment.payment_date, Payment.amount, Payment.user_id == user_id),
+        series("attendance_earnings", LabourAttendance.attendance_date, case(
+            *[(LabourAttendance.status == status, Labourer.daily_wage * weight) for status, weight in ATTENDANCE_WEIGHT.items()],
+            else_=0
+        ), LabourAttendance.user_id == user_id,
+            source=LabourAttendance.__table__.join(Labourer.__table__, LabourAttendance.labourer_id == Labourer.id)),
+        series("transported_packets", Transportation.transport_date,
+               func.coalesce(Transportation.small_packets, 0) + func.coalesce(Transportation.medium_packets, 0)
+               + func.coalesce(Transportation.large_packets, 0) + func.coalesce(Transportation.overlarge_packets, 0),
+               Field.user_id == user_id, source=Transportation.__table__.join(Field.__table__)),
+    )
+
+def graph_rows(user_id):
+    """Per-field yields, expenses by method and labour cost by day as one UNION ALL.
+
+    ``kind`` tells the row sets apart; the yield-by-type totals are the column
+    sums of the per-field rows, so they are not queried again.
+    """
+    yield_by_field = select(
+        literal("field").label("kind"),
+        Field.field_name.label("label"),
+        func.sum(Yield.large).label("large"),
+        func.sum(Yield.medium).label("medium"),
+        func.sum(Yield.small).label("small"),
+        func.sum(Yield.overlarge).label("overlarge")
+    ).join(Yield).filter(Field.user_id == user_id).group_by(Field.id)
+    expenses_by_type = select(
+        literal("expense"), MoneyRecord.payment_method, func.sum(MoneyRecord.amount), null(), null(), null()
+    ).filter(MoneyRecord.user_id == user_id).group_by(MoneyRecord.payment_method)
+    labour_cost_trends = select(
+        literal("labour"), cast(Task.start_date, String), func.sum(Task.rate), null(), null(), null()
+    ).join(Field).filter(Field.user_id == user_id).group_by(Task.start_date)
+    return union_all(yield_by_field, expenses_by_type, labour_cost_trends)
+
+FIELD_STAT_DIMENSIONS = ("field", "season", "year", "month")
+
+def field_stats_rows(user_id, group_by, field_id=None, season=None, year=None, month=None):
+    """Cube cells summed per ``group_by`` dimension, with the area of the fields behind each group.
+
+    The inner query sums the matching cells per field, joined to ``fields`` for
+    season and area; the outer one adds those up per group, so a field's area
+    counts once per group however many months it has cells in.
+    """
+    dimension_columns = {
+        "field": [Field.field_name.label("field_name")],
+        "season": [Field.season.label("season")],
+        "year": [FieldMonthStat.year.label("year")],
+        "month": [FieldMonthStat.month.label("month")],
+    }
+    selected = [column for name in group_by for column in dimension_columns[name]]
+    stmt = select(
+        FieldMonthStat.field_id.label("field_id"),
+        Field.area.label("area"),
+        *selected,
+        *[func.sum(FieldMonthStat.__table__.c[column]).label(column) for column in STAT_COLUMNS]
+    ).join(Field, FieldMonthStat.field_id == Field.id).filter(FieldMonthStat.user_id == user_id)
+    if field_id is not None:
+        stmt = stmt.filter(FieldMonthStat.field_id == field_id)
+    if season is not None:
+        stmt = stmt.filter(Field.season == season)
+    if year is not None:
+        stmt = stmt.filter(FieldMonthStat.year == year)
+    if month is not None:
+        stmt = stmt.filter(FieldMonthStat.month == month)
+    per_field = stmt.group_by(FieldMonthStat.field_id, Field.area, *selected).subquery()
+
+    keys = [per_field.c[column.name] for column in selected]
+    if "field" in group_by:
+        keys.insert(group_by.index("field"), per_field.c.field_id)
+    return select(
+        *keys,
+        *[func.sum(per_field.c[column]).label(column) for column in STAT_COLUMNS],
+        func.sum(per_field.c.area).label("area")
+    ).group_by(*keys).order_by(*keys)
+
+def field_stats_entry(row) -> dict:
+    """A cube row with its yield total and per-hectare figures (None when the fields have no area)."""
+    stats = {column: row.get(column) or 0 for column in STAT_COLUMNS}
+    area = row.get("area") or 0
+    total_yield = stats["yield_large"] + stats["yield_medium"] + stats["yield_small"] + stats["yield_overlarge"]
+    keys = {column: value for column, value in row.items() if column not in STAT_COLUMNS and column != "area"}
+    return {
+        **keys,
+        **stats,
+        "yield_total": total_yield,
+        "area": area,
+        "per_hectare": {
+            "yield": total_yield / area if area else None,
+            "transported_packets": stats["transported_packets"] / area if area else None,
+            "task_labour_cost": stats["task_labour_cost"] / area if area else None,
+        },
+    }
+
+
+@router.get("/")
+async def get_dashboard_data(db: AsyncSession = Depends(get_read_db), current_user: dict = Depends(get_current_user)):
+    # Totals are maintained by the write routes (app/utils/rollups.py): one row by primary key, fetched
+    # with the coordinates the weather forecast is for (the most recent field that has them)
+    user_id = current_user["id"]
+    home = (
+        select(Field.latitude, Field.longitude)
+        .where(Field.user_id == user_id, Field.latitude.is_not(None))
+        .order_by(Field.year.desc(), Field.id.desc())
+        .limit(1)
+        .subquery()
     )
-).select_from(LabourAttendance).join(
-    Labourer,
-    LabourAttendance.labourer_id == Labourer.id
-).filter(
-    LabourAttendance.user_id == current_user["id"]
-).scalar() or 0
-
-            
+    base = select(literal(user_id).label("user_id")).subquery()
+    totals, latitude, longitude = (await db.execute(
+        select(UserRollup, home.c.latitude, home.c.longitude)
+        .select_from(base)
+        .outerjoin(UserRollup, UserRollup.user_id == base.c.user_id)
+        .outerjoin(home, true())
+    )).one()
+    totals = totals or UserRollup(**{column: 0 for column in ROLLUP_COLUMNS})
+
+    total_yield = totals.yield_large + totals.yield_medium + totals.yield_small + totals.yield_overlarge
+    # Total labour cost (sum of money records expenses and labour payments)
+    total_labour_cost = totals.expenses + totals.labour_payments
+
     # Keep profit loss estimate logic but separate
     price_per_packet = 50
-    profit_loss = (total_yield * price_per_packet) - (total_labour_cost or 0) - (total_expenses or 0)
-
-    # Total transported packets
-    transport_data = db.query(
-        func.sum(Transportation.small_packets),
-        func.sum(Transportation.medium_packets),
-        func.sum(Transportation.large_packets),
-        func.sum(Transportation.overlarge_packets)
-    ).join(Field).filter(Field.user_id == current_user["id"]).first()
-
-    if transport_data:
-        total_transported = (transport_data[0] or 0) + (transport_data[1] or 0) + (transport_data[2] or 0) + (transport_data[3] or 0)
-    else:
-        total_transported = 0
+    profit_loss = (total_yield * price_per_packet) - total_labour_cost - totals.expenses
 
-    # Get weather forecast
-    weather_forecast = get_weather_forecast()
+    weather_forecast = await get_weather_forecast(latitude, longitude)
 
     return {
-        "total_fields": total_fields or 0,
+        "total_fields": totals.field_count,
         "total_yield": total_yield,
-        "total_transported": total_transported,
+        "total_transported": totals.transported_packets,
         "potato_types": {
-            "large": total_large,
-            "medium": total_medium,
-            "small": total_small,
-            "overlarge": total_overlarge
+            "large": totals.yield_large,
+            "medium": totals.yield_medium,
+            "small": totals.yield_small,
+            "overlarge": totals.yield_overlarge
         },
-        "total_labour_cost": total_labour_cost or 0,
-        "total_expenses": total_expenses or 0,
-        "total_earnings": total_earnings,
+        "total_labour_cost": total_labour_cost,
+        "total_expenses": totals.expenses,
+        "total_earnings": totals.attendance_earnings,
         "profit_loss": profit_loss,
         "weather_forecast": weather_forecast
     }
 
 @router.get("/graphs")
-def get_graph_data(db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
-    # Get potato type totals first
-    yield_data = db.query(
-        func.sum(Yield.large),
-        func.sum(Yield.medium), 
-        func.sum(Yield.small),
-        func.sum(Yield.overlarge)
-    ).join(Field).filter(Field.user_id == current_user["id"]).first()
-    
-    if yield_data:
-        total_large = yield_data[0] or 0
-        total_medium = yield_data[1] or 0
-        total_small = yield_data[2] or 0
-        total_overlarge = yield_data[3] or 0
-    else:
-        total_large = total_medium = total_small = total_overlarge = 0
-
-    # Yield by field with potato types
-    yield_by_field = db.query(
-        Field.field_name,
-        func.sum(Yield.large),
-        func.sum(Yield.medium),
-        func.sum(Yield.small),
-        func.sum(Yield.overlarge)
-    ).join(Yield).filter(Field.user_id == current_user["id"]).group_by(Field.id).all()
-
-    # Format yield data for frontend
-    yield_by_field_formatted = []
-    for field_name, large, medium, small, overlarge in yield_by_field:
-        total = (large or 0) + (medium or 0) + (small or 0) + (overlarge or 0)
-        yield_by_field_formatted.append([field_name, total])
+async def get_graph_data(db: AsyncSession = Depends(get_read_db), current_user: dict = Depends(get_current_user)):
+    rows = (await db.execute(graph_rows(current_user["id"]))).all()
+
+    yield_by_field = []
+    expenses_by_type = []
+    labour_cost_trends = []
+    total_large = total_medium = total_small = total_overlarge = 0
+    for kind, label, large, medium, small, overlarge in rows:
+        if kind == "field":
+            large, medium, small, overlarge = large or 0, medium or 0, small or 0, overlarge or 0
+            total_large += large
+            total_medium += medium
+            total_small += small
+            total_overlarge += overlarge
+            yield_by_field.append([label, large + medium + small + overlarge])
+        elif kind == "expense":
+            expenses_by_type.append([label, large])
+        else:
+            labour_cost_trends.append([label, large])
+    labour_cost_trends.sort(key=lambda row: row[0] or "")
 
     # Yield by potato type
     yield_by_type = [
@@ -171,21 +258,90 @@ def get_graph_data(db: Session = Depends(get_db), current_user: dict = Depends(g
         ["Overlarge", total_overlarge]
     ]
 
-    # Expenses by type
-    expenses_by_type = db.query(
-        MoneyRecord.payment_method, 
-        func.sum(MoneyRecord.amount)
-    ).filter(MoneyRecord.user_id == current_user["id"]).group_by(MoneyRecord.payment_method).all()
-
-    # Labour cost trends
-    labour_cost_trends = db.query(
-        Task.start_date, 
-        func.sum(Task.rate)
-    ).join(Field).filter(Field.user_id == current_user["id"]).group_by(Task.start_date).all()
-
     return {
-        "yield_by_field": yield_by_field_formatted,
+        "yield_by_field": yield_by_field,
         "yield_by_type": yield_by_type,
         "expenses_by_type": expenses_by_type,
         "labour_cost_trends": labour_cost_trends
     }
+
+@router.get("/timeseries")
+async def get_timeseries(
+    bucket: Literal["day", "week", "month"] = Query("day"),
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    max_points: int = Query(300, ge=1, le=1000),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Yields, expenses, labour payments, earnings and transported packets per day, week or month.
+
+    Defaults to the last 90 days. When the range holds more buckets than
+    ``max_points``, adjacent buckets are merged in SQL (every metric is a sum,
+    so merged points stay exact) and ``buckets_per_point`` says by how many.
+    """
+    end_date = end_date or date.today()
+    start_date = start_date or end_date - timedelta(days=89)
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date must not be after end_date")
+
+    anchor = bucket_anchor(bucket, start_date)
+    per_point = math.ceil(bucket_count(bucket, anchor, end_date) / max_points)
+    point_count = math.ceil(bucket_count(bucket, anchor, end_date) / per_point)
+
+    dialect_name = db.get_bind().dialect.name
+    rows = (await db.execute(timeseries_rows(
+        current_user["id"], dialect_name, bucket, anchor, start_date, end_date, per_point
+    ))).all()
+
+    points = [
+        {"date": add_buckets(bucket, anchor, i * per_point), **{metric: 0 for metric in TIMESERIES_METRICS}}
+        for i in range(point_count)
+    ]
+    for metric, point, value in rows:
+        points[point][metric] = value or 0
+
+    return {
+        "bucket": bucket,
+        "buckets_per_point": per_point,
+        "start_date": start_date,
+        "end_date": end_date,
+        "points": points
+    }
+
+@router.get("/field-stats")
+async def get_field_stats(
+    field_id: Optional[int] = Query(None),
+    season: Optional[str] = Query(None),
+    year: Optional[int] = Query(None),
+    month: Optional[int] = Query(None, ge=1, le=12),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Slice of the per-field monthly stats cube: one entry per field and month matching the filters."""
+    rows = (await db.execute(field_stats_rows(
+        current_user["id"], list(FIELD_STAT_DIMENSIONS), field_id, season, year, month
+    ))).mappings().all()
+    return {"cells": [field_stats_entry(row) for row in rows]}
+
+@router.get("/field-stats/rollup")
+async def get_field_stats_rollup(
+    group_by: List[Literal["field", "season", "year", "month"]] = Query([]),
+    field_id: Optional[int] = Query(None),
+    season: Optional[str] = Query(None),
+    year: Optional[int] = Query(None),
+    month: Optional[int] = Query(None, ge=1, le=12),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """The cube rolled up to ``group_by`` (any of field, season, year, month; none for the grand total).
+
+    Answered from ``field_month_stats`` (joined to ``fields`` for season and
+    area), never the raw yields, transportations or tasks; per-hectare figures
+    divide by the summed area of the fields in each group.
+    """
+    group_by = list(dict.fromkeys(group_by))
+    rows = (await db.execute(field_stats_rows(
+        current_user["id"], group_by, field_id, season, year, month
+    ))).mappings().all()
+    return {"group_by": group_by, "rows": [field_stats_entry(row) for row in rows]}
@@ -0,0 +1,72 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from typing import Optional
+import asyncio
+import json
+import time
+from app.config import settings
+from app.utils.events import hub, TOPICS
+from app.utils.security import verify_token
+
+router = APIRouter(tags=["events"])
+
+# How long EventSource waits before reconnecting after the stream ends
+RETRY_MS = 3000
+
+def get_stream_user(authorization: Optional[str] = Header(None), access_token: Optional[str] = Query(None)):
+    """Like get_current_user, but the browser's EventSource can't set headers, so ?access_token= works too."""
+    token = access_token
+    if authorization:
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() != "bearer":
+            token = None
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    try:
+        user_id = verify_token(token).get("sub")
+    except ValueError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+    except Exception:
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    return {"id": user_id}
+
+def format_event(name: str, data: str) -> str:
+    return f"event: {name}\ndata: {data}\n\n"
+
+@router.get("/")
+async def stream_events(current_user: dict = Depends(get_stream_user)):
+    """Server-sent events for the current user's yield, transportation, lot, attendance and money changes.
+
+    Starts with a ``ready`` event (fetch the current state then), followed
+    by one event per committed change, named after its topic. A ``resync``
+    event means some changes were missed and everything should be refetched.
+    """
+    subscriber = hub.subscribe(current_user["id"])
+    if subscriber is None:
+        raise HTTPException(status_code=503, detail="Too many open event streams", headers={"Retry-After": "30"})
+
+    async def stream():
+        deadline = time.monotonic() + settings.EVENTS_MAX_STREAM_SECONDS
+        try:
+            yield f"retry: {RETRY_MS}\n" + format_event("ready", json.dumps({"topics": list(TOPICS)}))
+            while (remaining := deadline - time.monotonic()) > 0:
+                try:
+                    async with asyncio.timeout(min(settings.EVENTS_HEARTBEAT_SECONDS, remaining)):
+                        name, data = await subscriber.queue.get()
+                except TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_event(name, data)
+        finally:
+            hub.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Also runs if the client left before the stream started
+        background=BackgroundTask(hub.unsubscribe, subscriber),
+    )
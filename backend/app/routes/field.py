@@ -1,12 +1,24 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import delete, func
 from sqlalchemy.orm import Session
 from app.schemas.field import FieldCreate, FieldUpdate, FieldResponse
 from app.models.field import Field
+from app.models.yield_model import Yield
+from app.models.transportation import Transportation
+from app.models.rollup import FieldMonthStat
+from app.models.lot_number import LotField
 from app.db import get_db
 from app.utils.jwt import get_current_user
+from app.utils.rollups import apply_rollup
 
 router = APIRouter()
 
+def check_coordinates(latitude, longitude):
+    if (latitude is None) != (longitude is None):
+        raise HTTPException(status_code=400, detail="Provide both latitude and longitude, or neither")
+    if latitude is not None and not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise HTTPException(status_code=400, detail="Coordinates out of range")
+
 @router.get("/", response_model=list[FieldResponse])
 def get_fields(db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
     fields = db.query(Field).filter(Field.user_id == current_user["id"]).all()
@@ -14,8 +26,10 @@ def get_fields(db: Session = Depends(get_db), current_user: dict = Depends(get_c
 
 @router.post("/", response_model=FieldResponse)
 def create_field(field: FieldCreate, db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
+    check_coordinates(field.latitude, field.longitude)
     new_field = Field(**field.dict(), user_id=current_user["id"])
     db.add(new_field)
+    apply_rollup(db, current_user["id"], field_count=1)
     db.commit()
     db.refresh(new_field)
     return new_field
@@ -32,7 +46,14 @@ def update_field(id: int, field_update: FieldUpdate, db: Session = Depends(get_d
     field = db.query(Field).filter(Field.id == id, Field.user_id == current_user["id"]).first()
     if not field:
         raise HTTPException(status_code=404, detail="Field not found")
-    for key, value in field_update.dict(exclude_unset=True).items():
+    changes = field_update.dict(exclude_unset=True)
+    if "latitude" in changes or "longitude" in changes:
+        check_coordinates(changes.get("latitude"), changes.get("longitude"))
+        field.geocoded_location = None
+    elif "location" in changes and field.geocoded_location is not None and changes["location"] != field.geocoded_location:
+        # Geocoded from the old location; looked up again on next use
+        field.latitude = field.longitude = field.geocoded_location = None
+    for key, value in changes.items():
         setattr(field, key, value)
     db.commit()
     db.refresh(field)
@@ -43,6 +64,18 @@ def delete_field(id: int, db: Session = Depends(get_db), current_user: dict = De
     field = db.query(Field).filter(Field.id == id, Field.user_id == current_user["id"]).first()
     if not field:
         raise HTTPException(status_code=404, detail="Field not found")
+    # Transportations hold packets in lots and can't outlive their field; they are deleted first
+    if db.query(Transportation.id).filter(Transportation.field_id == id).first() is not None:
+        raise HTTPException(status_code=400, detail="Field has transportations; delete them first")
+    # Its yields are detached (field_id = NULL) and stop counting towards the dashboard
+    large, medium, small, overlarge = db.query(
+        func.coalesce(func.sum(Yield.large), 0), func.coalesce(func.sum(Yield.medium), 0),
+        func.coalesce(func.sum(Yield.small), 0), func.coalesce(func.sum(Yield.overlarge), 0)
+    ).filter(Yield.field_id == id).one()
+    db.execute(delete(FieldMonthStat).where(FieldMonthStat.field_id == id))
+    db.execute(delete(LotField).where(LotField.field_id == id))
     db.delete(field)
+    apply_rollup(db, current_user["id"], field_count=-1, yield_large=-large, yield_medium=-medium,
+                 yield_small=-small, yield_overlarge=-overlarge)
     db.commit()
     return {"message": "Field deleted successfully"}
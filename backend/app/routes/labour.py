@@ -1,4 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select, delete, func, case
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload
 from datetime import date
 from typing import Optional
@@ -14,30 +16,49 @@ from app.schemas.labour import (
 )
 from app.models.labour import LabourGroup, Labourer, Payment, Task, LabourAttendance, GroupWork
 from app.models.field import Field
-from app.db import get_db
+from app.db import get_async_db, get_read_db, run_write
 from app.utils.jwt import get_current_user
+from app.utils.rollups import apply_rollup, apply_rollup_async, attendance_earnings, ATTENDANCE_WEIGHT
+from app.utils.field_stats import apply_field_stats_async
+from app.utils.events import hub
 
 router = APIRouter()
 
+async def removed_labour_totals(db: AsyncSession, user_id, labourer_ids) -> dict:
+    """Rollup deltas for deleting these labourers' payments and attendance."""
+    payments = (await db.execute(select(func.coalesce(func.sum(Payment.amount), 0)).filter(
+        Payment.user_id == user_id,
+        Payment.labourer_id.in_(labourer_ids)
+    ))).scalar()
+    earnings = (await db.execute(select(func.coalesce(func.sum(case(
+        *[(LabourAttendance.status == status, Labourer.daily_wage * weight) for status, weight in ATTENDANCE_WEIGHT.items()],
+        else_=0
+    )), 0)).select_from(LabourAttendance).join(Labourer, LabourAttendance.labourer_id == Labourer.id).filter(
+        LabourAttendance.user_id == user_id,
+        LabourAttendance.labourer_id.in_(labourer_ids)
+    ))).scalar()
+    return {"labour_payments": -payments, "attendance_earnings": -earnings}
+
 # Labour Group Routes
 @router.post("/groups", response_model=LabourGroupResponse)
-def create_labour_group(group: LabourGroupCreate, db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
+async def create_labour_group(group: LabourGroupCreate, db: AsyncSession = Depends(get_async_db), current_user: dict = Depends(get_current_user)):
     new_group = LabourGroup(**group.dict(), user_id=current_user["id"])
     db.add(new_group)
-    db.commit()
-    db.refresh(new_group)
+    await db.commit()
+    await db.refresh(new_group)
     return new_group
 
 @router.get("/groups", response_model=list[LabourGroupResponse])
-def get_labour_groups(db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
-    return db.query(LabourGroup).options(joinedload(LabourGroup.labourers)).filter(LabourGroup.user_id == current_user["id"]).all()
+async def get_labour_groups(db: AsyncSession = Depends(get_async_db), current_user: dict = Depends(get_current_user)):
+    result = await db.execute(select(LabourGroup).options(joinedload(LabourGroup.labourers)).filter(LabourGroup.user_id == current_user["id"]))
+    return result.unique().scalars().all()
 
 @router.put("/groups/{group_id}", response_model=LabourGroupResponse)
-def update_labour_group(group_id: int, group: LabourGroupCreate, db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
-    existing_group = db.query(LabourGroup).filter(
+async def update_labour_group(group_id: int, group: LabourGroupCreate, db: AsyncSession = Depends(get_async_db), current_user: dict = Depends(get_current_user)):
+    existing_group = (await db.execute(select(LabourGroup).filter(
         LabourGroup.id == group_id,
         LabourGroup.user_id == current_user["id"]
-    ).first()
+    ))).scalars().first()
     
     if not existing_group:
         raise HTTPException(status_code=404, detail="Labour group not found or access denied")
@@ -45,170 +66,198 @@ def update_labour_group(group_id: int, group: LabourGroupCreate, db: Session = D
     for key, value in group.dict().items():
         setattr(existing_group, key, value)
     
-    db.commit()
-    db.refresh(existing_group)
+    await db.commit()
+    await db.refresh(existing_group)
     return existing_group
 
 @router.delete("/groups/{group_id}")
-def delete_labour_group(group_id: int, db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
-    existing_group = db.query(LabourGroup).filter(
+async def delete_labour_group(group_id: int, db: AsyncSession = Depends(get_async_db), current_user: dict = Depends(get_current_user)):
+    existing_group = (await db.execute(select(LabourGroup).filter(
         LabourGroup.id == group_id,
         LabourGroup.user_id == current_user["id"]
-    ).first()
+    ))).scalars().first()
     
     if not existing_group:
         raise HTTPException(status_code=404, detail="Labour group not found or access denied")
 
     # Delete dependents first to avoid FK constraint failures (payments/attendance/tasks/labourers)
-    labourers_in_group = db.query(Labourer).filter(Labourer.group_id == group_id).all()
-    labourer_ids = [l.id for l in labourers_in_group]
+    labourer_ids = (await db.execute(select(Labourer.id).filter(Labourer.group_id == group_id))).scalars().all()
 
     if labourer_ids:
-        db.query(Payment).filter(
+        await apply_rollup_async(db, current_user["id"], **await removed_labour_totals(db, current_user["id"], labourer_ids))
+
+        await db.execute(delete(Payment).where(
             Payment.user_id == current_user["id"],
             Payment.labourer_id.in_(labourer_ids)
-        ).delete(synchronize_session=False)
+        ))
 
-        db.query(LabourAttendance).filter(
+        await db.execute(delete(LabourAttendance).where(
             LabourAttendance.user_id == current_user["id"],
             LabourAttendance.labourer_id.in_(labourer_ids)
-        ).delete(synchronize_session=False)
-
-    # Delete tasks associated with this group
-    db.query(Task).filter(
+        ))
+
+    # Delete tasks associated with this group, taking their cost off the field stats cube
+    tasks = (await db.execute(select(Task.field_id, Task.start_date, Task.rate).join(Field).filter(
+        Task.group_id == group_id,
+        Field.user_id == current_user["id"]
+    ))).all()
+    await apply_field_stats_async(db, current_user["id"], *[
+        (field_id, start_date, {"task_labour_cost": -rate}) for field_id, start_date, rate in tasks
+    ])
+    await db.execute(delete(Task).where(
         Task.group_id == group_id
-    ).delete(synchronize_session=False)
+    ))
 
-    db.query(Labourer).filter(
+    await db.execute(delete(Labourer).where(
         Labourer.group_id == group_id,
         Labourer.user_id == current_user["id"]
-    ).delete(synchronize_session=False)
+    ))
 
     # Delete associated GroupWork records
-    db.query(GroupWork).filter(
+    await db.execute(delete(GroupWork).where(
         GroupWork.group_id == group_id,
         GroupWork.user_id == current_user["id"]
-    ).delete(synchronize_session=False)
+    ))
 
-    db.delete(existing_group)
-    db.commit()
+    await db.delete(existing_group)
+    await db.commit()
     return {"message": "Labour group deleted successfully"}
 
 # Labourer Routes
 @router.post("/labourers", response_model=LabourerResponse)
-def create_labourer(labourer: LabourerCreate, db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
+async def create_labourer(labourer: LabourerCreate, db: AsyncSession = Depends(get_async_db), current_user: dict = Depends(get_current_user)):
     # Verify the labour group belongs to the current user
-    labour_group = db.query(LabourGroup).filter(
+    labour_group = (await db.execute(select(LabourGroup).filter(
         LabourGroup.id == labourer.group_id,
         LabourGroup.user_id == current_user["id"]
-    ).first()
+    ))).scalars().first()
     
     if not labour_group:
         raise HTTPException(status_code=404, detail="Labour group not found or access denied")
     
     new_labourer = Labourer(**labourer.dict(), user_id=current_user["id"])
     db.add(new_labourer)
-    db.commit()
-    db.refresh(new_labourer)
+    await db.commit()
+    await db.refresh(new_labourer)
     return new_labourer
 
 @router.get("/labourers", response_model=list[LabourerResponse])
-def get_labourers(db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
+async def get_labourers(db: AsyncSession = Depends(get_async_db), current_user: dict = Depends(get_current_user)):
     # Only return labourers from the current user's labour groups
-    return db.query(Labourer).options(joinedload(Labourer.group)).join(LabourGroup).filter(LabourGroup.user_id == current_user["id"]).all()
+    result = await db.execute(select(Labourer).join(LabourGroup).filter(LabourGroup.user_id == current_user["id"]))
+    return result.scalars().all()
 
 @router.put("/labourers/{labourer_id}", response_model=LabourerResponse)
-def update_labourer(labourer_id: int, labourer: LabourerUpdate, db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
-    existing_labourer = db.query(Labourer).join(LabourGroup).filter(
+async def update_labourer(labourer_id: int, labourer: LabourerUpdate, db: AsyncSession = Depends(get_async_db), current_user: dict = Depends(get_current_user)):
+    existing_labourer = (await db.execute(select(Labourer).join(LabourGroup).filter(
         Labourer.id == labourer_id,
         LabourGroup.user_id == current_user["id"]
-    ).first()
+    ))).scalars().first()
     
     if not existing_labourer:
         raise HTTPException(status_code=404, detail="Labourer not found or access denied")
     
     # If group_id is being updated, verify the new group belongs to the current user
     if labourer.group_id is not None:
-        labour_group = db.query(LabourGroup).filter(
+        labour_group = (await db.execute(select(LabourGroup).filter(
             LabourGroup.id == labourer.group_id,
             LabourGroup.user_id == current_user["id"]
-        ).first()
+        ))).scalars().first()
         
         if not labour_group:
             raise HTTPException(status_code=404, detail="Labour group not found or access denied")
     
+    previous_wage = existing_labourer.daily_wage or 0
+
     # Update only the fields that are provided
     for key, value in labourer.dict(exclude_unset=True).items():
         setattr(existing_labourer, key, value)
+
+    # Earnings are priced at the current wage, so a wage change re-prices every day already recorded
+    wage_change = (existing_labourer.daily_wage or 0) - previous_wage
+    if wage_change:
+        days_worked = (await db.execute(select(func.coalesce(func.sum(case(
+            *[(LabourAttendance.status == status, weight) for status, weight in ATTENDANCE_WEIGHT.items()],
+            else_=0
+        )), 0)).filter(
+            LabourAttendance.user_id == current_user["id"],
+            LabourAttendance.labourer_id == labourer_id
+        ))).scalar()
+        await apply_rollup_async(db, current_user["id"], attendance_earnings=wage_change * days_worked)
     
-    db.commit()
-    db.refresh(existing_labourer)
+    await db.commit()
+    await db.refresh(existing_labourer)
     return existing_labourer
 
 @router.delete("/labourers/{labourer_id}")
-def delete_labourer(labourer_id: int, db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
-    existing_labourer = db.query(Labourer).join(LabourGroup).filter(
+async def delete_labourer(labourer_id: int, db: AsyncSession = Depends(get_async_db), current_user: dict = Depends(get_current_user)):
+    existing_labourer = (await db.execute(select(Labourer).join(LabourGroup).filter(
         Labourer.id == labourer_id,
         LabourGroup.user_id == current_user["id"]
-    ).first()
+    ))).scalars().first()
     
     if not existing_labourer:
         raise HTTPException(status_code=404, detail="Labourer not found or access denied")
 
+    await apply_rollup_async(db, current_user["id"], **await removed_labour_totals(db, current_user["id"], [labourer_id]))
+
     # Delete dependents first to avoid FK constraint failures
-    db.query(Payment).filter(
+    await db.execute(delete(Payment).where(
         Payment.user_id == current_user["id"],
         Payment.labourer_id == labourer_id
-    ).delete(synchronize_session=False)
+    ))
 
-    db.query(LabourAttendance).filter(
+    await db.execute(delete(LabourAttendance).where(
         LabourAttendance.user_id == current_user["id"],
         LabourAttendance.labourer_id == labourer_id
-    ).delete(synchronize_session=False)
+    ))
 
-    db.delete(existing_labourer)
-    db.commit()
+    await db.delete(existing_labourer)
+    await db.commit()
     return {"message": "Labourer deleted successfully"}
 
 @router.get("/labourers/{group_id}", response_model=list[LabourerResponse])
-def get_labourers_by_group(group_id: int, db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
+async def get_labourers_by_group(group_id: int, db: AsyncSession = Depends(get_async_db), current_user: dict = Depends(get_current_user)):
     # Verify the labour group belongs to the current user
-    labour_group = db.query(LabourGroup).filter(
+    labour_group = (await db.execute(select(LabourGroup).filter(
         LabourGroup.id == group_id,
         LabourGroup.user_id == current_user["id"]
-    ).first()
+    ))).scalars().first()
     
     if not labour_group:
         raise HTTPException(status_code=404, detail="Labour group not found or access denied")
     
-    return db.query(Labourer).options(joinedload(Labourer.group)).filter(Labourer.group_id == group_id).all()
+    result = await db.execute(select(Labourer).filter(Labourer.group_id == group_id))
+    return result.scalars().all()
 
 # Payment Routes
 @router.post("/payments", response_model=PaymentResponse)
-def create_payment(payment: PaymentCreate, db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
+async def create_payment(payment: PaymentCreate, db: AsyncSession = Depends(get_async_db), current_user: dict = Depends(get_current_user)):
     # Verify the labourer belongs to the current user
-    labourer = db.query(Labourer).join(LabourGroup).filter(
+    labourer = (await db.execute(select(Labourer).join(LabourGroup).filter(
         Labourer.id == payment.labourer_id,
         LabourGroup.user_id == current_user["id"]
-    ).first()
+    ))).scalars().first()
     
     if not labourer:
         raise HTTPException(status_code=404, detail="Labourer not found or access denied")
     
     new_payment = Payment(**payment.dict(), user_id=current_user["id"])
     db.add(new_payment)
-    db.commit()
-    db.refresh(new_payment)
+    await apply_rollup_async(db, current_user["id"], labour_payments=new_payment.amount)
+    await db.commit()
+    await db.refresh(new_payment)
+    hub.publish(current_user["id"], "money", action="created", record="labour_payment", id=new_payment.id, amount=new_payment.amount)
     return new_payment
 
 @router.get("/payments", response_model=list[PaymentResponse])
-def get_payments(db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
+async def get_payments(db: AsyncSession = Depends(get_async_db), current_user: dict = Depends(get_current_user)):
     # Only return payments that belong to an existing labourer owned by the user.
     # Also exclude any payment created before the labourer itself was created.
     # This prevents "ghost" payment logs showing up for newly created labourers
     # in cases where SQLite reuses deleted row IDs.
-    return (
-        db.query(Payment)
+    result = await db.execute(
+        select(Payment)
         .join(Labourer, Payment.labourer_id == Labourer.id)
         .join(LabourGroup, Labourer.group_id == LabourGroup.id)
         .filter(
@@ -218,60 +267,66 @@ def get_payments(db: Session = Depends(get_db), current_user: dict = Depends(get
         )
         .options(joinedload(Payment.labourer))
         .order_by(Payment.payment_date.desc(), Payment.id.desc())
-        .all()
     )
+    return result.scalars().all()
 
 @router.put("/payments/{payment_id}", response_model=PaymentResponse)
-def update_payment(payment_id: int, payment: PaymentUpdate, db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
-    existing_payment = db.query(Payment).filter(
+async def update_payment(payment_id: int, payment: PaymentUpdate, db: AsyncSession = Depends(get_async_db), current_user: dict = Depends(get_current_user)):
+    existing_payment = (await db.execute(select(Payment).filter(
         Payment.id == payment_id,
         Payment.user_id == current_user["id"]
-    ).first()
+    ))).scalars().first()
     
     if not existing_payment:
         raise HTTPException(status_code=404, detail="Payment not found or access denied")
     
     # If labourer_id is being updated, verify the new labourer belongs to the current user
     if payment.labourer_id is not None:
-        labourer = db.query(Labourer).join(LabourGroup).filter(
+        labourer = (await db.execute(select(Labourer).join(LabourGroup).filter(
             Labourer.id == payment.labourer_id,
             LabourGroup.user_id == current_user["id"]
-        ).first()
+        ))).scalars().first()
         
         if not labourer:
             raise HTTPException(status_code=404, detail="Labourer not found or access denied")
     
+    previous_amount = existing_payment.amount or 0
+
     # Update only the fields that are provided
     for key, value in payment.dict(exclude_unset=True).items():
         setattr(existing_payment, key, value)
-    
-    db.commit()
-    db.refresh(existing_payment)
+
+    await apply_rollup_async(db, current_user["id"], labour_payments=(existing_payment.amount or 0) - previous_amount)
+    await db.commit()
+    await db.refresh(existing_payment)
+    hub.publish(current_user["id"], "money", action="updated", record="labour_payment", id=existing_payment.id, amount=existing_payment.amount)
     return existing_payment
 
 @router.delete("/payments/{payment_id}")
-def delete_payment(payment_id: int, db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
-    existing_payment = db.query(Payment).filter(
+async def delete_payment(payment_id: int, db: AsyncSession = Depends(get_async_db), current_user: dict = Depends(get_current_user)):
+    existing_payment = (await db.execute(select(Payment).filter(
         Payment.id == payment_id,
         Payment.user_id == current_user["id"]
-    ).first()
+    ))).scalars().first()
     
     if not existing_payment:
         raise HTTPException(status_code=404, detail="Payment not found or access denied")
     
-    db.delete(existing_payment)
-    db.commit()
+    await db.delete(existing_payment)
+    await apply_rollup_async(db, current_user["id"], labour_payments=-(existing_payment.amount or 0))
+    await db.commit()
+    hub.publish(current_user["id"], "money", action="deleted", record="labour_payment", id=payment_id)
     return {"message": "Payment deleted successfully"}
 
 # Attendance Routes
 @router.get("/attendance", response_model=list[LabourAttendanceResponse])
-def get_attendance(
+async def get_attendance(
     attendance_date: date = Query(...),
     group_id: Optional[int] = Query(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
-    query = db.query(LabourAttendance).join(Labourer).join(LabourGroup).filter(
+    query = select(LabourAttendance).join(Labourer).join(LabourGroup).filter(
         LabourAttendance.user_id == current_user["id"],
         LabourAttendance.attendance_date == attendance_date,
         LabourGroup.user_id == current_user["id"]
@@ -280,18 +335,18 @@ def get_attendance(
     if group_id is not None:
         query = query.filter(Labourer.group_id == group_id)
 
-    return query.all()
+    return (await db.execute(query)).scalars().all()
 
 
 @router.get("/attendance/history", response_model=list[LabourAttendanceResponse])
-def get_attendance_history(
+async def get_attendance_history(
     start_date: Optional[date] = Query(None),
     end_date: Optional[date] = Query(None),
     group_id: Optional[int] = Query(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: dict = Depends(get_current_user)
 ):
-    query = db.query(LabourAttendance).join(Labourer).join(LabourGroup).filter(
+    query = select(LabourAttendance).join(Labourer).join(LabourGroup).filter(
         LabourAttendance.user_id == current_user["id"],
         LabourGroup.user_id == current_user["id"],
     )
@@ -305,35 +360,40 @@ def get_attendance_history(
     if end_date is not None:
         query = query.filter(LabourAttendance.attendance_date <= end_date)
 
-    return query.options(joinedload(LabourAttendance.labourer)).order_by(LabourAttendance.attendance_date.asc(), LabourAttendance.labourer_id.asc()).all()
+    query = query.order_by(LabourAttendance.attendance_date.asc(), LabourAttendance.labourer_id.asc())
+    return (await db.execute(query)).scalars().all()
 
 
 @router.post("/attendance", response_model=LabourAttendanceResponse)
-def upsert_attendance(
+async def upsert_attendance(
     attendance: LabourAttendanceCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
     if attendance.status not in {"full", "half", "absent"}:
         raise HTTPException(status_code=400, detail="Invalid attendance status")
 
-    labourer = db.query(Labourer).join(LabourGroup).filter(
+    labourer = (await db.execute(select(Labourer).join(LabourGroup).filter(
         Labourer.id == attendance.labourer_id,
         LabourGroup.user_id == current_user["id"]
-    ).first()
+    ))).scalars().first()
     if not labourer:
         raise HTTPException(status_code=404, detail="Labourer not found or access denied")
 
-    existing = db.query(LabourAttendance).filter(
+    existing = (await db.execute(select(LabourAttendance).filter(
         LabourAttendance.user_id == current_user["id"],
         LabourAttendance.labourer_id == attendance.labourer_id,
         LabourAttendance.attendance_date == attendance.attendance_date,
-    ).first()
+    ))).scalars().first()
 
     if existing:
+        await apply_rollup_async(db, current_user["id"], attendance_earnings=(
+            attendance_earnings(attendance.status, labourer.daily_wage) - attendance_earnings(existing.status, labourer.daily_wage)
+        ))
         existing.status = attendance.status
-        db.commit()
-        db.refresh(existing)
+        await db.commit()
+        await db.refresh(existing)
+        hub.publish(current_user["id"], "attendance", action="updated", date=existing.attendance_date, labourer_ids=[existing.labourer_id])
         return existing
 
     new_record = LabourAttendance(
@@ -343,64 +403,77 @@ def upsert_attendance(
         user_id=current_user["id"],
     )
     db.add(new_record)
-    db.commit()
-    db.refresh(new_record)
+    await apply_rollup_async(db, current_user["id"], attendance_earnings=attendance_earnings(attendance.status, labourer.daily_wage))
+    await db.commit()
+    await db.refresh(new_record)
+    hub.publish(current_user["id"], "attendance", action="created", date=new_record.attendance_date, labourer_ids=[new_record.labourer_id])
     return new_record
 
 
 @router.post("/attendance/bulk", response_model=list[LabourAttendanceResponse])
-def bulk_upsert_attendance(
+async def bulk_upsert_attendance(
     payload: LabourAttendanceBulkUpsert,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
     attendance_date = payload.attendance_date
     records = payload.records
-    results: list[LabourAttendance] = []
 
     for record in records:
         if record.status not in {"full", "half", "absent"}:
             raise HTTPException(status_code=400, detail="Invalid attendance status")
 
-        labourer = db.query(Labourer).join(LabourGroup).filter(
-            Labourer.id == record.labourer_id,
-            LabourGroup.user_id == current_user["id"]
-        ).first()
-        if not labourer:
-            raise HTTPException(status_code=404, detail="Labourer not found or access denied")
-
-        existing = db.query(LabourAttendance).filter(
-            LabourAttendance.user_id == current_user["id"],
-            LabourAttendance.labourer_id == record.labourer_id,
-            LabourAttendance.attendance_date == attendance_date,
-        ).first()
-
-        if existing:
-            existing.status = record.status
-            results.append(existing)
-        else:
-            new_record = LabourAttendance(
-                labourer_id=record.labourer_id,
-                attendance_date=attendance_date,
-                status=record.status,
-                user_id=current_user["id"],
-            )
-            db.add(new_record)
-            results.append(new_record)
-
-    db.commit()
-    for r in results:
-        db.refresh(r)
+    def write(session: Session):
+        results: list[LabourAttendance] = []
+        earnings_change = 0
+        for record in records:
+            labourer = session.execute(select(Labourer).join(LabourGroup).filter(
+                Labourer.id == record.labourer_id,
+                LabourGroup.user_id == current_user["id"]
+            )).scalars().first()
+            if not labourer:
+                raise HTTPException(status_code=404, detail="Labourer not found or access denied")
+
+            existing = session.execute(select(LabourAttendance).filter(
+                LabourAttendance.user_id == current_user["id"],
+                LabourAttendance.labourer_id == record.labourer_id,
+                LabourAttendance.attendance_date == attendance_date,
+            )).scalars().first()
+
+            earnings_change += attendance_earnings(record.status, labourer.daily_wage)
+            if existing:
+                earnings_change -= attendance_earnings(existing.status, labourer.daily_wage)
+                existing.status = record.status
+                results.append(existing)
+            else:
+                new_record = LabourAttendance(
+                    labourer_id=record.labourer_id,
+                    attendance_date=attendance_date,
+                    status=record.status,
+                    user_id=current_user["id"],
+                )
+                session.add(new_record)
+                results.append(new_record)
+
+        apply_rollup(session, current_user["id"], attendance_earnings=earnings_change)
+        session.flush()
+        for r in results:
+            session.refresh(r)
+        return results
+
+    results = await run_write(db, write)
+    hub.publish(current_user["id"], "attendance", action="updated", date=attendance_date,
+                labourer_ids=[record.labourer_id for record in records])
     return results
 
 
 @router.get("/attendance/totals", response_model=list[LabourAttendanceTotalResponse])
-def get_attendance_totals(
+async def get_attendance_totals(
     group_id: Optional[int] = Query(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
-    query = db.query(LabourAttendance).join(Labourer).join(LabourGroup).filter(
+    query = select(LabourAttendance).join(Labourer).join(LabourGroup).filter(
         LabourAttendance.user_id == current_user["id"],
         LabourGroup.user_id == current_user["id"],
     )
@@ -409,7 +482,7 @@ def get_attendance_totals(
         query = query.filter(Labourer.group_id == group_id)
 
     totals: dict[int, float] = {}
-    for rec in query.all():
+    for rec in (await db.execute(query)).scalars().all():
         credit = 1.0 if rec.status == "full" else 0.5 if rec.status == "half" else 0.0
         totals[rec.labourer_id] = totals.get(rec.labourer_id, 0.0) + credit
 
@@ -419,47 +492,47 @@ def get_attendance_totals(
 
 # Group Work Routes
 @router.post("/group-work", response_model=GroupWorkResponse)
-def create_group_work(work: GroupWorkCreate, db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
+async def create_group_work(work: GroupWorkCreate, db: AsyncSession = Depends(get_async_db), current_user: dict = Depends(get_current_user)):
     # Verify group belongs to user
-    group = db.query(LabourGroup).filter(
+    group = (await db.execute(select(LabourGroup).filter(
         LabourGroup.id == work.group_id,
         LabourGroup.user_id == current_user["id"]
-    ).first()
+    ))).scalars().first()
     
     if not group:
         raise HTTPException(status_code=404, detail="Labour group not found or access denied")
     
     # Check if record exists for this group and date
-    existing_work = db.query(GroupWork).filter(
+    existing_work = (await db.execute(select(GroupWork).filter(
         GroupWork.group_id == work.group_id,
         GroupWork.work_date == work.work_date,
         GroupWork.user_id == current_user["id"]
-    ).first()
+    ))).scalars().first()
 
     if existing_work:
         # Update existing record
         for key, value in work.dict().items():
             setattr(existing_work, key, value)
-        db.commit()
-        db.refresh(existing_work)
+        await db.commit()
+        await db.refresh(existing_work)
         return existing_work
     
     # Create new record
     new_work = GroupWork(**work.dict(), user_id=current_user["id"])
     db.add(new_work)
-    db.commit()
-    db.refresh(new_work)
+    await db.commit()
+    await db.refresh(new_work)
     return new_work
 
 @router.get("/group-work", response_model=list[GroupWorkWithGroup])
-def get_group_work_history(
+async def get_group_work_history(
     start_date: Optional[date] = Query(None),
     end_date: Optional[date] = Query(None),
     group_id: Optional[int] = Query(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
-    query = db.query(GroupWork).join(LabourGroup).filter(
+    query = select(GroupWork).join(LabourGroup).filter(
         GroupWork.user_id == current_user["id"],
         LabourGroup.user_id == current_user["id"]
     )
@@ -473,4 +546,5 @@ def get_group_work_history(
     if end_date:
         query = query.filter(GroupWork.work_date <= end_date)
     
-    return query.options(joinedload(GroupWork.group)).order_by(GroupWork.work_date.desc(), GroupWork.group_id).all()
+    query = query.options(joinedload(GroupWork.group)).order_by(GroupWork.work_date.desc(), GroupWork.group_id)
+    return (await db.execute(query)).scalars().all()
@@ -1,10 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from app.db import get_db
-from app.models.lot_number import LotNumber
-from app.schemas.lot_number import LotNumberCreate, LotNumberResponse, LotNumberAddPackets
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select, delete, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, defer
+from typing import List, Optional
+from app.db import get_async_db, get_read_db, run_write
+from app.models.field import Field
+from app.models.lot_number import LotNumber, LotField, LotMovement
+from app.models.transportation import Transportation
+from app.schemas.lot_number import (LotNumberCreate, LotNumberResponse, LotNumberSummary, LotNumberAddPackets,
+                                    LotFieldResponse, LotMovementPage, LotMovementResponse)
 from app.utils.jwt import get_current_user
+from app.utils.events import hub
+from app.utils.lot_movements import record_movement
+from app.utils.lot_packets import change_lot_packets
+from app.utils.lot_fields import link_named_fields
 from datetime import datetime
 
 router = APIRouter(tags=["lot-numbers"])
@@ -12,15 +21,15 @@ router = APIRouter(tags=["lot-numbers"])
 @router.post("/", response_model=LotNumberResponse)
 async def create_lot_number(
     lot_number: LotNumberCreate, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
     """Create a new lot number entry"""
     # Check if lot number already exists for this user
-    existing_lot = db.query(LotNumber).filter(
+    existing_lot = (await db.execute(select(LotNumber).filter(
         LotNumber.lot_number == lot_number.lot_number,
         LotNumber.user_id == current_user["id"]
-    ).first()
+    ))).scalars().first()
     
     if existing_lot:
         raise HTTPException(status_code=400, detail="Lot number already exists for your account")
@@ -37,51 +46,37 @@ async def create_lot_number(
         user_id=current_user["id"]
     )
     db.add(db_lot)
-    db.commit()
-    db.refresh(db_lot)
+    await db.flush()
+    record_movement(db, db_lot.id, current_user["id"], "created",
+                    (db_lot.small_packets, db_lot.medium_packets, db_lot.large_packets, db_lot.xlarge_packets))
+    await db.run_sync(link_named_fields, db_lot)
+    await db.commit()
+    await db.refresh(db_lot)
+    hub.publish(current_user["id"], "lot", action="created", id=db_lot.id, lot_number=db_lot.lot_number, total_packets=db_lot.total_packets)
     return db_lot
 
-@router.get("/", response_model=List[LotNumberResponse])
+@router.get("/", response_model=List[LotNumberSummary])
 async def get_all_lot_numbers(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: dict = Depends(get_current_user)
 ):
-    """Get all lot number entries for the current user"""
-    lots = db.query(LotNumber).filter(
+    """Get all lot number entries for the current user (without notes; see GET /{lot_id})"""
+    lots = (await db.execute(select(LotNumber).options(defer(LotNumber.notes)).filter(
         LotNumber.user_id == current_user["id"]
-    ).order_by(LotNumber.storage_date.desc()).all()
-    
-    # Add total_packets to response
-    response_lots = []
-    for lot in lots:
-        lot_dict = {
-            "id": lot.id,
-            "lot_number": lot.lot_number,
-            "field_name": lot.field_name,
-            "small_packets": lot.small_packets,
-            "medium_packets": lot.medium_packets,
-            "large_packets": lot.large_packets,
-            "xlarge_packets": lot.xlarge_packets,
-            "storage_date": lot.storage_date,
-            "notes": lot.notes,
-            "created_at": lot.created_at,
-            "updated_at": lot.updated_at,
-            "total_packets": lot.total_packets
-        }
-        response_lots.append(LotNumberResponse(**lot_dict))
-    return response_lots
+    ).order_by(LotNumber.storage_date.desc()))).scalars().all()
+    return lots
 
 @router.get("/{lot_id}", response_model=LotNumberResponse)
 async def get_lot_number(
     lot_id: int, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
     """Get a specific lot number entry"""
-    lot = db.query(LotNumber).filter(
+    lot = (await db.execute(select(LotNumber).filter(
         LotNumber.id == lot_id,
         LotNumber.user_id == current_user["id"]
-    ).first()
+    ))).scalars().first()
     
     if not lot:
         raise HTTPException(status_code=404, detail="Lot number not found")
@@ -106,29 +101,46 @@ async def get_lot_number(
 async def update_lot_number(
     lot_id: int, 
     lot_number: LotNumberCreate, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
     """Update a lot number entry"""
-    lot = db.query(LotNumber).filter(
+    lot = (await db.execute(select(LotNumber).filter(
         LotNumber.id == lot_id,
         LotNumber.user_id == current_user["id"]
-    ).first()
+    ))).scalars().first()
     
     if not lot:
         raise HTTPException(status_code=404, detail="Lot number not found")
     
     # Check if new lot number conflicts with existing lot for this user
     if lot_number.lot_number != lot.lot_number:
-        existing_lot = db.query(LotNumber).filter(
+        existing_lot = (await db.execute(select(LotNumber).filter(
             LotNumber.lot_number == lot_number.lot_number,
             LotNumber.user_id == current_user["id"],
             LotNumber.id != lot_id
-        ).first()
+        ))).scalars().first()
         
         if existing_lot:
             raise HTTPException(status_code=400, detail="Lot number already exists for your account")
+        
+        # Transportations name their lot by number; one left under the new number (its lot
+        # deleted) would otherwise be merged into this lot by the rename
+        user_fields = select(Field.id).filter(Field.user_id == current_user["id"])
+        taken = (await db.execute(select(Transportation.id).filter(
+            Transportation.lot_number == lot_number.lot_number,
+            Transportation.field_id.in_(user_fields)
+        ).limit(1))).scalar()
+        if taken is not None:
+            raise HTTPException(status_code=400, detail="Transportations already use this lot number")
+        
+        # Carry the rename through to the lot's transportations in the same transaction
+        await db.execute(update(Transportation).where(
+            Transportation.lot_number == lot.lot_number,
+            Transportation.field_id.in_(user_fields)
+        ).values(lot_number=lot_number.lot_number))
     
+    previous = (lot.small_packets or 0, lot.medium_packets or 0, lot.large_packets or 0, lot.xlarge_packets or 0)
     lot.lot_number = lot_number.lot_number
     lot.field_name = lot_number.field_name
     lot.small_packets = lot_number.small_packets
@@ -137,10 +149,15 @@ async def update_lot_number(
     lot.xlarge_packets = lot_number.xlarge_packets
     lot.storage_date = lot_number.storage_date or datetime.now().date()
     lot.notes = lot_number.notes
+    record_movement(db, lot.id, current_user["id"], "adjusted", (
+        lot.small_packets - previous[0], lot.medium_packets - previous[1],
+        lot.large_packets - previous[2], lot.xlarge_packets - previous[3]))
+    await db.run_sync(link_named_fields, lot)
     lot.updated_at = datetime.now()
     
-    db.commit()
-    db.refresh(lot)
+    await db.commit()
+    await db.refresh(lot)
+    hub.publish(current_user["id"], "lot", action="updated", id=lot.id, lot_number=lot.lot_number, total_packets=lot.total_packets)
     
     lot_dict = {
         "id": lot.id,
@@ -162,39 +179,36 @@ async def update_lot_number(
 async def add_packets_to_lot(
     lot_id: int, 
     packet_data: LotNumberAddPackets, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
     """Add additional packets to an existing lot number"""
-    lot = db.query(LotNumber).filter(
-        LotNumber.id == lot_id,
-        LotNumber.user_id == current_user["id"]
-    ).first()
-    
-    if not lot:
-        raise HTTPException(status_code=404, detail="Lot number not found")
-    
     total_additional = (packet_data.small_packets + packet_data.medium_packets + 
                        packet_data.large_packets + packet_data.xlarge_packets)
-    
-    if total_additional <= 0:
-        raise HTTPException(status_code=400, detail="At least one packet type must have packets greater than 0")
-    
-    lot.small_packets += packet_data.small_packets
-    lot.medium_packets += packet_data.medium_packets
-    lot.large_packets += packet_data.large_packets
-    lot.xlarge_packets += packet_data.xlarge_packets
-    lot.updated_at = datetime.now()
-    
-    if packet_data.notes:
-        addition_details = f"S:{packet_data.small_packets}, M:{packet_data.medium_packets}, L:{packet_data.large_packets}, XL:{packet_data.xlarge_packets}"
-        if lot.notes:
-            lot.notes += f"\n{datetime.now().strftime('%Y-%m-%d')}: Added {addition_details}. {packet_data.notes}"
-        else:
-            lot.notes = f"{datetime.now().strftime('%Y-%m-%d')}: Added {addition_details}. {packet_data.notes}"
-    
-    db.commit()
-    db.refresh(lot)
+
+    def write(session: Session):
+        lot = session.execute(select(LotNumber).filter(
+            LotNumber.id == lot_id,
+            LotNumber.user_id == current_user["id"]
+        )).scalars().first()
+        
+        if not lot:
+            raise HTTPException(status_code=404, detail="Lot number not found")
+        
+        if total_additional <= 0:
+            raise HTTPException(status_code=400, detail="At least one packet type must have packets greater than 0")
+        
+        change_lot_packets(session, current_user["id"], lot.lot_number,
+                           (packet_data.small_packets, packet_data.medium_packets,
+                            packet_data.large_packets, packet_data.xlarge_packets),
+                           "added", note=packet_data.notes)
+        
+        session.flush()
+        session.refresh(lot)
+        return lot
+
+    lot = await run_write(db, write)
+    hub.publish(current_user["id"], "lot", action="packets_changed", id=lot.id, lot_number=lot.lot_number, total_packets=lot.total_packets)
     
     lot_dict = {
         "id": lot.id,
@@ -215,49 +229,94 @@ async def add_packets_to_lot(
 @router.delete("/{lot_id}")
 async def delete_lot_number(
     lot_id: int, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
     """Delete a lot number entry"""
-    lot = db.query(LotNumber).filter(
+    lot = (await db.execute(select(LotNumber).filter(
         LotNumber.id == lot_id,
         LotNumber.user_id == current_user["id"]
-    ).first()
+    ))).scalars().first()
     
     if not lot:
         raise HTTPException(status_code=404, detail="Lot number not found")
     
-    db.delete(lot)
-    db.commit()
+    await db.execute(delete(LotMovement).where(LotMovement.lot_id == lot_id))
+    await db.execute(delete(LotField).where(LotField.lot_id == lot_id))
+    await db.delete(lot)
+    await db.commit()
+    hub.publish(current_user["id"], "lot", action="deleted", id=lot_id, lot_number=lot.lot_number)
     return {"message": "Lot number deleted successfully"}
 
-@router.get("/field/{field_name}", response_model=List[LotNumberResponse])
+@router.get("/field/{field_name}", response_model=List[LotNumberSummary])
 async def get_lots_by_field(
     field_name: str, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Get all lot numbers holding packets from a specific field (by name) for the current user"""
+    lots = (await db.execute(select(LotNumber).options(defer(LotNumber.notes))
+        .join(LotField, LotField.lot_id == LotNumber.id)
+        .join(Field, Field.id == LotField.field_id)
+        .filter(
+            Field.field_name == field_name,
+            Field.user_id == current_user["id"]
+        ).distinct().order_by(LotNumber.storage_date.desc()))).scalars().all()
+    return lots
+
+@router.get("/{lot_id}/fields", response_model=List[LotFieldResponse])
+async def get_lot_fields(
+    lot_id: int,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """The fields a lot's packets came from, with each one's transported packets per grade"""
+    rows = (await db.execute(select(LotField, Field.field_name)
+        .join(LotNumber, LotNumber.id == LotField.lot_id)
+        .join(Field, Field.id == LotField.field_id)
+        .filter(
+            LotField.lot_id == lot_id,
+            LotNumber.user_id == current_user["id"]
+        ).order_by(Field.field_name))).all()
+    
+    if not rows:
+        found = (await db.execute(select(LotNumber.id).filter(
+            LotNumber.id == lot_id,
+            LotNumber.user_id == current_user["id"]
+        ))).scalar()
+        if found is None:
+            raise HTTPException(status_code=404, detail="Lot number not found")
+    
+    return [LotFieldResponse.model_validate(link).model_copy(update={"field_name": field_name})
+            for link, field_name in rows]
+
+@router.get("/{lot_id}/movements", response_model=LotMovementPage)
+async def get_lot_movements(
+    lot_id: int,
+    limit: int = Query(50, ge=1, le=500),
+    before: Optional[int] = Query(None, description="next_before from the previous page"),
+    db: AsyncSession = Depends(get_read_db),
     current_user: dict = Depends(get_current_user)
 ):
-    """Get all lot numbers for a specific field for the current user"""
-    lots = db.query(LotNumber).filter(
-        LotNumber.field_name == field_name,
+    """A lot's packet movements, newest first, one page at a time"""
+    found = (await db.execute(select(LotNumber.id).filter(
+        LotNumber.id == lot_id,
         LotNumber.user_id == current_user["id"]
-    ).order_by(LotNumber.storage_date.desc()).all()
+    ))).scalar()
+    
+    if found is None:
+        raise HTTPException(status_code=404, detail="Lot number not found")
+    
+    # Keyset pagination on (lot_id, id), so a deep page costs the same as the first
+    query = (select(LotMovement, Field.field_name)
+             .outerjoin(Field, Field.id == LotMovement.field_id)
+             .filter(LotMovement.lot_id == lot_id)
+             .order_by(LotMovement.id.desc())
+             .limit(limit + 1))
+    if before is not None:
+        query = query.filter(LotMovement.id < before)
+    rows = (await db.execute(query)).all()
     
-    response_lots = []
-    for lot in lots:
-        lot_dict = {
-            "id": lot.id,
-            "lot_number": lot.lot_number,
-            "field_name": lot.field_name,
-            "small_packets": lot.small_packets,
-            "medium_packets": lot.medium_packets,
-            "large_packets": lot.large_packets,
-            "xlarge_packets": lot.xlarge_packets,
-            "storage_date": lot.storage_date,
-            "notes": lot.notes,
-            "created_at": lot.created_at,
-            "updated_at": lot.updated_at,
-            "total_packets": lot.total_packets
-        }
-        response_lots.append(LotNumberResponse(**lot_dict))
-    return response_lots
+    items = [LotMovementResponse.model_validate(movement).model_copy(update={"field_name": field_name})
+             for movement, field_name in rows[:limit]]
+    return LotMovementPage(items=items, next_before=items[-1].id if len(rows) > limit else None)
@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 from app.schemas.money import MoneyRecordCreate, MoneyRecordUpdate, MoneyRecordResponse
 from app.models.money import MoneyRecord
 from app.db import get_db
 from app.utils.jwt import get_current_user
+from app.utils.rollups import apply_rollup
+from app.utils.events import hub
+from datetime import date
+from typing import Optional
 import logging
 
 # Configure logging
@@ -32,8 +36,10 @@ def create_money_record(record: MoneyRecordCreate, db: Session = Depends(get_db)
         # Create the record
         new_record = MoneyRecord(**record.dict(), user_id=current_user["id"])
         db.add(new_record)
+        apply_rollup(db, current_user["id"], expenses=new_record.amount)
         db.commit()
         db.refresh(new_record)
+        hub.publish(current_user["id"], "money", action="created", record="money_record", id=new_record.id, amount=new_record.amount)
         
         logger.info(f"Successfully created money record with ID: {new_record.id}")
         return new_record
@@ -50,8 +56,19 @@ def create_money_record(record: MoneyRecordCreate, db: Session = Depends(get_db)
         raise HTTPException(status_code=500, detail=f"An error occurred while creating money record: {str(e)}")
 
 @router.get("/", response_model=list[MoneyRecordResponse])
-def get_money_records(db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
-    return db.query(MoneyRecord).filter(MoneyRecord.user_id == current_user["id"]).all()
+def get_money_records(
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    # (user_id, payment_date) index: the date bounds are a range scan
+    query = db.query(MoneyRecord).filter(MoneyRecord.user_id == current_user["id"])
+    if start_date:
+        query = query.filter(MoneyRecord.payment_date >= start_date)
+    if end_date:
+        query = query.filter(MoneyRecord.payment_date <= end_date)
+    return query.all()
 
 @router.get("/{id}", response_model=MoneyRecordResponse)
 def get_money_record(id: int, db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
@@ -65,10 +82,13 @@ def update_money_record(id: int, record_update: MoneyRecordUpdate, db: Session =
     record = db.query(MoneyRecord).filter(MoneyRecord.id == id, MoneyRecord.user_id == current_user["id"]).first()
     if not record:
         raise HTTPException(status_code=404, detail="Money record not found")
+    previous_amount = record.amount or 0
     for key, value in record_update.dict(exclude_unset=True).items():
         setattr(record, key, value)
+    apply_rollup(db, current_user["id"], expenses=(record.amount or 0) - previous_amount)
     db.commit()
     db.refresh(record)
+    hub.publish(current_user["id"], "money", action="updated", record="money_record", id=record.id, amount=record.amount)
     return record
 
 @router.delete("/{id}")
@@ -77,5 +97,7 @@ def delete_money_record(id: int, db: Session = Depends(get_db), current_user: di
     if not record:
         raise HTTPException(status_code=404, detail="Money record not found")
     db.delete(record)
+    apply_rollup(db, current_user["id"], expenses=-(record.amount or 0))
     db.commit()
+    hub.publish(current_user["id"], "money", action="deleted", record="money_record", id=id)
     return {"message": "Money record deleted successfully"}
@@ -1,142 +1,248 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import select, insert, update, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 from typing import List
-from app.db import get_db
+from app.db import get_async_db, get_read_db, run_write
 from app.models.transportation import Transportation
 from app.models.field import Field
-from app.models.lot_number import LotNumber
-from app.schemas.transportation import TransportationCreate, TransportationResponse, TransportationUpdate
+from app.models.lot_number import LotMovement
+from app.schemas.transportation import (
+    TransportationCreate, TransportationResponse, TransportationUpdate,
+    TransportationBulkCreate, TransportationBulkResponse, TransportationBulkResult
+)
 from app.utils.jwt import get_current_user
+from app.utils.rollups import apply_rollup, transported_packets
+from app.utils.field_stats import apply_field_stats, packet_deltas
+from app.utils.lot_fields import add_field_packets
+from app.utils.lot_movements import transport_deltas
+from app.utils.lot_packets import change_lot_packets, lot_upsert_statement
+from app.utils.events import hub
 from datetime import datetime, date
 
 router = APIRouter(tags=["transportation"])
 
+# Most rows one /transportations/bulk request may carry (a day's manifest is a few hundred)
+BULK_MAX_ROWS = 5000
+
+def publish_transportation(user_id, action: str, transportation: Transportation, *previous_lots: str):
+    """Tell the user's open streams about a committed transportation change and the lots it touched."""
+    hub.publish(user_id, "transportation", action=action, id=transportation.id, field_id=transportation.field_id,
+                lot_number=transportation.lot_number, total_packets=transportation.total_packets)
+    for lot_number in dict.fromkeys((transportation.lot_number, *previous_lots)):
+        hub.publish(user_id, "lot", action="packets_changed", lot_number=lot_number)
+
+def lock_transportation(session: Session, transportation_id: int, user_id):
+    """The user's transportation, locked until the transaction ends so concurrent edits of it apply one at a time.
+
+    A no-op UPDATE rather than SELECT ... FOR UPDATE, which SQLite lacks: it
+    takes the row lock on PostgreSQL and the write lock on SQLite before the
+    packet counts are read.
+    """
+    return session.execute(
+        update(Transportation).where(
+            Transportation.id == transportation_id,
+            Transportation.field_id.in_(select(Field.id).where(Field.user_id == user_id))
+        ).values(updated_at=func.now()).returning(Transportation)
+    ).scalars().first()
+
 @router.post("/", response_model=TransportationResponse)
 async def create_transportation(
     transportation: TransportationCreate, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
     """Create a new transportation entry"""
-    # Verify field belongs to user
-    field = db.query(Field).filter(
-        Field.id == transportation.field_id,
-        Field.user_id == current_user["id"]
-    ).first()
-    
-    if not field:
-        raise HTTPException(status_code=404, detail="Field not found")
-    
-    # Check if lot number exists for this user
-    existing_lot = db.query(LotNumber).filter(
-        LotNumber.lot_number == transportation.lot_number,
-        LotNumber.user_id == current_user["id"]
-    ).first()
-    
     total_packets = (transportation.small_packets + transportation.medium_packets + 
                     transportation.large_packets + transportation.overlarge_packets)
     
     if total_packets <= 0:
         raise HTTPException(status_code=400, detail="At least one packet type must have packets greater than 0")
-    
-    if existing_lot:
-        # Add packets to existing lot
-        existing_lot.small_packets += transportation.small_packets
-        existing_lot.medium_packets += transportation.medium_packets
-        existing_lot.large_packets += transportation.large_packets
-        existing_lot.xlarge_packets += transportation.overlarge_packets
-        existing_lot.updated_at = datetime.now()
-        
-        # Update field name if different and not already included
-        current_fields = [f.strip() for f in existing_lot.field_name.split(',')]
-        if field.field_name not in current_fields:
-            existing_lot.field_name = f"{existing_lot.field_name}, {field.field_name}"
+
+    def write(session: Session):
+        # Verify field belongs to user
+        field = session.execute(select(Field).filter(
+            Field.id == transportation.field_id,
+            Field.user_id == current_user["id"]
+        )).scalars().first()
         
-        # Add notes about transportation
-        addition_details = f"S:{transportation.small_packets}, M:{transportation.medium_packets}, L:{transportation.large_packets}, XL:{transportation.overlarge_packets}"
-        if existing_lot.notes:
-            existing_lot.notes += f"\n{datetime.now().strftime('%Y-%m-%d')}: Transported from {field.field_name} - {addition_details}. {transportation.notes or ''}"
-        else:
-            existing_lot.notes = f"{datetime.now().strftime('%Y-%m-%d')}: Transported from {field.field_name} - {addition_details}. {transportation.notes or ''}"
+        if not field:
+            raise HTTPException(status_code=404, detail="Field not found")
         
-        db.commit()
-        db.refresh(existing_lot)
-    else:
-        # Create new lot number
-        new_lot = LotNumber(
+        # Create transportation record
+        db_transportation = Transportation(
+            field_id=transportation.field_id,
             lot_number=transportation.lot_number,
-            field_name=field.field_name,
+            transport_date=transportation.transport_date or date.today(),
             small_packets=transportation.small_packets,
             medium_packets=transportation.medium_packets,
             large_packets=transportation.large_packets,
-            xlarge_packets=transportation.overlarge_packets,
-            storage_date=transportation.transport_date or date.today(),
-            notes=f"Created from transportation from {field.field_name}. {transportation.notes or ''}",
-            user_id=current_user["id"]
+            overlarge_packets=transportation.overlarge_packets,
+            notes=transportation.notes
         )
-        db.add(new_lot)
-        db.commit()
-        db.refresh(new_lot)
-    
-    # Create transportation record
-    db_transportation = Transportation(
-        field_id=transportation.field_id,
-        lot_number=transportation.lot_number,
-        transport_date=transportation.transport_date or date.today(),
-        small_packets=transportation.small_packets,
-        medium_packets=transportation.medium_packets,
-        large_packets=transportation.large_packets,
-        overlarge_packets=transportation.overlarge_packets,
-        notes=transportation.notes
-    )
-    db.add(db_transportation)
-    db.commit()
-    db.refresh(db_transportation)
+        session.add(db_transportation)
+        session.flush()
+        # Add the packets to the lot, creating it if this is its first transportation
+        change_lot_packets(session, current_user["id"], transportation.lot_number, transport_deltas(db_transportation),
+                           "transported", field=field, transportation_id=db_transportation.id,
+                           note=transportation.notes, create_on=db_transportation.transport_date)
+        apply_rollup(session, current_user["id"], transported_packets=total_packets)
+        apply_field_stats(session, current_user["id"], (db_transportation.field_id, db_transportation.transport_date,
+                                                        packet_deltas(db_transportation)))
+        session.flush()
+        session.refresh(db_transportation)
+        return db_transportation
+
+    # Lot and transportation are written in one transaction (group-committed
+    # with other writes when the SQLite writer queue is on)
+    db_transportation = await run_write(db, write)
+    publish_transportation(current_user["id"], "created", db_transportation)
     return db_transportation
 
+@router.post("/bulk", response_model=TransportationBulkResponse)
+async def create_transportations_bulk(
+    payload: TransportationBulkCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Create many transportation entries (a day's truck manifest) in one transaction.
+
+    Rows with no packets or an unknown field are skipped and reported in their
+    result; the rest are created together. Ownership is checked with one query,
+    each lot's packets are summed in memory and upserted once, and the rows and
+    their movements are inserted with one executemany each, so a manifest costs
+    a few statements per lot rather than several per row.
+    """
+    rows = payload.transportations
+    if len(rows) > BULK_MAX_ROWS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_MAX_ROWS} transportations per request")
+    today = date.today()
+
+    def write(session: Session):
+        user_id = current_user["id"]
+        field_ids = {row.field_id for row in rows}
+        fields = {field.id: field for field in session.execute(select(Field).filter(
+            Field.user_id == user_id, Field.id.in_(field_ids)
+        )).scalars()} if field_ids else {}
+
+        results = [TransportationBulkResult(index=index) for index in range(len(rows))]
+        accepted, values = [], []
+        for index, row in enumerate(rows):
+            if row.small_packets + row.medium_packets + row.large_packets + row.overlarge_packets <= 0:
+                results[index].error = "At least one packet type must have packets greater than 0"
+            elif row.field_id not in fields:
+                results[index].error = "Field not found"
+            else:
+                accepted.append(index)
+                values.append({
+                    "field_id": row.field_id, "lot_number": row.lot_number,
+                    "transport_date": row.transport_date or today, "small_packets": row.small_packets,
+                    "medium_packets": row.medium_packets, "large_packets": row.large_packets,
+                    "overlarge_packets": row.overlarge_packets, "notes": row.notes,
+                })
+        if not values:
+            return results, []
+
+        # Packets per lot and per (lot, field), and where each lot would be created from
+        lot_totals, field_totals, first_rows = {}, {}, {}
+        for value in values:
+            deltas = (value["small_packets"], value["medium_packets"], value["large_packets"], value["overlarge_packets"])
+            lot_number = value["lot_number"]
+            first_rows.setdefault(lot_number, value)
+            for totals, key in ((lot_totals, lot_number), (field_totals, (lot_number, value["field_id"]))):
+                totals[key] = tuple(map(sum, zip(totals.get(key, (0, 0, 0, 0)), deltas)))
+
+        # One batched INSERT ... RETURNING. SQLite can't return the ids in parameter order
+        # (SQLAlchemy falls back to a statement per row for that), so each returned row is
+        # matched back by its values; rows with equal values are interchangeable anyway.
+        columns = list(values[0])
+        pending = {}
+        for position, value in reversed(list(enumerate(values))):
+            pending.setdefault(tuple(value.values()), []).append(position)
+        ids = [None] * len(values)
+        for transportation_id, *inserted in session.execute(
+            insert(Transportation).returning(Transportation.id, *(Transportation.__table__.c[column] for column in columns)),
+            values
+        ):
+            ids[pending[tuple(inserted)].pop()] = transportation_id
+
+        # Lots in a fixed order, so two manifests sharing lots can't deadlock on PostgreSQL
+        dialect_name = session.get_bind().dialect.name
+        lot_ids = {}
+        for lot_number in sorted(lot_totals):
+            first = first_rows[lot_number]
+            lot_ids[lot_number] = session.execute(lot_upsert_statement(
+                dialect_name, user_id, lot_number, lot_totals[lot_number],
+                fields[first["field_id"]].field_name, first["transport_date"]
+            )).scalar()
+        for (lot_number, field_id), deltas in sorted(field_totals.items()):
+            add_field_packets(session, lot_ids[lot_number], fields[field_id], deltas)
+        session.execute(insert(LotMovement), [{
+            "lot_id": lot_ids[value["lot_number"]], "user_id": user_id, "kind": "transported",
+            "field_id": value["field_id"], "transportation_id": transportation_id,
+            "small_packets": value["small_packets"], "medium_packets": value["medium_packets"],
+            "large_packets": value["large_packets"], "xlarge_packets": value["overlarge_packets"],
+            "note": value["notes"] or None,
+        } for value, transportation_id in zip(values, ids)])
+
+        apply_rollup(session, user_id, transported_packets=sum(sum(deltas) for deltas in lot_totals.values()))
+        apply_field_stats(session, user_id, *((value["field_id"], value["transport_date"], packet_deltas(rows[index]))
+                                              for index, value in zip(accepted, values)))
+        for index, transportation_id in zip(accepted, ids):
+            results[index].id = transportation_id
+        return results, sorted(lot_totals)
+
+    results, lot_numbers = await run_write(db, write)
+    created = [result.id for result in results if result.id is not None]
+    if created:
+        hub.publish(current_user["id"], "transportation", action="created", ids=created)
+        for lot_number in lot_numbers:
+            hub.publish(current_user["id"], "lot", action="packets_changed", lot_number=lot_number)
+    return TransportationBulkResponse(created=len(created), failed=len(results) - len(created), results=results)
+
 @router.get("/", response_model=List[TransportationResponse])
 async def get_all_transportations(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: dict = Depends(get_current_user)
 ):
     """Get all transportation entries for the current user"""
-    transportations = db.query(Transportation).options(joinedload(Transportation.field)).join(Field).filter(
+    transportations = (await db.execute(select(Transportation).join(Field).filter(
         Field.user_id == current_user["id"]
-    ).order_by(Transportation.transport_date.desc()).all()
+    ).order_by(Transportation.transport_date.desc()))).scalars().all()
     return transportations
 
 @router.get("/field/{field_id}", response_model=List[TransportationResponse])
 async def get_transportations_by_field(
     field_id: int, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
     """Get all transportation entries for a specific field"""
     # Verify field belongs to user
-    field = db.query(Field).filter(
+    field = (await db.execute(select(Field).filter(
         Field.id == field_id,
         Field.user_id == current_user["id"]
-    ).first()
+    ))).scalars().first()
     
     if not field:
         raise HTTPException(status_code=404, detail="Field not found")
     
-    transportations = db.query(Transportation).options(joinedload(Transportation.field)).filter(
+    transportations = (await db.execute(select(Transportation).filter(
         Transportation.field_id == field_id
-    ).order_by(Transportation.transport_date.desc()).all()
+    ).order_by(Transportation.transport_date.desc()))).scalars().all()
     return transportations
 
 @router.get("/{transportation_id}", response_model=TransportationResponse)
 async def get_transportation(
     transportation_id: int, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
     """Get a specific transportation entry"""
-    transportation = db.query(Transportation).join(Field).filter(
+    transportation = (await db.execute(select(Transportation).join(Field).filter(
         Transportation.id == transportation_id,
         Field.user_id == current_user["id"]
-    ).first()
+    ))).scalars().first()
     
     if not transportation:
         raise HTTPException(status_code=404, detail="Transportation record not found")
@@ -146,170 +252,84 @@ async def get_transportation(
 async def update_transportation(
     transportation_id: int, 
     transportation_update: TransportationUpdate, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
     """Update a transportation entry"""
-    transportation = db.query(Transportation).join(Field).filter(
-        Transportation.id == transportation_id,
-        Field.user_id == current_user["id"]
-    ).first()
-    
-    if not transportation:
-        raise HTTPException(status_code=404, detail="Transportation record not found")
-    
-    # Get the current lot
-    current_lot = db.query(LotNumber).filter(
-        LotNumber.lot_number == transportation.lot_number,
-        LotNumber.user_id == current_user["id"]
-    ).first()
-    
-    # Store original values for comparison
-    original_small = transportation.small_packets or 0
-    original_medium = transportation.medium_packets or 0
-    original_large = transportation.large_packets or 0
-    original_overlarge = transportation.overlarge_packets or 0
-    original_lot_number = transportation.lot_number
-    
-    # Handle lot number change
-    new_lot_number = transportation_update.lot_number if transportation_update.lot_number is not None else transportation.lot_number
-    
-    if new_lot_number != original_lot_number:
-        # Remove packets from old lot
-        if current_lot:
-            current_lot.small_packets -= original_small
-            current_lot.medium_packets -= original_medium
-            current_lot.large_packets -= original_large
-            current_lot.xlarge_packets -= original_overlarge
-            current_lot.updated_at = datetime.now()
-            
-            # Add note about lot change
-            removal_details = f"S:{original_small}, M:{original_medium}, L:{original_large}, XL:{original_overlarge}"
-            if current_lot.notes:
-                current_lot.notes += f"\n{datetime.now().strftime('%Y-%m-%d')}: Moved to lot {new_lot_number} - {removal_details}"
-            else:
-                current_lot.notes = f"{datetime.now().strftime('%Y-%m-%d')}: Moved to lot {new_lot_number} - {removal_details}"
+    def write(session: Session):
+        transportation = lock_transportation(session, transportation_id, current_user["id"])
         
-        # Find or create new lot
-        new_lot = db.query(LotNumber).filter(
-            LotNumber.lot_number == new_lot_number,
-            LotNumber.user_id == current_user["id"]
-        ).first()
+        if not transportation:
+            raise HTTPException(status_code=404, detail="Transportation record not found")
         
-        field = db.query(Field).filter(Field.id == transportation.field_id).first()
+        field = session.get(Field, transportation.field_id)
         
-        if new_lot:
-            # Add packets to existing new lot
-            new_lot.small_packets += original_small
-            new_lot.medium_packets += original_medium
-            new_lot.large_packets += original_large
-            new_lot.xlarge_packets += original_overlarge
-            new_lot.updated_at = datetime.now()
-            
-            # Update field name if needed
-            current_fields = [f.strip() for f in new_lot.field_name.split(',')]
-            if field.field_name not in current_fields:
-                new_lot.field_name = f"{new_lot.field_name}, {field.field_name}"
-        else:
-            # Create new lot
-            new_lot = LotNumber(
-                lot_number=new_lot_number,
-                field_name=field.field_name,
-                small_packets=original_small,
-                medium_packets=original_medium,
-                large_packets=original_large,
-                xlarge_packets=original_overlarge,
-                storage_date=transportation.transport_date,
-                notes=f"Created from transportation update from {field.field_name}",
-                user_id=current_user["id"]
-            )
-            db.add(new_lot)
+        # Store original values for comparison
+        original = transport_deltas(transportation)
+        removed = transport_deltas(transportation, -1)
+        original_lot_number = transportation.lot_number
+        before_cell = (transportation.field_id, transportation.transport_date, packet_deltas(transportation, -1))
         
+        # Update transportation fields
+        update_data = transportation_update.dict(exclude_unset=True, exclude={"lot_number"})
+        for name, value in update_data.items():
+            setattr(transportation, name, value)
+        new_lot_number = transportation_update.lot_number if transportation_update.lot_number is not None else original_lot_number
         transportation.lot_number = new_lot_number
-        current_lot = new_lot
-    else:
-        # Same lot number, just update field name if needed
-        if current_lot:
-            field = db.query(Field).filter(Field.id == transportation.field_id).first()
-            if current_lot.field_name != field.field_name:
-                current_fields = [f.strip() for f in current_lot.field_name.split(',')]
-                if field.field_name not in current_fields:
-                    current_lot.field_name = f"{current_lot.field_name}, {field.field_name}"
-                current_lot.updated_at = datetime.now()
-    
-    # Update transportation fields
-    update_data = transportation_update.dict(exclude_unset=True, exclude={"lot_number"})
-    for field, value in update_data.items():
-        setattr(transportation, field, value)
-    
-    # Handle packet count changes
-    new_small = transportation.small_packets or 0
-    new_medium = transportation.medium_packets or 0
-    new_large = transportation.large_packets or 0
-    new_overlarge = transportation.overlarge_packets or 0
-    
-    # Calculate differences
-    diff_small = new_small - original_small
-    diff_medium = new_medium - original_medium
-    diff_large = new_large - original_large
-    diff_overlarge = new_overlarge - original_overlarge
-    
-    # Update lot with packet count differences
-    if current_lot and (diff_small != 0 or diff_medium != 0 or diff_large != 0 or diff_overlarge != 0):
-        current_lot.small_packets += diff_small
-        current_lot.medium_packets += diff_medium
-        current_lot.large_packets += diff_large
-        current_lot.xlarge_packets += diff_overlarge
-        current_lot.updated_at = datetime.now()
+        transportation.updated_at = datetime.now()
         
-        # Add note about packet count changes
-        if diff_small != 0 or diff_medium != 0 or diff_large != 0 or diff_overlarge != 0:
-            change_details = f"S:{diff_small:+d}, M:{diff_medium:+d}, L:{diff_large:+d}, XL:{diff_overlarge:+d}"
-            if current_lot.notes:
-                current_lot.notes += f"\n{datetime.now().strftime('%Y-%m-%d')}: Updated transportation - {change_details}"
-            else:
-                current_lot.notes = f"{datetime.now().strftime('%Y-%m-%d')}: Updated transportation - {change_details}"
-    
-    transportation.updated_at = datetime.now()
-    db.commit()
-    db.refresh(transportation)
+        # Handle lot number change: its original packets move to the new lot (created if needed)
+        if new_lot_number != original_lot_number:
+            change_lot_packets(session, current_user["id"], original_lot_number, removed, "moved_out", field=field,
+                               transportation_id=transportation.id, note=f"Moved to lot {new_lot_number}")
+            change_lot_packets(session, current_user["id"], new_lot_number, original, "moved_in", field=field,
+                               transportation_id=transportation.id, note=f"Moved from lot {original_lot_number}",
+                               create_on=transportation.transport_date)
+        
+        # Handle packet count changes
+        diff = tuple(new - old for new, old in zip(transport_deltas(transportation), original))
+        change_lot_packets(session, current_user["id"], new_lot_number, diff, "transport_updated", field=field,
+                           transportation_id=transportation.id)
+        
+        apply_rollup(session, current_user["id"], transported_packets=sum(diff))
+        apply_field_stats(session, current_user["id"], before_cell,
+                          (transportation.field_id, transportation.transport_date, packet_deltas(transportation)))
+        session.flush()
+        session.refresh(transportation)
+        return transportation, original_lot_number
+
+    transportation, original_lot_number = await run_write(db, write)
+    publish_transportation(current_user["id"], "updated", transportation, original_lot_number)
     return transportation
 
 @router.delete("/{transportation_id}")
 async def delete_transportation(
     transportation_id: int, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: dict = Depends(get_current_user)
 ):
     """Delete a transportation entry"""
-    transportation = db.query(Transportation).join(Field).filter(
-        Transportation.id == transportation_id,
-        Field.user_id == current_user["id"]
-    ).first()
-    
-    if not transportation:
-        raise HTTPException(status_code=404, detail="Transportation record not found")
-    
-    # Remove packets from lot number
-    lot = db.query(LotNumber).filter(
-        LotNumber.lot_number == transportation.lot_number,
-        LotNumber.user_id == current_user["id"]
-    ).first()
-    
-    if lot:
-        lot.small_packets -= transportation.small_packets
-        lot.medium_packets -= transportation.medium_packets
-        lot.large_packets -= transportation.large_packets
-        lot.xlarge_packets -= transportation.overlarge_packets
-        lot.updated_at = datetime.now()
+    def write(session: Session):
+        # The deleted row's own values, so a concurrent delete or update can't make us subtract stale counts
+        transportation = session.execute(
+            delete(Transportation).where(
+                Transportation.id == transportation_id,
+                Transportation.field_id.in_(select(Field.id).where(Field.user_id == current_user["id"]))
+            ).returning(Transportation)
+        ).scalars().first()
         
-        # Add note about removal
-        removal_details = f"S:{transportation.small_packets}, M:{transportation.medium_packets}, L:{transportation.large_packets}, XL:{transportation.overlarge_packets}"
-        if lot.notes:
-            lot.notes += f"\n{datetime.now().strftime('%Y-%m-%d')}: Removed transportation - {removal_details}"
-        else:
-            lot.notes = f"{datetime.now().strftime('%Y-%m-%d')}: Removed transportation - {removal_details}"
-    
-    db.delete(transportation)
-    db.commit()
+        if not transportation:
+            raise HTTPException(status_code=404, detail="Transportation record not found")
+        
+        # Remove packets from lot number
+        change_lot_packets(session, current_user["id"], transportation.lot_number, transport_deltas(transportation, -1),
+                           "transport_deleted", field=session.get(Field, transportation.field_id),
+                           transportation_id=transportation.id)
+        apply_rollup(session, current_user["id"], transported_packets=-transported_packets(transportation))
+        apply_field_stats(session, current_user["id"], (transportation.field_id, transportation.transport_date,
+                                                        packet_deltas(transportation, -1)))
+        return transportation
+
+    transportation = await run_write(db, write)
+    publish_transportation(current_user["id"], "deleted", transportation)
     return {"message": "Transportation record deleted successfully"}
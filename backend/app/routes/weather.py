@@ -1,12 +1,120 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date
+from typing import Dict, Optional, Sequence, Tuple
+import asyncio
 import httpx
+import logging
+import time
 from app.config import settings
+from app.db import AsyncSessionLocal, get_async_db, run_write
+from app.models.field import Field
+from app.utils import geocoding
+from app.utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.utils.forecast import compact_forecast
+from app.utils.http_client import get_http_client
 from app.utils.jwt import get_current_user
+from app.utils.metrics import WEATHER_UPSTREAM_DURATION
+from app.utils.weather_cache import weather_cache
 
 router = APIRouter()
+logger = logging.getLogger("app.weather")
 
-WEATHER_API_BASE_URL = "https://api.openweathermap.org/data/2.5"
-GEO_API_BASE_URL = "https://api.openweathermap.org/geo/1.0"
+WEATHER_API_BASE_URL = f"{settings.OPENWEATHER_BASE_URL}/data/2.5"
+GEO_API_BASE_URL = f"{settings.OPENWEATHER_BASE_URL}/geo/1.0"
+
+# Everything that means "no answer from upstream in time": fall back, or 503
+UPSTREAM_ERRORS = (httpx.HTTPError, CircuitOpenError, TimeoutError)
+
+upstream_breaker = CircuitBreaker(
+    "openweathermap",
+    failure_rate=settings.WEATHER_BREAKER_FAILURE_RATE,
+    min_calls=settings.WEATHER_BREAKER_MIN_CALLS,
+    window=settings.WEATHER_BREAKER_WINDOW,
+    open_seconds=settings.WEATHER_BREAKER_OPEN_SECONDS,
+    half_open_calls=settings.WEATHER_BREAKER_HALF_OPEN_CALLS,
+    slow_seconds=settings.WEATHER_BREAKER_SLOW_SECONDS,
+)
+
+async def fetch_upstream(endpoint: str, url: str, params: dict):
+    """GET an OpenWeatherMap endpoint, recording its latency and outcome in /metrics.
+
+    Raises CircuitOpenError without trying while the breaker is open.
+    """
+    permit = upstream_breaker.check()
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        response = await get_http_client().get(url, params=params)
+        outcome = "ok" if response.is_success else f"http_{response.status_code // 100}xx"
+        response.raise_for_status()
+        return response.json()
+    except httpx.TimeoutException:
+        outcome = "timeout"
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        WEATHER_UPSTREAM_DURATION.observe(duration, endpoint=endpoint, outcome=outcome)
+        # A 4xx is our request (key, unknown place), not the upstream being unhealthy
+        upstream_breaker.record(permit, outcome in ("ok", "http_4xx"), duration)
+
+def upstream_fetcher(endpoint: str, url: str, **params):
+    """fetch(lat, lon) for one OpenWeatherMap endpoint, as the weather cache calls it."""
+    async def fetch(lat: float, lon: float):
+        return await fetch_upstream(endpoint, url, {"lat": lat, "lon": lon, "appid": settings.WEATHER_API_KEY, **params})
+    return fetch
+
+async def fetch_compact_forecast(lat: float, lon: float):
+    return compact_forecast(await FETCHERS["forecast"](lat, lon))
+
+# Cache entry kind -> fetch(lat, lon). The compact forecast is cached in its compact form.
+FETCHERS = {
+    "current": upstream_fetcher("current", f"{WEATHER_API_BASE_URL}/weather", units="metric"),
+    "forecast": upstream_fetcher("forecast", f"{WEATHER_API_BASE_URL}/forecast", units="metric"),
+    "forecast_compact": fetch_compact_forecast,
+    "reverse_geocode": upstream_fetcher("reverse_geocode", f"{GEO_API_BASE_URL}/reverse", limit=1),
+}
+
+async def cached_upstream(endpoint: str, lat: float, lon: float):
+    """FETCHERS[endpoint] through the weather cache, which snaps (lat, lon) to its grid cell.
+
+    Routes wrap the result in JSONResponse: it is already plain JSON, and
+    jsonable_encoder walking a 40-entry forecast costs several times the dump.
+    """
+    fetch = FETCHERS[endpoint]
+    if not settings.WEATHER_CACHE_ENABLED:
+        return await fetch(lat, lon)
+    return await weather_cache.get(endpoint, lat, lon, fetch)
+
+def request_deadline() -> float:
+    """Event-loop time by which a weather request must answer, whatever upstream is doing."""
+    return asyncio.get_running_loop().time() + settings.WEATHER_DEADLINE_SECONDS
+
+async def upstream_or_last_good(endpoint: str, lat: float, lon: float, deadline: float):
+    """(response, None), or (last good response, its age in seconds) when upstream fails or misses the deadline.
+
+    Upstream errors propagate only if this cell was never fetched successfully.
+    A shared cache fetch that overruns the deadline keeps going for the
+    requests after this one.
+    """
+    try:
+        async with asyncio.timeout_at(deadline):
+            return await cached_upstream(endpoint, lat, lon), None
+    except UPSTREAM_ERRORS as e:
+        fallback = weather_cache.last_good(endpoint, lat, lon)
+        if fallback is None:
+            raise
+        logger.info("Serving last good %s for (%s, %s), %.0fs old: %r", endpoint, lat, lon, fallback.age(), e)
+        return fallback.value, fallback.age()
+
+def weather_json(data, stale_age):
+    """JSONResponse of upstream data; a fallback says so in X-Weather-Stale and Age headers."""
+    headers = None
+    if stale_age is not None:
+        headers = {"X-Weather-Stale": "true", "Age": str(int(stale_age))}
+    return JSONResponse(data, headers=headers)
 
 @router.get("/current")
 async def get_current_weather(
@@ -19,52 +127,36 @@ async def get_current_weather(
         raise HTTPException(status_code=503, detail="Weather service not configured")
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{WEATHER_API_BASE_URL}/weather",
-                params={
-                    "lat": lat,
-                    "lon": lon,
-                    "appid": settings.WEATHER_API_KEY,
-                    "units": "metric"
-                },
-                timeout=10.0
-            )
-            response.raise_for_status()
-            return response.json()
-    except httpx.HTTPError as e:
+        data, stale_age = await upstream_or_last_good("current", lat, lon, request_deadline())
+    except UPSTREAM_ERRORS as e:
         raise HTTPException(status_code=503, detail="Weather service unavailable")
     except Exception as e:
         raise HTTPException(status_code=500, detail="Failed to fetch weather data")
+    return weather_json(data, stale_age)
 
 @router.get("/forecast")
 async def get_weather_forecast(
     lat: float,
     lon: float,
+    compact: bool = False,
     current_user: dict = Depends(get_current_user)
 ):
-    """Proxy endpoint for 7-day weather forecast."""
+    """Proxy endpoint for 7-day weather forecast.
+
+    ``compact=true`` returns daily summaries (see app/utils/forecast.py)
+    instead of the raw 3-hourly entries, about a twentieth of the size.
+    """
     if not settings.WEATHER_API_KEY:
         raise HTTPException(status_code=503, detail="Weather service not configured")
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{WEATHER_API_BASE_URL}/forecast",
-                params={
-                    "lat": lat,
-                    "lon": lon,
-                    "appid": settings.WEATHER_API_KEY,
-                    "units": "metric"
-                },
-                timeout=10.0
-            )
-            response.raise_for_status()
-            return response.json()
-    except httpx.HTTPError as e:
+        data, stale_age = await upstream_or_last_good(
+            "forecast_compact" if compact else "forecast", lat, lon, request_deadline())
+    except UPSTREAM_ERRORS as e:
         raise HTTPException(status_code=503, detail="Weather service unavailable")
     except Exception as e:
         raise HTTPException(status_code=500, detail="Failed to fetch forecast data")
+    return weather_json(data, stale_age)
 
 @router.get("/location")
 async def get_location_name(
@@ -77,20 +169,141 @@ async def get_location_name(
         raise HTTPException(status_code=503, detail="Weather service not configured")
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{GEO_API_BASE_URL}/reverse",
-                params={
-                    "lat": lat,
-                    "lon": lon,
-                    "limit": 1,
-                    "appid": settings.WEATHER_API_KEY
-                },
-                timeout=10.0
-            )
-            response.raise_for_status()
-            return response.json()
-    except httpx.HTTPError as e:
+        data, stale_age = await upstream_or_last_good("reverse_geocode", lat, lon, request_deadline())
+    except UPSTREAM_ERRORS as e:
         raise HTTPException(status_code=503, detail="Geocoding service unavailable")
     except Exception as e:
         raise HTTPException(status_code=500, detail="Failed to fetch location data")
+    return weather_json(data, stale_age)
+
+async def locate_fields(db: AsyncSession, fields: Sequence, semaphore: asyncio.Semaphore,
+                        deadline: Optional[float] = None) -> Dict[int, Tuple[float, float]]:
+    """Coordinates of ``fields`` by id, geocoding (and storing) those that only have a location.
+
+    A field whose location can't be geocoded right now (or by ``deadline``) is
+    left out and tried again next time.
+    """
+    coordinates = {field.id: (field.latitude, field.longitude) for field in fields if field.latitude is not None}
+    pending = [field for field in fields if geocoding.needs_geocoding(field)]
+    if not pending:
+        return coordinates
+    locations = {geocoding.normalize(field.location): field.location.strip() for field in pending}
+    answers = await geocoding.lookup(db, locations)
+    fetched = {}
+
+    async def geocode(query: str):
+        async with semaphore:
+            try:
+                async with asyncio.timeout_at(deadline):
+                    payload = await geocoding.fetch_once(query, lambda: fetch_upstream(
+                        "geocode", f"{GEO_API_BASE_URL}/direct",
+                        {"q": locations[query], "limit": 1, "appid": settings.WEATHER_API_KEY}))
+            except UPSTREAM_ERRORS as e:
+                logger.warning("Geocoding %r failed: %r", locations[query], e)
+                return
+        fetched[query] = geocoding.parse_direct(payload)
+        found = fetched[query]["latitude"] is not None
+        answers[query] = (fetched[query]["latitude"], fetched[query]["longitude"]) if found else None
+
+    await asyncio.gather(*(geocode(query) for query in locations if query not in answers))
+    located = {}
+    for field in pending:
+        found = answers.get(geocoding.normalize(field.location))
+        if found is not None:
+            coordinates[field.id] = found
+            located[field.id] = (field.location, found)
+    if fetched or located:
+        await run_write(db, lambda session: geocoding.record(session, fetched, located))
+    return coordinates
+
+@router.get("/fields")
+async def get_fields_weather(
+    compact: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Forecasts for all of the user's fields in one response.
+
+    Fields without coordinates are geocoded from their location first, and the
+    result is saved on the field. Fields in the same grid cell share one cached
+    forecast (daily summaries with ``compact=true``, as for /weather/forecast).
+    When upstream fails or is slow, a field gets the last good
+    forecast for its cell, marked ``stale`` with its ``age_seconds``.
+    ``forecast`` is null, with an ``error``, for a field that has no usable
+    location or no forecast at all.
+    """
+    if not settings.WEATHER_API_KEY:
+        raise HTTPException(status_code=503, detail="Weather service not configured")
+
+    fields = (await db.execute(
+        select(Field.id, Field.field_name, Field.location, Field.latitude, Field.longitude)
+        .where(Field.user_id == current_user["id"])
+        .order_by(Field.id)
+    )).all()
+    deadline = request_deadline()
+    semaphore = asyncio.Semaphore(settings.WEATHER_FIELDS_CONCURRENCY)
+    coordinates = await locate_fields(db, fields, semaphore, deadline)
+
+    async def field_forecast(field):
+        latitude, longitude = coordinates.get(field.id, (None, None))
+        entry = {"field_id": field.id, "field_name": field.field_name, "location": field.location,
+                 "latitude": latitude, "longitude": longitude, "forecast": None, "stale": False,
+                 "age_seconds": None, "error": None}
+        if latitude is None:
+            entry["error"] = "not_geocoded" if geocoding.needs_geocoding(field) else "no_location"
+            return entry
+        try:
+            async with semaphore:
+                entry["forecast"], stale_age = await upstream_or_last_good(
+                    "forecast_compact" if compact else "forecast", latitude, longitude, deadline)
+        except UPSTREAM_ERRORS:
+            entry["error"] = "unavailable"
+            return entry
+        if stale_age is not None:
+            entry["stale"], entry["age_seconds"] = True, int(stale_age)
+        return entry
+
+    return JSONResponse(await asyncio.gather(*(field_forecast(field) for field in fields)))
+
+async def prewarm_forecasts(interval: float) -> int:
+    """Refresh the cached compact forecast of every active field's cell before it expires; returns the cells warmed.
+
+    Active fields are this year's and last year's. Fields still without
+    coordinates are geocoded on the way.
+    """
+    semaphore = asyncio.Semaphore(settings.WEATHER_FIELDS_CONCURRENCY)
+    async with AsyncSessionLocal() as db:
+        fields = (await db.execute(
+            select(Field.id, Field.location, Field.latitude, Field.longitude)
+            .where(Field.year >= date.today().year - 1)
+        )).all()
+        coordinates = await locate_fields(db, fields, semaphore)
+
+    cells = {weather_cache.snap(latitude, longitude) for latitude, longitude in coordinates.values()}
+    # Whatever would expire before the next run is refreshed now
+    min_age = max(0.0, weather_cache.ttls["forecast_compact"] - interval)
+
+    async def warm(cell):
+        async with semaphore:
+            try:
+                await weather_cache.warm("forecast_compact", *cell, FETCHERS["forecast_compact"], min_age)
+            except CircuitOpenError:
+                pass
+            except httpx.HTTPError as e:
+                logger.warning("Pre-warming the forecast for %s failed: %r", cell, e)
+
+    await asyncio.gather(*(warm(cell) for cell in cells))
+    return len(cells)
+
+async def run_prewarm(interval: float):
+    """Lifespan task: pre-warm forecasts every ``interval`` seconds, so dashboards don't wait on upstream."""
+    while True:
+        try:
+            started = time.perf_counter()
+            cells = await prewarm_forecasts(interval)
+            logger.debug("Pre-warmed %d forecast cells in %.1fs", cells, time.perf_counter() - started)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Weather pre-warm failed")
+        await asyncio.sleep(interval)
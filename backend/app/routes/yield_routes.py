@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from app.schemas.yield_schema import YieldCreate, YieldUpdate, YieldResponse
 from app.models.yield_model import Yield
 from app.models.field import Field
 from app.db import get_db
 from app.utils.jwt import get_current_user
+from app.utils.rollups import apply_rollup, yield_deltas
+from app.utils.field_stats import apply_field_stats
+from app.utils.events import hub
+from datetime import date
+from typing import Optional
 
 router = APIRouter()
 
@@ -15,16 +20,31 @@ def create_yield(field_id: int, yield_data: YieldCreate, db: Session = Depends(g
         raise HTTPException(status_code=404, detail="Field not found")
     new_yield = Yield(**yield_data.dict(), field_id=field_id)
     db.add(new_yield)
+    apply_rollup(db, current_user["id"], **yield_deltas(new_yield))
+    apply_field_stats(db, current_user["id"], (field_id, new_yield.date, yield_deltas(new_yield)))
     db.commit()
     db.refresh(new_yield)
+    hub.publish(current_user["id"], "yield", action="created", id=new_yield.id, field_id=field_id)
     return new_yield
 
 @router.get("/{field_id}/yields", response_model=list[YieldResponse])
-def get_yields(field_id: int, db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
+def get_yields(
+    field_id: int,
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
     field = db.query(Field).filter(Field.id == field_id, Field.user_id == current_user["id"]).first()
     if not field:
         raise HTTPException(status_code=404, detail="Field not found")
-    yields = db.query(Yield).filter(Yield.field_id == field_id).all()
+    # (field_id, date) index: the date bounds are a range scan
+    query = db.query(Yield).filter(Yield.field_id == field_id)
+    if start_date:
+        query = query.filter(Yield.date >= start_date)
+    if end_date:
+        query = query.filter(Yield.date <= end_date)
+    yields = query.all()
     return yields
 
 @router.get("/{field_id}/yields/{yield_id}", response_model=YieldResponse)
@@ -45,8 +65,14 @@ def update_yield(field_id: int, yield_id: int, yield_update: YieldUpdate, db: Se
     yield_record = db.query(Yield).filter(Yield.id == yield_id, Yield.field_id == field_id).first()
     if not yield_record:
         raise HTTPException(status_code=404, detail="Yield record not found")
+    before = yield_deltas(yield_record, -1)
+    before_cell = (yield_record.field_id, yield_record.date, before)
     for key, value in yield_update.dict(exclude_unset=True).items():
         setattr(yield_record, key, value)
+    after = yield_deltas(yield_record)
+    apply_rollup(db, current_user["id"], **{column: after[column] + before[column] for column in after})
+    apply_field_stats(db, current_user["id"], before_cell, (yield_record.field_id, yield_record.date, after))
     db.commit()
     db.refresh(yield_record)
+    hub.publish(current_user["id"], "yield", action="updated", id=yield_record.id, field_id=field_id)
     return yield_record
@@ -1,13 +1,13 @@
 from pydantic import BaseModel
 from typing import Optional
-from datetime import datetime
+from datetime import date
 
 class BorrowingBase(BaseModel):
     borrower_name: str
     amount: float
-    borrow_date: str
-    expected_return_date: Optional[str] = None
-    actual_return_date: Optional[str] = None
+    borrow_date: date
+    expected_return_date: Optional[date] = None
+    actual_return_date: Optional[date] = None
     status: Optional[str] = "pending"
     notes: Optional[str] = None
 
@@ -17,9 +17,9 @@ class BorrowingCreate(BorrowingBase):
 class BorrowingUpdate(BaseModel):
     borrower_name: Optional[str] = None
     amount: Optional[float] = None
-    borrow_date: Optional[str] = None
-    expected_return_date: Optional[str] = None
-    actual_return_date: Optional[str] = None
+    borrow_date: Optional[date] = None
+    expected_return_date: Optional[date] = None
+    actual_return_date: Optional[date] = None
     status: Optional[str] = None
     notes: Optional[str] = None
 
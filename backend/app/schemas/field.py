@@ -4,6 +4,8 @@ from typing import Optional
 class FieldBase(BaseModel):
     field_name: str
     location: Optional[str] = None
+    latitude: Optional[float] = None  # leave both empty to have them looked up from location
+    longitude: Optional[float] = None
     area: float
     season: Optional[str] = None
     year: int
@@ -14,6 +16,8 @@ class FieldCreate(FieldBase):
 class FieldUpdate(BaseModel):  # Schema for partial updates
     field_name: Optional[str] = None
     location: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
     area: Optional[float] = None
     season: Optional[str] = None
     year: Optional[int] = None
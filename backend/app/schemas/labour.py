@@ -127,8 +127,8 @@ class TaskBase(BaseModel):
     task_name: str
     field_id: int
     group_id: int
-    start_date: str
-    end_date: str
+    start_date: date
+    end_date: date
     payment_type: str
     rate: float
 
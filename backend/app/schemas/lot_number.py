@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import date, datetime
-from typing import Optional
+from typing import List, Optional
 
 class LotNumberBase(BaseModel):
     lot_number: str
@@ -24,6 +24,23 @@ class LotNumberResponse(LotNumberBase):
     class Config:
         from_attributes = True
 
+class LotNumberSummary(BaseModel):
+    """A lot in listings: everything but ``notes``, which can be long (older lots carry their history there)."""
+    id: int
+    lot_number: str
+    field_name: str
+    small_packets: int = 0
+    medium_packets: int = 0
+    large_packets: int = 0
+    xlarge_packets: int = 0
+    storage_date: Optional[date] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    total_packets: int  # Computed property
+
+    class Config:
+        from_attributes = True
+
 class LotNumberUpdate(BaseModel):
     lot_number: Optional[str] = None
     field_name: Optional[str] = None
@@ -40,3 +57,39 @@ class LotNumberAddPackets(BaseModel):
     large_packets: int = 0
     xlarge_packets: int = 0
     notes: Optional[str] = None
+
+class LotFieldResponse(BaseModel):
+    """A field's contribution to a lot: the packets transported from it that are in the lot."""
+    field_id: int
+    field_name: Optional[str] = None
+    small_packets: int
+    medium_packets: int
+    large_packets: int
+    xlarge_packets: int
+    total_packets: int  # Computed property
+
+    class Config:
+        from_attributes = True
+
+class LotMovementResponse(BaseModel):
+    """One journal entry; packet counts are deltas (negative when packets left the lot)."""
+    id: int
+    lot_id: int
+    kind: str
+    field_id: Optional[int] = None
+    field_name: Optional[str] = None
+    transportation_id: Optional[int] = None
+    small_packets: int
+    medium_packets: int
+    large_packets: int
+    xlarge_packets: int
+    total_packets: int  # Computed property
+    note: Optional[str] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class LotMovementPage(BaseModel):
+    items: List[LotMovementResponse]
+    next_before: Optional[int] = None  # pass as ?before= for the next (older) page; None on the last page
@@ -1,10 +1,11 @@
 from pydantic import BaseModel
 from typing import Optional
+from datetime import date
 
 class MoneyRecordBase(BaseModel):
     paid_to: str
     amount: float
-    payment_date: str
+    payment_date: date
     payment_method: str
     notes: Optional[str]
 
@@ -14,7 +15,7 @@ class MoneyRecordCreate(MoneyRecordBase):
 class MoneyRecordUpdate(BaseModel):
     paid_to: Optional[str]
     amount: Optional[float]
-    payment_date: Optional[str]
+    payment_date: Optional[date]
     payment_method: Optional[str]
     notes: Optional[str]
 
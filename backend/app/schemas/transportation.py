@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import date, datetime
-from typing import Optional
+from typing import List, Optional
 
 class TransportationBase(BaseModel):
     lot_number: str
@@ -14,6 +14,19 @@ class TransportationBase(BaseModel):
 class TransportationCreate(TransportationBase):
     field_id: int
 
+class TransportationBulkCreate(BaseModel):
+    transportations: List[TransportationCreate]
+
+class TransportationBulkResult(BaseModel):
+    index: int  # position in the request's list
+    id: Optional[int] = None  # set when the row was created
+    error: Optional[str] = None  # why the row was skipped
+
+class TransportationBulkResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[TransportationBulkResult]
+
 class TransportationResponse(TransportationBase):
     id: int
     field_id: int
@@ -1,8 +1,9 @@
 from pydantic import BaseModel
 from typing import Optional
+import datetime
 
 class YieldBase(BaseModel):
-    date: str
+    date: datetime.date
     large: Optional[float] = 0
     medium: Optional[float] = 0
     small: Optional[float] = 0
@@ -13,7 +14,7 @@ class YieldCreate(YieldBase):
     pass
 
 class YieldUpdate(BaseModel):
-    date: Optional[str]
+    date: Optional[datetime.date]
     large: Optional[float]
     medium: Optional[float]
     small: Optional[float]
@@ -0,0 +1,135 @@
+"""Circuit breaker for an upstream service (OpenWeatherMap, see routes/weather.py).
+
+When the upstream is down or slow, every call used to wait out the full
+timeout, and a burst of dashboard loads piled up behind it. The breaker
+records each call's outcome over the last ``window`` seconds:
+
+* closed: calls go through. Once at least ``min_calls`` were made in the window
+  and ``failure_rate`` of them failed, it opens;
+* open: calls are refused straight away (``CircuitOpenError``) for
+  ``open_seconds``, so callers fall back at once;
+* half-open: then up to ``half_open_calls`` probe calls are let through. If
+  they all succeed the breaker closes; if one fails it opens again.
+
+Errors, timeouts and calls slower than ``slow_seconds`` count as failures.
+``allow()`` says whether to try, handing out a ``Permit``; callers report the
+outcome with ``record(permit, ...)``. While half-open only the probes'
+outcomes count: a call let through before the breaker opened may still finish
+then, and must not close it. State is per worker.
+"""
+import logging
+import time
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+from app.utils import metrics
+
+logger = logging.getLogger("app.circuit_breaker")
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+BREAKER_STATE = metrics.registry.gauge(
+    "circuit_breaker_state", "Circuit breaker state on this worker: 0 closed, 1 half-open, 2 open", ("name",))
+BREAKER_TRANSITIONS = metrics.registry.counter(
+    "circuit_breaker_transitions_total", "Circuit breaker state changes", ("name", "state"))
+BREAKER_REJECTED = metrics.registry.counter(
+    "circuit_breaker_rejected_total", "Calls refused without trying because the breaker was open", ("name",))
+
+
+class CircuitOpenError(Exception):
+    """The breaker refused the call; the upstream is not tried."""
+
+
+class Permit:
+    """A call allow() let through. ``probe`` is the half-open round it probes, None for a closed call."""
+    __slots__ = ("probe",)
+
+    def __init__(self, probe: Optional[int] = None):
+        self.probe = probe
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_rate: float, min_calls: int, window: float,
+                 open_seconds: float, half_open_calls: int, slow_seconds: Optional[float] = None):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.slow_seconds = slow_seconds
+        self.state = CLOSED
+        self._outcomes: Deque[Tuple[float, bool]] = deque()  # (monotonic time, failed)
+        self._failures = 0
+        self._opened_at = 0.0
+        self._round = 0  # counts half-open rounds, so a permit knows which one it probes
+        self._probes = 0  # probe calls let through while half-open
+        self._probe_successes = 0
+        BREAKER_STATE.set_function(lambda: STATE_VALUES[self.state], name=name)
+
+    def allow(self) -> Optional[Permit]:
+        """The permit to make the call now, or None. While half-open a permit reserves one probe."""
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                BREAKER_REJECTED.inc(name=self.name)
+                return None
+            self._transition(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self._probes >= self.half_open_calls:
+                BREAKER_REJECTED.inc(name=self.name)
+                return None
+            self._probes += 1
+            return Permit(self._round)
+        return Permit()
+
+    def check(self) -> Permit:
+        """allow(), raising CircuitOpenError when the call should not be made."""
+        permit = self.allow()
+        if permit is None:
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        return permit
+
+    def record(self, permit: Permit, ok: bool, duration: Optional[float] = None):
+        """Report the outcome of the call ``permit`` let through.
+
+        A successful call slower than ``slow_seconds`` counts as a failure.
+        """
+        failed = not ok or (self.slow_seconds is not None and duration is not None and duration > self.slow_seconds)
+        if self.state == HALF_OPEN:
+            if permit.probe != self._round:
+                return  # not one of this round's probes
+            if failed:
+                self._open()
+            else:
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_calls:
+                    self._transition(CLOSED)
+            return
+        if self.state == OPEN:
+            return  # a call that started before the breaker opened
+        now = time.monotonic()
+        self._outcomes.append((now, failed))
+        self._failures += failed
+        while self._outcomes and self._outcomes[0][0] < now - self.window:
+            self._failures -= self._outcomes.popleft()[1]
+        calls = len(self._outcomes)
+        if calls >= self.min_calls and self._failures / calls >= self.failure_rate:
+            self._open()
+
+    def _open(self):
+        self._opened_at = time.monotonic()
+        self._transition(OPEN)
+
+    def _transition(self, state: str):
+        if state == self.state:
+            return
+        logger.warning("%s circuit breaker %s -> %s", self.name, self.state, state)
+        self.state = state
+        self._probes = self._probe_successes = 0
+        if state == HALF_OPEN:
+            self._round += 1
+        if state == CLOSED:
+            self._outcomes.clear()
+            self._failures = 0
+        BREAKER_TRANSITIONS.inc(name=self.name, state=state)
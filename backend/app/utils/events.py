@@ -0,0 +1,256 @@
+"""Per-user change notifications for the /events stream.
+
+Write routes call ``hub.publish(user_id, topic, **data)`` once their
+transaction has committed (after ``db.commit()`` or ``run_write``). Every
+open /events connection of that user, on any worker, then receives a small
+server-sent event such as ``event: transportation`` /
+``data: {"action": "created", "id": 12, "lot_number": "L-7", ...}``, so the
+dashboard and lot pages refetch only when something changed instead of
+polling.
+
+Within a worker the hub hands events to per-connection queues. Workers don't
+share memory, so with ``EVENTS_BROKER_URL`` set each one also relays its
+events through a broker that forwards them to every other worker. The broker
+here is a deliberately small stand-in (newline-delimited JSON over TCP) that
+runs next to the workers on one host::
+
+    python -m app.utils.events broker --port 7070
+
+Delivery is at most once. A client that falls ``EVENTS_QUEUE_SIZE`` events
+behind, or whose worker lost the broker for a while, gets a ``resync``
+event instead and should refetch everything it shows.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from typing import Dict, Optional, Set
+from urllib.parse import urlparse
+
+from app.config import settings
+from app.utils import metrics
+
+logger = logging.getLogger("app.events")
+
+TOPICS = ("yield", "transportation", "lot", "attendance", "money")
+
+EVENTS_CONNECTIONS = metrics.registry.gauge(
+    "events_connections", "Open /events streams on this worker")
+EVENTS_PUBLISHED = metrics.registry.counter(
+    "events_published_total", "Change notifications published by this worker", ("topic",))
+EVENTS_RESYNCS = metrics.registry.counter(
+    "events_resyncs_total", "Streams told to resync after falling behind or a broker outage", ("reason",))
+
+
+class Subscriber:
+    """One open stream: a bounded queue of (event name, JSON data) pairs."""
+
+    def __init__(self, user_id: str, queue_size: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    def offer(self, name: str, data: str):
+        try:
+            self.queue.put_nowait((name, data))
+        except asyncio.QueueFull:
+            # Too far behind to catch up event by event; have the client refetch instead
+            self.resync("slow_client")
+
+    def resync(self, reason: str):
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(("resync", json.dumps({"reason": reason})))
+        EVENTS_RESYNCS.inc(reason=reason)
+
+
+class EventHub:
+    def __init__(self, queue_size: int, max_connections: int, broker_url: Optional[str] = None):
+        self.queue_size = queue_size
+        self.max_connections = max_connections
+        self.broker_url = broker_url
+        self._subscribers: Dict[str, Set[Subscriber]] = {}
+        self._count = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._broker_task: Optional[asyncio.Task] = None
+        self._broker_writer: Optional[asyncio.StreamWriter] = None
+        EVENTS_CONNECTIONS.set_function(lambda: self._count)
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        if self.broker_url and self._broker_task is None:
+            self._broker_task = asyncio.create_task(self._broker_link())
+
+    async def stop(self):
+        if self._broker_task is not None:
+            self._broker_task.cancel()
+            try:
+                await self._broker_task
+            except asyncio.CancelledError:
+                pass
+            self._broker_task = None
+
+    @property
+    def connections(self) -> int:
+        return self._count
+
+    # -- subscribers (event loop only) ------------------------------------------
+    def subscribe(self, user_id) -> Optional[Subscriber]:
+        """Register a stream for ``user_id``; None when this worker is at EVENTS_MAX_CONNECTIONS."""
+        if self._count >= self.max_connections:
+            return None
+        subscriber = Subscriber(str(user_id), self.queue_size)
+        self._subscribers.setdefault(subscriber.user_id, set()).add(subscriber)
+        self._count += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        streams = self._subscribers.get(subscriber.user_id)
+        if streams is None or subscriber not in streams:
+            return
+        streams.discard(subscriber)
+        if not streams:
+            del self._subscribers[subscriber.user_id]
+        self._count -= 1
+
+    def _deliver(self, user_id: str, name: str, payload: dict):
+        streams = self._subscribers.get(user_id)
+        if not streams:
+            return
+        # Encoded once however many tabs the user has open
+        data = json.dumps(payload, default=str)
+        for subscriber in list(streams):
+            subscriber.offer(name, data)
+
+    def _resync_all(self, reason: str):
+        for streams in list(self._subscribers.values()):
+            for subscriber in list(streams):
+                subscriber.resync(reason)
+
+    # -- publishing -------------------------------------------------------------
+    def publish(self, user_id, topic: str, **data):
+        """Notify ``user_id``'s streams on every worker; call after the change has committed.
+
+        Safe from sync routes too: they run in the threadpool, so the work is
+        handed to the event loop.
+        """
+        if topic not in TOPICS:
+            raise ValueError(f"Unknown event topic: {topic}")
+        if self._loop is None:
+            return  # not started (scripts, tests without the lifespan)
+        EVENTS_PUBLISHED.inc(topic=topic)
+        message = (str(user_id), topic, data)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._publish(*message)
+        else:
+            self._loop.call_soon_threadsafe(self._publish, *message)
+
+    def _publish(self, user_id: str, topic: str, data: dict):
+        self._deliver(user_id, topic, data)
+        if self._broker_writer is not None:
+            line = json.dumps({"user_id": user_id, "topic": topic, "data": data}, default=str)
+            self._broker_writer.write(line.encode() + b"\n")
+
+    # -- cross-worker fan-out ------------------------------------------------------
+    async def _broker_link(self):
+        """Stay connected to the broker, delivering other workers' events to local streams."""
+        url = urlparse(self.broker_url)
+        delay = 0.5
+        lost = False
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(url.hostname, url.port)
+            except OSError as exc:
+                if not lost:
+                    logger.warning("Events broker %s unreachable (%s); other workers' events are not delivered", self.broker_url, exc)
+                    lost = True
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 10.0)
+                continue
+            if lost:
+                # Whatever other workers published meanwhile is gone
+                self._resync_all("broker_reconnect")
+                logger.info("Reconnected to events broker %s", self.broker_url)
+            self._broker_writer = writer
+            delay = 0.5
+            try:
+                while line := await reader.readline():
+                    try:
+                        message = json.loads(line)
+                        self._deliver(message["user_id"], message["topic"], message["data"])
+                    except (ValueError, KeyError):
+                        logger.warning("Ignoring malformed broker message %r", line[:200])
+            except OSError:
+                pass
+            finally:
+                self._broker_writer = None
+                writer.close()
+            logger.warning("Lost events broker %s; reconnecting", self.broker_url)
+            lost = True
+
+
+hub = EventHub(
+    queue_size=settings.EVENTS_QUEUE_SIZE,
+    max_connections=settings.EVENTS_MAX_CONNECTIONS,
+    broker_url=settings.EVENTS_BROKER_URL,
+)
+
+
+# -- stand-in broker -----------------------------------------------------------------
+class Broker:
+    """Relays every line a worker sends to all the other connected workers."""
+
+    # A worker this far behind is dropped; it reconnects and resyncs its streams
+    MAX_BUFFER = 4 * 1024 * 1024
+
+    def __init__(self):
+        self.clients: Set[asyncio.StreamWriter] = set()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.clients.add(writer)
+        try:
+            while line := await reader.readline():
+                for client in list(self.clients):
+                    if client is writer:
+                        continue
+                    if client.transport.get_write_buffer_size() > self.MAX_BUFFER:
+                        logger.warning("Dropping worker %s: not reading", client.get_extra_info("peername"))
+                        self.clients.discard(client)
+                        client.close()
+                        continue
+                    client.write(line)
+        except OSError:
+            pass
+        finally:
+            self.clients.discard(writer)
+            writer.close()
+
+
+async def serve_broker(host: str, port: int):
+    broker = Broker()
+    server = await asyncio.start_server(broker.handle, host, port)
+    logger.info("Events broker listening on %s:%d", host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the stand-in events broker shared by the API workers.")
+    parser.add_argument("command", choices=["broker"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7070)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(serve_broker(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""Incrementally maintained per-field monthly stats cube (``field_month_stats``).
+
+One row per (user, field, year, month) holding the yield by grade, packets
+transported and task labour cost dated in that month. As with the user
+rollups (app/utils/rollups.py), each route that writes a yield,
+transportation or task passes ``(field_id, date, deltas)`` changes to
+``apply_field_stats``/``apply_field_stats_async`` inside its own transaction.
+Changes are netted per cell: an edit that stays in its month is a single
+upsert, and one that moves a record to another month or field subtracts it
+from the old cell and adds it to the new one.
+
+``base_cells()`` computes the cube from the base tables. It backs the
+consistency check and the rebuild, from the admin endpoints or the shell::
+
+    python -m app.utils.field_stats check [--user ID]
+    python -m app.utils.field_stats rebuild [--user ID]
+"""
+import argparse
+import sys
+
+from sqlalchemy import select, delete, func, cast, extract, insert, literal_column, union_all, Integer
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.models.field import Field
+from app.models.yield_model import Yield
+from app.models.labour import Task
+from app.models.transportation import Transportation
+from app.models.rollup import FieldMonthStat
+from app.utils.rollups import TOLERANCE
+
+STAT_COLUMNS = (
+    "yield_large", "yield_medium", "yield_small", "yield_overlarge",
+    "transported_packets",
+    "task_labour_cost",
+)
+
+KEY_COLUMNS = ("user_id", "field_id", "year", "month")
+
+
+def net_changes(changes) -> dict:
+    """``(field_id, date, deltas)`` changes summed per (field_id, year, month); records without a field don't count."""
+    cells = {}
+    for field_id, day, deltas in changes:
+        unknown = set(deltas) - set(STAT_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown field stat columns: {', '.join(sorted(unknown))}")
+        if field_id is None or day is None:
+            continue
+        cell = cells.setdefault((field_id, day.year, day.month), {})
+        for column, value in deltas.items():
+            cell[column] = cell.get(column, 0) + (value or 0)
+    return cells
+
+
+def field_stats_statements(dialect_name: str, user_id, changes):
+    """One upsert per cell whose totals change."""
+    table = FieldMonthStat.__table__
+    dialect_insert = sqlite_insert if dialect_name == "sqlite" else postgresql_insert
+    for (field_id, year, month), deltas in net_changes(changes).items():
+        deltas = {column: value for column, value in deltas.items() if value}
+        if not deltas:
+            continue
+        stmt = dialect_insert(table).values(user_id=user_id, field_id=field_id, year=year, month=month, **deltas)
+        yield stmt.on_conflict_do_update(
+            index_elements=[table.c[column] for column in KEY_COLUMNS],
+            set_={**{column: table.c[column] + stmt.excluded[column] for column in deltas}, "updated_at": func.now()},
+        )
+
+
+def apply_field_stats(session, user_id, *changes):
+    """Add ``(field_id, date, deltas)`` changes to the cube in the session's transaction (sync sessions / run_write)."""
+    for stmt in field_stats_statements(session.get_bind().dialect.name, user_id, changes):
+        session.execute(stmt)
+
+
+async def apply_field_stats_async(db, user_id, *changes):
+    """Add ``(field_id, date, deltas)`` changes to the cube in the AsyncSession's transaction."""
+    for stmt in field_stats_statements(db.get_bind().dialect.name, user_id, changes):
+        await db.execute(stmt)
+
+
+def packet_deltas(record, sign: int = 1) -> dict:
+    return {"transported_packets": sign * ((record.small_packets or 0) + (record.medium_packets or 0)
+                                           + (record.large_packets or 0) + (record.overlarge_packets or 0))}
+
+
+def base_cells(user_id=None):
+    """Every cube cell recomputed from the base tables, in ``KEY_COLUMNS + STAT_COLUMNS`` order."""
+    def source(day, *values, table):
+        stmt = select(
+            Field.user_id.label("user_id"),
+            Field.id.label("field_id"),
+            cast(extract("year", day), Integer).label("year"),
+            cast(extract("month", day), Integer).label("month"),
+            *[value.label(column) for column, value in zip(STAT_COLUMNS, values)],
+        ).select_from(table).join(Field)
+        return stmt.filter(Field.user_id == user_id) if user_id is not None else stmt
+
+    zero = literal_column("0")
+    rows = union_all(
+        source(Yield.date, Yield.large, Yield.medium, Yield.small, Yield.overlarge, zero, zero, table=Yield),
+        source(Transportation.transport_date, zero, zero, zero, zero,
+               func.coalesce(Transportation.small_packets, 0) + func.coalesce(Transportation.medium_packets, 0)
+               + func.coalesce(Transportation.large_packets, 0) + func.coalesce(Transportation.overlarge_packets, 0),
+               zero, table=Transportation),
+        source(Task.start_date, zero, zero, zero, zero, zero, Task.rate, table=Task),
+    ).subquery()
+    keys = [rows.c[column] for column in KEY_COLUMNS]
+    return select(*keys, *[func.sum(rows.c[column]).label(column) for column in STAT_COLUMNS]).group_by(*keys)
+
+
+def check_field_stats(conn, user_id=None) -> list[dict]:
+    """Differences between ``field_month_stats`` and the base tables; empty when consistent."""
+    expected = {tuple(row[:4]): row for row in map(list, conn.execute(base_cells(user_id)).all())}
+    stored_stmt = select(*[FieldMonthStat.__table__.c[column] for column in KEY_COLUMNS + STAT_COLUMNS])
+    if user_id is not None:
+        stored_stmt = stored_stmt.where(FieldMonthStat.user_id == user_id)
+    stored = {tuple(row[:4]): row for row in map(list, conn.execute(stored_stmt).all())}
+
+    mismatches = []
+    for key in sorted(set(expected) | set(stored)):
+        want_row, have_row = expected.get(key), stored.get(key)
+        for i, column in enumerate(STAT_COLUMNS, start=len(KEY_COLUMNS)):
+            want = (want_row[i] if want_row else 0) or 0
+            have = (have_row[i] if have_row else 0) or 0
+            if abs(want - have) > TOLERANCE:
+                mismatches.append({**dict(zip(KEY_COLUMNS, key)), "column": column, "expected": want, "stored": have})
+    return mismatches
+
+
+def rebuild_field_stats(conn, user_id=None) -> int:
+    """Replace the cube (all users, or one) with cells recomputed from the base tables."""
+    stmt = delete(FieldMonthStat)
+    if user_id is not None:
+        stmt = stmt.where(FieldMonthStat.user_id == user_id)
+    conn.execute(stmt)
+    result = conn.execute(insert(FieldMonthStat).from_select([*KEY_COLUMNS, *STAT_COLUMNS], base_cells(user_id)))
+    return result.rowcount
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check or rebuild the per-field monthly stats cube.")
+    parser.add_argument("command", choices=["check", "rebuild"])
+    parser.add_argument("--user", type=int, help="only this user id")
+    args = parser.parse_args(argv)
+
+    from app.db import engine
+
+    if args.command == "rebuild":
+        with engine.begin() as conn:
+            count = rebuild_field_stats(conn, args.user)
+        print(f"Rebuilt {count} field stat cell(s)")
+        return 0
+
+    with engine.connect() as conn:
+        mismatches = check_field_stats(conn, args.user)
+    for mismatch in mismatches:
+        print(f"user {mismatch['user_id']} field {mismatch['field_id']} {mismatch['year']}-{mismatch['month']:02d}: "
+              f"{mismatch['column']} stored {mismatch['stored']} but base tables give {mismatch['expected']}")
+    print("Field stats consistent" if not mismatches else f"{len(mismatches)} mismatch(es); run `python -m app.utils.field_stats rebuild`")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
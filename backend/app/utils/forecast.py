@@ -0,0 +1,75 @@
+"""Daily summaries of OpenWeatherMap's 5-day/3-hour forecast.
+
+The upstream payload is about 40 verbose entries, roughly 16 KB of JSON. The
+dashboard and mobile clients only show one line per day, so
+``compact_forecast()`` reduces it to a list of days like this (under 1 KB in
+all)::
+
+    {"date": "2026-10-17", "day": "Saturday", "temp_min": 18, "temp_max": 29,
+     "rain_probability": 40, "condition": "Rain", "description": "light rain",
+     "humidity": 64, "wind_speed": 11, "wind_max": 19}
+
+Days are local to the forecast location (the payload's ``city.timezone``).
+Temperatures are in °C (the proxy asks for metric units) and wind in km/h.
+``rain_probability`` is the highest 3-hour probability of precipitation in
+the day, as a percentage. ``condition`` is the day's most frequent condition,
+in the labels the app already shows; ties go to the more severe one.
+"""
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+
+# OpenWeatherMap "main" condition -> the label the app shows (as in frontend/src/services/weather.js)
+CONDITION_LABELS = {
+    "clear": "Sunny",
+    "clouds": "Cloudy",
+    "rain": "Rain",
+    "drizzle": "Light Rain",
+    "thunderstorm": "Thunderstorm",
+    "mist": "Fog",
+    "fog": "Fog",
+}
+DEFAULT_LABEL = "Partly Cloudy"
+
+# Ties in a day's condition count go to the one earliest here
+SEVERITY = ["thunderstorm", "snow", "rain", "drizzle", "fog", "mist", "haze", "clouds", "clear"]
+
+
+def condition_label(main: str) -> str:
+    return CONDITION_LABELS.get(main.lower(), DEFAULT_LABEL)
+
+
+def _severity(main: str) -> int:
+    main = main.lower()
+    return SEVERITY.index(main) if main in SEVERITY else len(SEVERITY)
+
+
+def compact_forecast(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """``{"location": city name, "days": [...]}`` from a /data/2.5/forecast response."""
+    city = payload.get("city") or {}
+    offset = timedelta(seconds=city.get("timezone") or 0)
+    by_day: Dict[str, List[dict]] = {}
+    for entry in payload.get("list", []):
+        local = datetime.fromtimestamp(entry["dt"], timezone.utc) + offset
+        by_day.setdefault(local.strftime("%Y-%m-%d"), []).append(entry)
+
+    days = []
+    for day, entries in sorted(by_day.items()):
+        mains = Counter((entry.get("weather") or [{}])[0].get("main", "") for entry in entries)
+        dominant = min(mains, key=lambda main: (-mains[main], _severity(main)))
+        description = next(((entry.get("weather") or [{}])[0].get("description", "")
+                            for entry in entries if (entry.get("weather") or [{}])[0].get("main", "") == dominant), "")
+        speeds = [entry.get("wind", {}).get("speed", 0) * 3.6 for entry in entries]
+        days.append({
+            "date": day,
+            "day": datetime.strptime(day, "%Y-%m-%d").strftime("%A"),
+            "temp_min": round(min(entry["main"].get("temp_min", entry["main"]["temp"]) for entry in entries)),
+            "temp_max": round(max(entry["main"].get("temp_max", entry["main"]["temp"]) for entry in entries)),
+            "rain_probability": round(max(entry.get("pop", 0) for entry in entries) * 100),
+            "condition": condition_label(dominant),
+            "description": description,
+            "humidity": round(sum(entry["main"].get("humidity", 0) for entry in entries) / len(entries)),
+            "wind_speed": round(sum(speeds) / len(speeds)),
+            "wind_max": round(max(speeds)),
+        })
+    return {"location": city.get("name"), "days": days}
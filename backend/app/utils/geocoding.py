@@ -0,0 +1,108 @@
+"""Coordinates for fields from their free-text ``location``.
+
+Weather needs coordinates, but fields only had a place name. Each distinct
+(normalised) place name is forward-geocoded once through OpenWeatherMap and
+the answer is kept in ``geocode_results``. Every field with that location, for
+any user, reuses it, across restarts. A field stores its own copy in
+``latitude``/``longitude``, plus the text it came from in
+``geocoded_location``, so editing the location triggers a new lookup (see
+routes/field.py).
+
+Places the geocoder doesn't know are remembered as well, and retried after
+``GEOCODE_RETRY_SECONDS``. Concurrent lookups of the same name within a worker
+share one upstream call. The upstream call itself is passed in (``fetch``),
+as with the weather cache.
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.field import Field
+from app.models.geocode import GeocodeResult
+
+Coordinates = Tuple[float, float]
+
+_inflight: Dict[str, asyncio.Task] = {}
+
+
+def normalize(location: str) -> str:
+    return " ".join(location.split()).casefold()
+
+
+def needs_geocoding(field: Field) -> bool:
+    return field.latitude is None and bool(field.location and field.location.strip())
+
+
+def parse_direct(payload: Any) -> dict:
+    """Columns of a GeocodeResult from a /geo/1.0/direct response (a list of matches, best first)."""
+    if not payload:
+        return {"latitude": None, "longitude": None, "name": None, "country": None}
+    best = payload[0]
+    return {"latitude": best.get("lat"), "longitude": best.get("lon"), "name": best.get("name"), "country": best.get("country")}
+
+
+async def lookup(db: AsyncSession, queries: Iterable[str]) -> Dict[str, Optional[Coordinates]]:
+    """Stored answers that are still usable: coordinates, or None for a recent miss."""
+    queries = list(queries)
+    if not queries:
+        return {}
+    retry_after = datetime.now(timezone.utc) - timedelta(seconds=settings.GEOCODE_RETRY_SECONDS)
+    rows = (await db.execute(select(GeocodeResult).where(GeocodeResult.query.in_(queries)))).scalars().all()
+    known = {}
+    for row in rows:
+        if row.latitude is not None:
+            known[row.query] = (row.latitude, row.longitude)
+        elif _aware(row.fetched_at) > retry_after:
+            known[row.query] = None
+    return known
+
+
+async def fetch_once(query: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+    """Run ``fetch()`` for ``query`` unless a call for it is already in flight, in which case share that one."""
+    task = _inflight.get(query)
+    if task is None:
+        task = asyncio.create_task(fetch())
+        _inflight[query] = task
+        task.add_done_callback(lambda _: _inflight.pop(query, None))
+    return await asyncio.shield(task)
+
+
+def geocode_statement(dialect_name: str, query: str, columns: dict, fetched_at: datetime):
+    """The upsert storing an answer for ``query``, replacing any earlier one (a retried miss, or a racing request's)."""
+    table = GeocodeResult.__table__
+    dialect_insert = sqlite_insert if dialect_name == "sqlite" else postgresql_insert
+    values = {**columns, "fetched_at": fetched_at}
+    return dialect_insert(table).values(query=query, **values).on_conflict_do_update(
+        index_elements=[table.c.query], set_=values
+    )
+
+
+def record(session: Session, fetched: Dict[str, dict], fields: Dict[int, Tuple[str, Coordinates]]):
+    """Persist new geocoder answers and the coordinates found for ``fields`` ({id: (location, (lat, lon))}).
+
+    Run through ``run_write``. A field whose coordinates were set meanwhile (by
+    hand, or another request) keeps them.
+    """
+    now = datetime.now(timezone.utc)
+    dialect_name = session.get_bind().dialect.name
+    # Lookups are only coalesced within a worker, so another request may store the same query first
+    for query, columns in fetched.items():
+        session.execute(geocode_statement(dialect_name, query, columns, now))
+    for field_id, (location, (latitude, longitude)) in fields.items():
+        session.execute(
+            update(Field)
+            .where(Field.id == field_id, Field.latitude.is_(None))
+            .values(latitude=latitude, longitude=longitude, geocoded_location=location)
+        )
+
+
+def _aware(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
@@ -0,0 +1,96 @@
+"""One pooled ``httpx.AsyncClient`` per worker for outbound calls (OpenWeatherMap).
+
+Opening a client per request paid a TCP connect and TLS handshake on every
+weather lookup. The shared client is created in the application lifespan and
+keeps up to ``UPSTREAM_MAX_KEEPALIVE`` idle connections per host alive for
+``UPSTREAM_KEEPALIVE_EXPIRY`` seconds. It speaks HTTP/2 when the ``h2``
+package is installed (``UPSTREAM_HTTP2``), so concurrent requests share one
+connection. It is closed at shutdown.
+
+Every response is counted in ``upstream_requests_total`` with
+``connection="new"`` when the request had to open a connection and
+``"reused"`` otherwise, so the reuse rate is::
+
+    sum(rate(upstream_requests_total{connection="reused"}[5m])) / sum(rate(upstream_requests_total[5m]))
+"""
+import importlib.util
+import logging
+from typing import Optional
+
+import httpx
+
+from app.config import settings
+from app.utils import metrics
+
+logger = logging.getLogger("app.http_client")
+
+UPSTREAM_REQUESTS = metrics.registry.counter(
+    "upstream_requests_total", "Outbound HTTP requests by host, protocol and whether a new connection was opened",
+    ("host", "http_version", "connection"))
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def http2_available() -> bool:
+    return importlib.util.find_spec("h2") is not None
+
+
+async def _trace_connections(request: httpx.Request):
+    """Mark the request if httpcore opens a connection for it (a pooled one was not available)."""
+    async def trace(event_name: str, info: dict):
+        if event_name == "connection.connect_tcp.complete":
+            request.extensions["upstream_new_connection"] = True
+
+    request.extensions["trace"] = trace
+
+
+async def _count_response(response: httpx.Response):
+    request = response.request
+    UPSTREAM_REQUESTS.inc(
+        host=request.url.host,
+        http_version=response.http_version,
+        connection="new" if request.extensions.get("upstream_new_connection") else "reused",
+    )
+
+
+def create_http_client() -> httpx.AsyncClient:
+    http2 = settings.UPSTREAM_HTTP2 and http2_available()
+    if settings.UPSTREAM_HTTP2 and not http2:
+        logger.info("UPSTREAM_HTTP2 is on but the h2 package is not installed; using HTTP/1.1")
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=settings.UPSTREAM_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.UPSTREAM_MAX_KEEPALIVE,
+            keepalive_expiry=settings.UPSTREAM_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(
+            connect=settings.UPSTREAM_CONNECT_TIMEOUT,
+            read=settings.UPSTREAM_READ_TIMEOUT,
+            write=settings.UPSTREAM_READ_TIMEOUT,
+            pool=settings.UPSTREAM_POOL_TIMEOUT,
+        ),
+        event_hooks={"request": [_trace_connections], "response": [_count_response]},
+    )
+
+
+async def start_http_client():
+    global _client
+    if _client is None:
+        _client = create_http_client()
+
+
+async def close_http_client():
+    """Close pooled connections at shutdown (after in-flight requests have finished)."""
+    global _client
+    client, _client = _client, None
+    if client is not None:
+        await client.aclose()
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """The worker's shared client; created on first use outside the lifespan (scripts, benchmarks)."""
+    global _client
+    if _client is None:
+        _client = create_http_client()
+    return _client
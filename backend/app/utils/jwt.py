@@ -10,9 +10,10 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
     try:
         payload = verify_token(token)
         user_id = payload.get("sub")
-        if user_id is None:
+        if user_id is None or not str(user_id).isdigit():
             raise HTTPException(status_code=401, detail="Invalid token")
-        return {"id": user_id}
+        # ``sub`` is a string in the token; routes bind the id into Integer columns
+        return {"id": int(user_id)}
     except ValueError as e:
         raise HTTPException(status_code=401, detail=str(e))
     except Exception:
@@ -0,0 +1,239 @@
+"""Event-loop lag and threadpool saturation monitor.
+
+Sync endpoints run in anyio's worker threadpool while ``async def`` endpoints
+run on the event loop itself, so a slow request can hurt everyone else in two
+different ways: by hogging the loop, or by queueing behind a full threadpool.
+
+The monitor has two halves:
+
+* a sampler coroutine that sleeps ``LOOP_MONITOR_INTERVAL`` seconds at a time
+  and records how late it wakes up (event-loop lag), plus the threadpool's
+  in-flight and waiting counts;
+* a watchdog thread that notices when the sampler's heartbeat is overdue by
+  more than ``LOOP_STALL_THRESHOLD_MS`` and, while the loop is still stuck,
+  grabs the loop thread's stack to name the route that is blocking it.
+
+``RequestTrackingMiddleware`` keeps the set of in-flight requests so stalls
+and snapshots can be attributed to route templates rather than raw paths.
+"""
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+import anyio.to_thread
+
+from app.config import settings
+
+logger = logging.getLogger("app.monitor")
+
+# Frames under this directory are our code; anything else is a library
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _percentile(samples, p):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def route_name(scope) -> str:
+    """Route template for a request scope (``/lot-numbers/{lot_id}``), falling back to the raw path."""
+    route = scope.get("route")
+    if route is not None and getattr(route, "path", None):
+        return f"{scope.get('method', '')} {scope.get('root_path', '')}{route.path}".strip()
+    return f"{scope.get('method', '')} {scope.get('path', '')}".strip()
+
+
+class LoopMonitor:
+    def __init__(self, interval: float, stall_threshold_ms: float, window: int = 600):
+        self.interval = interval
+        self.stall_threshold = stall_threshold_ms / 1000
+        self.lag_samples = deque(maxlen=window)
+        self.stalls = deque(maxlen=50)
+        self.threadpool = {"in_flight": 0, "waiting": 0, "capacity": 0, "max_waiting": 0}
+        self.in_flight = {}
+        self._expected_wakeup = None
+        self._reported_wakeup = None
+        self._loop_thread_id = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    # -- lifecycle -------------------------------------------------------
+    async def start(self):
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._sample())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info("Loop monitor started (interval=%.2fs, stall threshold=%.0fms)", self.interval, self.stall_threshold * 1000)
+
+    async def stop(self):
+        self._stopping.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+            self._watchdog = None
+
+    # -- request tracking --------------------------------------------------
+    def request_started(self, scope):
+        self.in_flight[id(scope)] = (scope, time.perf_counter())
+
+    def request_finished(self, scope):
+        self.in_flight.pop(id(scope), None)
+
+    # -- sampling ----------------------------------------------------------
+    async def _sample(self):
+        limiter = anyio.to_thread.current_default_thread_limiter()
+        while True:
+            started = time.perf_counter()
+            self._expected_wakeup = started + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            self.lag_samples.append(lag)
+
+            previously_waiting = self.threadpool["waiting"]
+            waiting = limiter.statistics().tasks_waiting
+            self.threadpool.update(
+                in_flight=limiter.borrowed_tokens,
+                waiting=waiting,
+                capacity=limiter.total_tokens,
+                max_waiting=max(self.threadpool["max_waiting"], waiting),
+            )
+            # Log once per saturation episode rather than on every sample
+            if waiting and not previously_waiting:
+                logger.warning("threadpool_saturated %s", json.dumps({
+                    "in_flight": limiter.borrowed_tokens,
+                    "waiting": waiting,
+                    "capacity": limiter.total_tokens,
+                    "routes": self._in_flight_counts(),
+                }))
+
+            if lag >= self.stall_threshold:
+                with self._lock:
+                    # The watchdog already logged this stall while it was happening;
+                    # now that the loop is back we know how long it really lasted.
+                    if self.stalls and self.stalls[-1]["wakeup"] == self._expected_wakeup:
+                        self.stalls[-1]["duration_ms"] = round(lag * 1000, 1)
+                    else:
+                        self._record_stall(lag, culprit=None)
+
+    def _watch(self):
+        poll = min(self.stall_threshold / 2, 0.05)
+        while not self._stopping.wait(poll):
+            expected = self._expected_wakeup
+            if expected is None or expected == self._reported_wakeup:
+                continue
+            overdue = time.perf_counter() - expected
+            if overdue < self.stall_threshold:
+                continue
+            self._reported_wakeup = expected
+            with self._lock:
+                self._record_stall(overdue, culprit=self._blocking_route())
+
+    def _record_stall(self, lag, culprit):
+        stall = {
+            "at": time.time(),
+            "wakeup": self._expected_wakeup,
+            "duration_ms": round(lag * 1000, 1),
+            "route": culprit,
+            "in_flight": self._in_flight_routes(),
+        }
+        self.stalls.append(stall)
+        logger.warning("event_loop_stall %s", json.dumps({k: v for k, v in stall.items() if k != "wakeup"}))
+
+    def _blocking_route(self) -> Optional[str]:
+        """Name the in-flight route whose handler is on the loop thread's stack right now."""
+        frame = sys._current_frames().get(self._loop_thread_id)
+        endpoints = {}
+        for scope, _ in list(self.in_flight.values()):
+            endpoint = scope.get("endpoint")
+            code = getattr(endpoint, "__code__", None)
+            if code is not None:
+                endpoints[code] = route_name(scope)
+        innermost_app_frame = None
+        while frame is not None:
+            if frame.f_code in endpoints:
+                return endpoints[frame.f_code]
+            if innermost_app_frame is None and frame.f_code.co_filename.startswith(_APP_DIR):
+                innermost_app_frame = f"{frame.f_globals.get('__name__')}:{frame.f_code.co_name}"
+            frame = frame.f_back
+        return innermost_app_frame
+
+    def _in_flight_routes(self):
+        now = time.perf_counter()
+        return [
+            {"route": route_name(scope), "age_ms": round((now - started) * 1000, 1)}
+            for scope, started in list(self.in_flight.values())
+        ]
+
+    def _in_flight_counts(self):
+        counts = {}
+        for scope, _ in list(self.in_flight.values()):
+            name = route_name(scope)
+            counts[name] = counts.get(name, 0) + 1
+        return counts
+
+    # -- reporting ---------------------------------------------------------
+    def snapshot(self) -> dict:
+        samples = list(self.lag_samples)
+        with self._lock:
+            stalls = [{k: v for k, v in stall.items() if k != "wakeup"} for stall in self.stalls]
+        return {
+            "running": self._task is not None,
+            "interval_s": self.interval,
+            "stall_threshold_ms": self.stall_threshold * 1000,
+            "event_loop_lag_ms": {
+                "samples": len(samples),
+                "p50": round(_percentile(samples, 0.50) * 1000, 2),
+                "p99": round(_percentile(samples, 0.99) * 1000, 2),
+                "max": round(max(samples, default=0.0) * 1000, 2),
+            },
+            "threadpool": dict(self.threadpool),
+            "in_flight": self._in_flight_routes(),
+            "recent_stalls": stalls,
+        }
+
+
+class RequestTrackingMiddleware:
+    """Pure ASGI middleware that registers each HTTP request with the loop monitor.
+
+    The scope dict is shared with the router, so by the time a stall is reported
+    ``scope["route"]`` and ``scope["endpoint"]`` have been filled in.
+    """
+
+    def __init__(self, app, monitor: LoopMonitor):
+        self.app = app
+        self.monitor = monitor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        self.monitor.request_started(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.monitor.request_finished(scope)
+
+
+loop_monitor = LoopMonitor(
+    interval=settings.LOOP_MONITOR_INTERVAL,
+    stall_threshold_ms=settings.LOOP_STALL_THRESHOLD_MS,
+)
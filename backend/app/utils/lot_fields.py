@@ -0,0 +1,82 @@
+"""Which fields a lot's packets came from (``lot_fields``).
+
+``LotNumber.field_name`` is a display label, the field names joined with
+commas. The transportation routes used to split and rescan it on every write
+to decide whether to append a name, and lots were found by field with an exact
+string match, which missed lots filled from several fields. Each (lot, field)
+pair is now a ``LotField`` row with the field's per-grade packet contribution,
+so finding a field's lots is an indexed join and contributions are plain
+columns. The label is still written for display when a field is linked, unless
+it already names the field.
+
+``add_field_packets`` is called in the same transaction as the lot count
+change (see app/utils/lot_packets.py). It links the pair with ``INSERT ... ON
+CONFLICT DO NOTHING`` and otherwise adds to the contribution with ``UPDATE ...
+SET col = col + delta``, so concurrent transportations never read-modify-write
+it. Both helpers take a sync Session; async routes call them through
+``run_sync``.
+"""
+from sqlalchemy import select, delete, update, and_
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.models.field import Field
+from app.models.lot_number import LotNumber, LotField
+from app.utils.lot_movements import Deltas
+
+PACKET_COLUMNS = ("small_packets", "medium_packets", "large_packets", "xlarge_packets")
+
+
+def label_names(label: str) -> list:
+    return [name.strip() for name in (label or "").split(",") if name.strip()]
+
+
+def lot_field_statement(dialect_name: str, lot_id: int, field_id: int, deltas: Deltas):
+    """The insert linking the pair, with ``deltas`` as the field's first contribution; a no-op if already linked."""
+    table = LotField.__table__
+    dialect_insert = sqlite_insert if dialect_name == "sqlite" else postgresql_insert
+    return dialect_insert(table).values(
+        lot_id=lot_id, field_id=field_id, **dict(zip(PACKET_COLUMNS, deltas))
+    ).on_conflict_do_nothing(index_elements=[table.c.lot_id, table.c.field_id])
+
+
+def add_field_packets(session: Session, lot_id: int, field: Field, deltas: Deltas):
+    """Credit ``deltas`` to ``field``'s packets in the lot, linking the two (and labelling the lot) the first time."""
+    lots, links = LotNumber.__table__, LotField.__table__
+    new_link = session.execute(lot_field_statement(session.get_bind().dialect.name, lot_id, field.id, deltas)).rowcount
+    if new_link:
+        # The lot's counts were just written in this transaction, so its row is locked and the label can't change
+        label = session.execute(select(lots.c.field_name).where(lots.c.id == lot_id)).scalar_one()
+        names = label_names(label)
+        if field.field_name not in names:
+            session.execute(update(lots).where(lots.c.id == lot_id).values(
+                field_name=", ".join(names + [field.field_name])
+            ))
+    elif any(deltas):
+        session.execute(update(links).where(links.c.lot_id == lot_id, links.c.field_id == field.id).values({
+            column: links.c[column] + delta for column, delta in zip(PACKET_COLUMNS, deltas) if delta
+        }))
+
+
+def link_named_fields(session: Session, lot: LotNumber):
+    """Link a hand-entered lot to the user's fields its label names.
+
+    Fields no longer named are unlinked, unless packets were transported from them.
+    """
+    if lot.id is None:
+        session.flush()
+    names = label_names(lot.field_name)
+    field_ids = set(session.execute(select(Field.id).where(
+        Field.user_id == lot.user_id, Field.field_name.in_(names)
+    )).scalars()) if names else set()
+    linked = set(session.execute(select(LotField.field_id).where(LotField.lot_id == lot.id)).scalars())
+    stale = linked - field_ids
+    if stale:
+        session.execute(delete(LotField).where(
+            LotField.lot_id == lot.id, LotField.field_id.in_(stale),
+            and_(*(LotField.__table__.c[column] == 0 for column in PACKET_COLUMNS))
+        ))
+    dialect_name = session.get_bind().dialect.name
+    for field_id in field_ids - linked:
+        session.execute(lot_field_statement(dialect_name, lot.id, field_id, (0, 0, 0, 0)))
@@ -0,0 +1,55 @@
+"""The lot movement journal (``lot_movements``).
+
+Every change to a lot's packet counts adds one row holding the per-grade
+deltas, where the packets came from (field, transportation) and when. Rows
+are never updated, so a lot's history costs nothing on the lot itself. It used
+to be appended to ``LotNumber.notes`` as text and shipped with every lot
+listing; it is now read a page at a time from /lot-numbers/{id}/movements.
+
+The writers call ``record_movement`` in the same transaction as the count
+change. Kinds:
+
+* ``opening``: the lot's hand-entered counts when the journal was introduced
+  (migration 0007), and ``opening_transported`` the transported rest (0010);
+* ``created``/``adjusted``: a lot created, or its counts edited, by hand;
+* ``added``: /lot-numbers/{id}/add-packets;
+* ``transported``/``transport_updated``/``transport_deleted``: a transportation
+  into the lot was created, had its packets changed, or was deleted;
+* ``moved_out``/``moved_in``: a transportation was moved to another lot;
+* ``reconciled``: a drifted count corrected by app/utils/lot_reconciliation.py.
+
+The hand-entered kinds are the lot's stock that no transportation accounts for.
+"""
+from typing import Optional, Tuple, Union
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.lot_number import LotMovement
+from app.models.transportation import Transportation
+
+# (small, medium, large, xlarge) packet deltas
+Deltas = Tuple[int, int, int, int]
+
+HAND_KINDS = ("opening", "created", "adjusted", "added")
+TRANSPORT_KINDS = ("opening_transported", "transported", "transport_updated", "transport_deleted", "moved_in", "moved_out")
+
+
+def transport_deltas(transportation: Transportation, sign: int = 1) -> Deltas:
+    """What ``transportation`` adds to its lot (``sign=-1``: what removing it takes away)."""
+    return (sign * (transportation.small_packets or 0), sign * (transportation.medium_packets or 0),
+            sign * (transportation.large_packets or 0), sign * (transportation.overlarge_packets or 0))
+
+
+def record_movement(session: Union[Session, AsyncSession], lot_id: int, user_id, kind: str, deltas: Deltas,
+                    field_id: Optional[int] = None, transportation_id: Optional[int] = None,
+                    note: Optional[str] = None) -> Optional[LotMovement]:
+    """Add a journal row for the lot. Nothing is recorded when every delta is 0."""
+    if not any(deltas):
+        return None
+    small, medium, large, xlarge = deltas
+    movement = LotMovement(lot_id=lot_id, user_id=user_id, kind=kind, field_id=field_id, transportation_id=transportation_id,
+                           small_packets=small, medium_packets=medium, large_packets=large, xlarge_packets=xlarge,
+                           note=note or None)
+    session.add(movement)
+    return movement
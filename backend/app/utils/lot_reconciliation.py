@@ -0,0 +1,288 @@
+"""Lot counts reconciled with the transportations behind them.
+
+A lot's packet counts are kept up to date by the writers as they go
+(app/utils/lot_packets.py) and can be edited by hand (/lot-numbers/). What they
+should be is the sum of the transportations into the lot plus the stock
+entered by hand, which the movement journal records (``HAND_KINDS`` in
+app/utils/lot_movements.py). Both are recomputed set-based - one GROUP BY over
+``transportations`` per (field, lot number), one over ``lot_movements`` per
+lot - and compared with:
+
+* ``lot_numbers``: each grade's count, and the lot's journal total, which the
+  counts must equal too. Transportations name their lot by number (a rename
+  carries through to them, see update_lot_number and migration 0012), so
+  lots that transportations go into but that no longer exist are reported as
+  well, with no ``lot_id``;
+* ``lot_fields``: each field's contribution to the lot.
+
+Differences are streamed, so an account of any size is checked in constant
+memory. ``repair_lots`` fixes them with a few set-based statements: missing
+lots are recreated, counts are set to the expected value with a ``reconciled``
+movement for the correction, and field contributions are overwritten. From the
+admin endpoints or the shell::
+
+    python -m app.utils.lot_reconciliation check [--user ID]
+    python -m app.utils.lot_reconciliation repair [--user ID]
+"""
+import argparse
+import sys
+from typing import Iterator, Optional
+
+from sqlalchemy import select, update, insert, func, case, and_, or_, literal, literal_column, null, union_all
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.models.field import Field
+from app.models.lot_number import LotNumber, LotField, LotMovement
+from app.models.transportation import Transportation
+from app.utils.lot_fields import PACKET_COLUMNS
+from app.utils.lot_movements import HAND_KINDS
+
+# Lot grade -> transportation column
+TRANSPORT_COLUMNS = dict(zip(PACKET_COLUMNS, ("small_packets", "medium_packets", "large_packets", "overlarge_packets")))
+
+# Rows fetched at a time while streaming differences
+STREAM_BATCH = 1000
+
+REPAIR_NOTE = "Reconciled with transportations"
+
+
+def field_transports(user_id=None):
+    """Transported packets per (field, lot number), with the field's owner and name.
+
+    Aggregated before the join to ``fields``, in the order of
+    ``ix_transportations_field_id_lot_number``, which covers the packet columns:
+    the GROUP BY streams through the index without touching the table or sorting.
+    """
+    table = Transportation.__table__
+    totals = select(
+        table.c.field_id,
+        table.c.lot_number,
+        *[func.sum(func.coalesce(table.c[source], 0)).label(column) for column, source in TRANSPORT_COLUMNS.items()],
+    ).group_by(table.c.field_id, table.c.lot_number)
+    if user_id is not None:
+        totals = totals.where(table.c.field_id.in_(select(Field.id).where(Field.user_id == user_id)))
+    totals = totals.subquery("totals")
+    return select(Field.user_id.label("user_id"), Field.field_name, totals).join(Field, Field.id == totals.c.field_id)
+
+
+def lot_transports(per_field):
+    """``field_transports`` rolled up per (user, lot number)."""
+    return select(
+        per_field.c.user_id,
+        per_field.c.lot_number,
+        func.min(per_field.c.field_name).label("field_name"),
+        *[func.sum(per_field.c[column]).label(column) for column in PACKET_COLUMNS],
+    ).group_by(per_field.c.user_id, per_field.c.lot_number)
+
+
+def journal_totals(user_id=None):
+    """Per lot: the sum of all its movements (``journal_*``) and of the hand-entered ones (``hand_*``).
+
+    Streams through ``ix_lot_movements_lot_id_kind``, which covers it.
+    """
+    table = LotMovement.__table__
+    stmt = select(
+        table.c.lot_id,
+        *[func.sum(table.c[column]).label(f"journal_{column}") for column in PACKET_COLUMNS],
+        *[func.sum(case((table.c.kind.in_(HAND_KINDS), table.c[column]), else_=0)).label(f"hand_{column}")
+          for column in PACKET_COLUMNS],
+    ).group_by(table.c.lot_id)
+    if user_id is not None:
+        stmt = stmt.where(table.c.lot_id.in_(select(LotNumber.id).where(LotNumber.user_id == user_id)))
+    return stmt
+
+
+def lot_comparison(user_id=None):
+    """Every lot (and every missing lot) with its ``stored_*``, ``expected_*`` and ``journal_*`` counts."""
+    lots = LotNumber.__table__
+    transports = lot_transports(field_transports(user_id).cte("per_field")).cte("transports")
+    journal = journal_totals(user_id).subquery("journal")
+    zero = literal_column("0")
+
+    existing = select(
+        lots.c.id.label("lot_id"), lots.c.user_id, lots.c.lot_number,
+        *[func.coalesce(lots.c[column], 0).label(f"stored_{column}") for column in PACKET_COLUMNS],
+        *[(func.coalesce(transports.c[column], 0) + func.coalesce(journal.c[f"hand_{column}"], 0)).label(f"expected_{column}")
+          for column in PACKET_COLUMNS],
+        *[func.coalesce(journal.c[f"journal_{column}"], 0).label(f"journal_{column}") for column in PACKET_COLUMNS],
+    ).select_from(
+        lots.outerjoin(transports, and_(transports.c.user_id == lots.c.user_id, transports.c.lot_number == lots.c.lot_number))
+        .outerjoin(journal, journal.c.lot_id == lots.c.id)
+    )
+    if user_id is not None:
+        existing = existing.where(lots.c.user_id == user_id)
+
+    missing = select(
+        null().label("lot_id"), transports.c.user_id, transports.c.lot_number,
+        *[zero.label(f"stored_{column}") for column in PACKET_COLUMNS],
+        *[transports.c[column].label(f"expected_{column}") for column in PACKET_COLUMNS],
+        *[zero.label(f"journal_{column}") for column in PACKET_COLUMNS],
+    ).select_from(
+        transports.outerjoin(lots, and_(lots.c.user_id == transports.c.user_id, lots.c.lot_number == transports.c.lot_number))
+    ).where(lots.c.id.is_(None))
+
+    return union_all(existing, missing).subquery("lots")
+
+
+def field_comparison(user_id=None):
+    """Every (lot, field) link, or pair that should be linked, with its ``stored_*`` and ``expected_*`` contribution."""
+    lots, links = LotNumber.__table__, LotField.__table__
+    per_field = field_transports(user_id).cte("per_field")
+    zero = literal_column("0")
+
+    linked = select(
+        links.c.lot_id, lots.c.user_id, lots.c.lot_number, links.c.field_id,
+        *[links.c[column].label(f"stored_{column}") for column in PACKET_COLUMNS],
+        *[func.coalesce(per_field.c[column], 0).label(f"expected_{column}") for column in PACKET_COLUMNS],
+    ).select_from(
+        links.join(lots, lots.c.id == links.c.lot_id)
+        .outerjoin(per_field, and_(per_field.c.field_id == links.c.field_id, per_field.c.user_id == lots.c.user_id,
+                                   per_field.c.lot_number == lots.c.lot_number))
+    )
+    if user_id is not None:
+        linked = linked.where(lots.c.user_id == user_id)
+
+    unlinked = select(
+        lots.c.id.label("lot_id"), lots.c.user_id, lots.c.lot_number, per_field.c.field_id,
+        *[zero.label(f"stored_{column}") for column in PACKET_COLUMNS],
+        *[per_field.c[column].label(f"expected_{column}") for column in PACKET_COLUMNS],
+    ).select_from(
+        per_field.join(lots, and_(lots.c.user_id == per_field.c.user_id, lots.c.lot_number == per_field.c.lot_number))
+        .outerjoin(links, and_(links.c.lot_id == lots.c.id, links.c.field_id == per_field.c.field_id))
+    ).where(links.c.lot_id.is_(None))
+
+    return union_all(linked, unlinked).subquery("links")
+
+
+def differs(comparison, *prefixes):
+    """Rows of ``comparison`` where the ``expected_*`` counts differ from any of the ``<prefix>_*`` ones."""
+    return or_(*(comparison.c[f"{prefix}_{column}"] != comparison.c[f"expected_{column}"]
+                 for prefix in prefixes for column in PACKET_COLUMNS))
+
+
+def lot_differences(conn, user_id=None) -> Iterator[dict]:
+    """Every lot count and field contribution that differs from its recomputed value, streamed."""
+    lots = lot_comparison(user_id)
+    rows = conn.execute(select(lots).where(differs(lots, "stored", "journal"))
+                        .execution_options(yield_per=STREAM_BATCH)).mappings()
+    for row in rows:
+        for column in PACKET_COLUMNS:
+            stored, journal, expected = row[f"stored_{column}"], row[f"journal_{column}"], row[f"expected_{column}"]
+            if stored != expected or journal != expected:
+                yield {"table": "lot_numbers", "user_id": row["user_id"], "lot_id": row["lot_id"],
+                       "lot_number": row["lot_number"], "column": column, "stored": stored, "journal": journal,
+                       "expected": expected}
+
+    links = field_comparison(user_id)
+    rows = conn.execute(select(links).where(differs(links, "stored"))
+                        .execution_options(yield_per=STREAM_BATCH)).mappings()
+    for row in rows:
+        for column in PACKET_COLUMNS:
+            stored, expected = row[f"stored_{column}"], row[f"expected_{column}"]
+            if stored != expected:
+                yield {"table": "lot_fields", "user_id": row["user_id"], "lot_id": row["lot_id"],
+                       "lot_number": row["lot_number"], "field_id": row["field_id"], "column": column,
+                       "stored": stored, "expected": expected}
+
+
+def check_lots(conn, user_id=None, limit: Optional[int] = None) -> tuple[int, list[dict]]:
+    """How many differences there are, and the first ``limit`` of them (all when None)."""
+    count, kept = 0, []
+    for difference in lot_differences(conn, user_id):
+        count += 1
+        if limit is None or len(kept) < limit:
+            kept.append(difference)
+    return count, kept
+
+
+def returned(conn, stmt) -> int:
+    """Run a DML ``stmt`` with RETURNING and count its rows without holding them."""
+    return sum(1 for _ in conn.execute(stmt.execution_options(yield_per=STREAM_BATCH)))
+
+
+def repair_lots(conn, user_id=None) -> dict:
+    """Bring lots (all users, or one) and their field contributions in line with the recomputed values."""
+    lots, links, movements = LotNumber.__table__, LotField.__table__, LotMovement.__table__
+
+    # Lots still referenced by transportations are recreated, empty and stored today, and filled in below
+    transports = lot_transports(field_transports(user_id).subquery("per_field")).subquery("transports")
+    created = conn.execute(insert(lots).from_select(
+        ["user_id", "lot_number", "field_name", "storage_date", *PACKET_COLUMNS],
+        select(transports.c.user_id, transports.c.lot_number, transports.c.field_name, func.current_date(),
+               *[literal_column("0") for _ in PACKET_COLUMNS])
+        .select_from(transports.outerjoin(lots, and_(lots.c.user_id == transports.c.user_id,
+                                                     lots.c.lot_number == transports.c.lot_number)))
+        .where(lots.c.id.is_(None))
+    )).rowcount
+
+    # The correction is journaled first, so the lot's movements still sum to its counts. The
+    # comparisons are WITH queries, which sqlite3 reports no rowcount for, so rows are counted
+    # from RETURNING instead.
+    compared = lot_comparison(user_id)
+    journaled = returned(conn, insert(movements).from_select(
+        ["lot_id", "user_id", "kind", *PACKET_COLUMNS, "note"],
+        select(compared.c.lot_id, compared.c.user_id, literal("reconciled"),
+               *[compared.c[f"expected_{column}"] - compared.c[f"journal_{column}"] for column in PACKET_COLUMNS],
+               literal(REPAIR_NOTE))
+        .where(differs(compared, "journal"))
+    ).returning(movements.c.id))
+
+    compared = lot_comparison(user_id)
+    updated = returned(conn, update(lots).where(lots.c.id == compared.c.lot_id, differs(compared, "stored"))
+                       .values({**{column: compared.c[f"expected_{column}"] for column in PACKET_COLUMNS},
+                                "updated_at": func.now()})
+                       .returning(lots.c.id))
+
+    compared = field_comparison(user_id)
+    # A Connection from the shell, or the Session of the admin endpoint
+    bind = conn.get_bind() if isinstance(conn, Session) else conn
+    dialect_insert = sqlite_insert if bind.dialect.name == "sqlite" else postgresql_insert
+    stmt = dialect_insert(links).from_select(
+        ["lot_id", "field_id", *PACKET_COLUMNS],
+        select(compared.c.lot_id, compared.c.field_id, *[compared.c[f"expected_{column}"] for column in PACKET_COLUMNS])
+        .where(differs(compared, "stored"))
+    )
+    fields = returned(conn, stmt.on_conflict_do_update(
+        index_elements=[links.c.lot_id, links.c.field_id],
+        set_={column: stmt.excluded[column] for column in PACKET_COLUMNS},
+    ).returning(links.c.lot_id))
+
+    return {"lots_created": created, "lots_corrected": updated, "movements": journaled, "field_links": fields}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check or repair lot packet counts against their transportations.")
+    parser.add_argument("command", choices=["check", "repair"])
+    parser.add_argument("--user", type=int, help="only this user id")
+    args = parser.parse_args(argv)
+
+    from app.db import engine
+
+    if args.command == "repair":
+        with engine.begin() as conn:
+            repaired = repair_lots(conn, args.user)
+        print(f"Created {repaired['lots_created']} lot(s), corrected {repaired['lots_corrected']} lot(s) "
+              f"with {repaired['movements']} reconciled movement(s), fixed {repaired['field_links']} field contribution(s)")
+        return 0
+
+    count = 0
+    with engine.connect() as conn:
+        for difference in lot_differences(conn, args.user):
+            count += 1
+            where = f"user {difference['user_id']} lot {difference['lot_number']!r}"
+            if difference["table"] == "lot_fields":
+                print(f"{where} field {difference['field_id']}: {difference['column']} contributed "
+                      f"{difference['stored']} but transportations give {difference['expected']}")
+            elif difference["lot_id"] is None:
+                print(f"{where}: missing, transportations give {difference['column']} {difference['expected']}")
+            else:
+                print(f"{where}: {difference['column']} stored {difference['stored']}, journal {difference['journal']}, "
+                      f"but transportations and hand entries give {difference['expected']}")
+    print("Lots consistent" if not count else f"{count} difference(s); run `python -m app.utils.lot_reconciliation repair`")
+    return 1 if count else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
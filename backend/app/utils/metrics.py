@@ -0,0 +1,409 @@
+"""Low-overhead Prometheus-compatible metrics.
+
+Counters, gauges and histograms live in a process-local registry; recording a
+sample is a dict lookup and an addition under a lock. ``render()`` produces the
+Prometheus text exposition format served at ``/metrics``.
+
+Multi-worker deployments (``uvicorn --workers N``, gunicorn) set
+``METRICS_MULTIPROC_DIR``: every worker then flushes its samples to
+``<dir>/metrics_<pid>_<start>.json`` every ``METRICS_FLUSH_INTERVAL`` seconds
+and a scrape served by any worker merges the live workers' files with its own
+values. A worker removes its file at shutdown; files left by workers that died
+(or by an earlier run) are skipped and deleted, at startup and on every scrape,
+so the totals only cover running workers and the directory stays bounded. A
+recycled worker's counters restart from zero, which Prometheus' rate()
+treats as a counter reset.
+"""
+import asyncio
+import glob
+import json
+import logging
+import math
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+logger = logging.getLogger("app.metrics")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dump(self):
+        with self._lock:
+            return {"|".join(k): v for k, v in self._values.items()}
+
+
+class Gauge(_Metric):
+    """A gauge set directly or computed at collection time from a callback."""
+    type = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[tuple, float] = {}
+        self._functions: Dict[tuple, Callable[[], float]] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, fn: Callable[[], float], **labels):
+        with self._lock:
+            self._functions[self._key(labels)] = fn
+
+    def dump(self):
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for key, fn in functions.items():
+            try:
+                values[key] = float(fn())
+            except Exception:
+                logger.exception("Gauge callback for %s failed", self.name)
+        return {"|".join(k): v for k, v in values.items()}
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # key -> [bucket counts..., +Inf count, sum]
+        self._values: Dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+                    break
+            else:
+                entry[len(self.buckets)] += 1
+            entry[-1] += value
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def dump(self):
+        with self._lock:
+            return {"|".join(k): list(v) for k, v in self._values.items()}
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+        self._started = int(time.time())
+
+    def register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    # -- multi-process aggregation -------------------------------------
+    def dump(self) -> dict:
+        return {"pid": os.getpid(), "metrics": {name: m.dump() for name, m in list(self._metrics.items())}}
+
+    def _worker_file(self, directory):
+        return os.path.join(directory, f"metrics_{os.getpid()}_{self._started}.json")
+
+    def flush(self, directory: str):
+        """Atomically write this worker's samples for other workers' scrapes to merge."""
+        os.makedirs(directory, exist_ok=True)
+        path = self._worker_file(directory)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.dump(), f)
+        os.replace(tmp, path)
+
+    def remove(self, directory: str):
+        """Delete this worker's file; called at shutdown so its samples stop being merged."""
+        try:
+            os.remove(self._worker_file(directory))
+        except FileNotFoundError:
+            pass
+
+    def prune(self, directory: str):
+        """Delete the files of workers that are gone and return the paths of the others."""
+        own = self._worker_file(directory)
+        live = []
+        for path in glob.glob(os.path.join(directory, "metrics_*.json")):
+            if path == own:
+                continue
+            pid = _file_pid(path)
+            # A file with this worker's pid but another start time is a dead worker's whose pid was reused
+            if pid == os.getpid() or not _pid_alive(pid):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            else:
+                live.append(path)
+        return live
+
+    def collect(self, directory: Optional[str] = None) -> Dict[str, dict]:
+        """Samples for every metric, merged across live workers when a directory is given."""
+        dumps = [self.dump()]
+        if directory:
+            for path in self.prune(directory):
+                try:
+                    with open(path) as f:
+                        dumps.append(json.load(f))
+                except (OSError, ValueError):
+                    continue  # being rewritten, half-written or just removed; next scrape picks it up
+
+        merged: Dict[str, dict] = {}
+        for dump in dumps:
+            for name, samples in dump["metrics"].items():
+                metric = self._metrics.get(name)
+                if metric is None:
+                    continue
+                target = merged.setdefault(name, {})
+                for key, value in samples.items():
+                    if metric.type == "histogram":
+                        current = target.get(key)
+                        target[key] = list(value) if current is None else [a + b for a, b in zip(current, value)]
+                    else:
+                        target[key] = target.get(key, 0.0) + value
+        return merged
+
+    def render(self, directory: Optional[str] = None) -> str:
+        merged = self.collect(directory)
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            for key, value in sorted(merged.get(name, {}).items()):
+                label_values = key.split("|") if metric.labelnames else []
+                if metric.type == "histogram":
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets + (math.inf,), value[:-1]):
+                        cumulative += count
+                        le = 'le="%s"' % _format_value(bound)
+                        lines.append(f"{name}_bucket{_format_labels(metric.labelnames, label_values, le)} {cumulative}")
+                    labels = _format_labels(metric.labelnames, label_values)
+                    lines.append(f"{name}_count{labels} {cumulative}")
+                    lines.append(f"{name}_sum{labels} {_format_value(value[-1])}")
+                else:
+                    lines.append(f"{name}{_format_labels(metric.labelnames, label_values)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _file_pid(path) -> Optional[int]:
+    """The pid in a ``metrics_<pid>_<start>.json`` file name."""
+    try:
+        return int(os.path.basename(path).split("_")[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def _pid_alive(pid) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+registry = Registry()
+
+# -- HTTP ----------------------------------------------------------------
+HTTP_REQUESTS = registry.counter(
+    "http_requests_total", "HTTP requests by route template and status code", ("method", "route", "status"))
+HTTP_REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route"))
+HTTP_REQUESTS_IN_PROGRESS = registry.gauge(
+    "http_requests_in_progress", "HTTP requests currently being served")
+
+
+def route_labels(scope) -> Tuple[str, str]:
+    """(method, route template) for a request scope; unrouted paths collapse into one label."""
+    route = scope.get("route")
+    if route is None or not getattr(route, "path", None):
+        return scope.get("method", ""), "UNMATCHED"
+    return scope.get("method", ""), f"{scope.get('root_path', '')}{route.path}"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording request counts, status codes and latency per route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_PROGRESS.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_REQUESTS_IN_PROGRESS.dec()
+            method, route = route_labels(scope)
+            HTTP_REQUESTS.inc(method=method, route=route, status=status["code"])
+            HTTP_REQUEST_DURATION.observe(elapsed, method=method, route=route)
+
+
+# -- Database connection pools ---------------------------------------------
+DB_POOL_CHECKOUTS = registry.counter(
+    "db_pool_checkouts_total", "Connections checked out of the pool", ("engine",))
+DB_POOL_CHECKED_OUT = registry.gauge(
+    "db_pool_checked_out", "Connections currently checked out", ("engine",))
+DB_POOL_OVERFLOW = registry.gauge(
+    "db_pool_overflow", "Connections open beyond pool_size (negative while the pool is not yet full)", ("engine",))
+DB_POOL_SIZE = registry.gauge(
+    "db_pool_size", "Configured pool size", ("engine",))
+
+
+def instrument_pool(engine, name: str):
+    """Count checkouts and expose checked-out / overflow gauges for a (sync) Engine's pool."""
+    from sqlalchemy import event
+
+    pool = engine.pool
+
+    @event.listens_for(pool, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKOUTS.inc(engine=name)
+
+    for gauge, attr in ((DB_POOL_CHECKED_OUT, "checkedout"), (DB_POOL_OVERFLOW, "overflow"), (DB_POOL_SIZE, "size")):
+        # StaticPool / NullPool don't track these
+        if callable(getattr(pool, attr, None)):
+            gauge.set_function(getattr(pool, attr), engine=name)
+
+
+# -- SQLite writer queue (app.db.SQLiteWriteQueue) ----------------------------
+WRITE_QUEUE_BATCH_SIZE = registry.histogram(
+    "sqlite_write_batch_size", "Write transactions group-committed together", (),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+WRITE_QUEUE_WAIT = registry.histogram(
+    "sqlite_write_queue_wait_seconds", "Time a write waited for the writer thread", ())
+
+# -- Per-request SQL (fed by app.utils.query_stats) --------------------------
+DB_QUERIES_PER_REQUEST = registry.histogram(
+    "db_queries_per_request", "SQL statements issued per request", ("route",),
+    buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, 89))
+DB_TIME_PER_REQUEST = registry.histogram(
+    "db_time_per_request_seconds", "Time spent executing SQL per request", ("route",),
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+
+# -- Password hashing ---------------------------------------------------------
+PASSWORD_HASH_DURATION = registry.histogram(
+    "password_hash_duration_seconds", "bcrypt hash/verify time", ("operation",),
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0))
+
+# -- Weather upstream -------------------------------------------------------
+WEATHER_UPSTREAM_DURATION = registry.histogram(
+    "weather_upstream_duration_seconds", "OpenWeatherMap request latency", ("endpoint", "outcome"))
+
+
+# -- Multi-worker flushing ------------------------------------------------------
+async def run_flusher(directory: str, interval: float):
+    """Periodically write this worker's samples so sibling workers can serve them."""
+    while True:
+        try:
+            await asyncio.to_thread(registry.flush, directory)
+        except Exception:
+            logger.exception("Failed to flush metrics to %s", directory)
+        await asyncio.sleep(interval)
@@ -0,0 +1,163 @@
+"""Per-request SQL statement counting.
+
+Cursor-execute hooks on the engines add every statement's count and wall time
+to a ``RequestQueryStats`` object held in a context variable. The variable is
+set once per request by ``QueryStatsMiddleware``; threadpool workers and the
+async driver's greenlets run in a copy of the request's context, so they all
+update the same object.
+
+At the end of the request the totals go out in a ``Server-Timing`` header
+(visible in the browser devtools timing tab) and into per-route histograms
+served from ``/admin/queries`` and ``/metrics``.
+"""
+import json
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+from app.config import settings
+from app.utils.loop_monitor import route_name
+from app.utils.metrics import DB_QUERIES_PER_REQUEST, DB_TIME_PER_REQUEST
+
+logger = logging.getLogger("app.queries")
+
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+DB_TIME_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class RequestQueryStats:
+    __slots__ = ("count", "db_time", "_lock")
+
+    def __init__(self):
+        self.count = 0
+        self.db_time = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, elapsed: float):
+        with self._lock:
+            self.count += 1
+            self.db_time += elapsed
+
+
+_current_stats: ContextVar[Optional[RequestQueryStats]] = ContextVar("request_query_stats", default=None)
+
+
+def current_stats() -> Optional[RequestQueryStats]:
+    return _current_stats.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_start_time"].pop()
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.add(time.perf_counter() - started)
+
+
+def instrument_engine(engine):
+    """Attach the statement counters to a (sync) Engine; pass ``async_engine.sync_engine`` for async ones."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "total", "sum")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += 1
+        self.sum += value
+
+    def as_dict(self):
+        labels = [str(b) for b in self.buckets] + ["+Inf"]
+        cumulative, running = {}, 0
+        for label, count in zip(labels, self.counts):
+            running += count
+            cumulative[label] = running
+        return {"count": self.total, "sum": round(self.sum, 3), "buckets": cumulative}
+
+
+class RouteQueryHistograms:
+    """Query-count and DB-time histograms keyed by route template."""
+
+    def __init__(self):
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def observe(self, route: str, stats: RequestQueryStats):
+        with self._lock:
+            entry = self._routes.get(route)
+            if entry is None:
+                entry = self._routes[route] = (_Histogram(QUERY_COUNT_BUCKETS), _Histogram(DB_TIME_BUCKETS_MS))
+            entry[0].observe(stats.count)
+            entry[1].observe(stats.db_time * 1000)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            routes = {
+                route: {"queries": counts.as_dict(), "db_time_ms": times.as_dict()}
+                for route, (counts, times) in self._routes.items()
+            }
+        # Chattiest routes first
+        return dict(sorted(routes.items(), key=lambda item: -item[1]["queries"]["sum"] / max(item[1]["queries"]["count"], 1)))
+
+
+route_query_histograms = RouteQueryHistograms()
+
+
+class QueryStatsMiddleware:
+    """Pure ASGI middleware: scope a RequestQueryStats to each request and report it."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestQueryStats()
+        token = _current_stats.set(stats)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and settings.SERVER_TIMING_ENABLED:
+                total_ms = (time.perf_counter() - started) * 1000
+                header = f'db;dur={stats.db_time * 1000:.1f};desc="{stats.count} queries", app;dur={total_ms:.1f}'
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", header.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_stats.reset(token)
+            # Unrouted paths (404s, scanners) would otherwise explode the histogram keys
+            route = route_name(scope) if scope.get("route") is not None else "UNMATCHED"
+            route_query_histograms.observe(route, stats)
+            DB_QUERIES_PER_REQUEST.observe(stats.count, route=route)
+            DB_TIME_PER_REQUEST.observe(stats.db_time, route=route)
+            if stats.count >= settings.QUERY_COUNT_WARN_THRESHOLD:
+                logger.warning("chatty_request %s", json.dumps({
+                    "route": route,
+                    "queries": stats.count,
+                    "db_time_ms": round(stats.db_time * 1000, 1),
+                }))
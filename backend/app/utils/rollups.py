@@ -0,0 +1,196 @@
+"""Incrementally maintained per-user dashboard totals (``user_rollups``).
+
+Every route that writes a counted row - fields, yields, money records, labour
+payments, attendance (and labourer wages, which re-price it), transportations -
+passes the change it made to ``apply_rollup``/``apply_rollup_async`` inside its
+own transaction, e.g. ``expenses=-150`` when a money record is deleted. That
+is one ``INSERT ... ON CONFLICT (user_id) DO UPDATE SET col = col + delta``:
+concurrent writers never read-modify-write the row and a user's first write
+creates it.
+
+``base_totals()`` computes the same numbers from the base tables. It backs the
+consistency check and the rebuild, from the admin endpoints or the shell::
+
+    python -m app.utils.rollups check [--user ID]
+    python -m app.utils.rollups rebuild [--user ID]
+"""
+import argparse
+import sys
+from typing import Optional
+
+from sqlalchemy import select, delete, func, case, insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.models.user import User
+from app.models.field import Field
+from app.models.yield_model import Yield
+from app.models.money import MoneyRecord
+from app.models.labour import Payment, LabourAttendance, Labourer
+from app.models.transportation import Transportation
+from app.models.rollup import UserRollup
+
+ROLLUP_COLUMNS = (
+    "field_count",
+    "yield_large", "yield_medium", "yield_small", "yield_overlarge",
+    "expenses",
+    "labour_payments",
+    "attendance_earnings",
+    "transported_packets",
+)
+
+# Share of the daily wage an attendance status earns
+ATTENDANCE_WEIGHT = {"full": 1.0, "half": 0.5}
+
+# Float totals drift by rounding as they are incremented; anything under this is equal
+TOLERANCE = 1e-6
+
+
+def rollup_statement(dialect_name: str, user_id, deltas: dict):
+    """The upsert adding ``deltas`` to the user's row, or None when nothing changes."""
+    unknown = set(deltas) - set(ROLLUP_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown rollup columns: {', '.join(sorted(unknown))}")
+    deltas = {column: value for column, value in deltas.items() if value}
+    if not deltas:
+        return None
+    table = UserRollup.__table__
+    dialect_insert = sqlite_insert if dialect_name == "sqlite" else postgresql_insert
+    stmt = dialect_insert(table).values(user_id=user_id, **deltas)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id],
+        set_={**{column: table.c[column] + stmt.excluded[column] for column in deltas}, "updated_at": func.now()},
+    )
+
+
+def apply_rollup(session, user_id, **deltas):
+    """Add ``deltas`` to the user's rollup in the session's transaction (sync sessions / run_write)."""
+    stmt = rollup_statement(session.get_bind().dialect.name, user_id, deltas)
+    if stmt is not None:
+        session.execute(stmt)
+
+
+async def apply_rollup_async(db, user_id, **deltas):
+    """Add ``deltas`` to the user's rollup in the AsyncSession's transaction."""
+    stmt = rollup_statement(db.get_bind().dialect.name, user_id, deltas)
+    if stmt is not None:
+        await db.execute(stmt)
+
+
+def yield_deltas(record, sign: int = 1) -> dict:
+    return {
+        "yield_large": sign * (record.large or 0),
+        "yield_medium": sign * (record.medium or 0),
+        "yield_small": sign * (record.small or 0),
+        "yield_overlarge": sign * (record.overlarge or 0),
+    }
+
+
+def transported_packets(record) -> int:
+    return (record.small_packets or 0) + (record.medium_packets or 0) + (record.large_packets or 0) + (record.overlarge_packets or 0)
+
+
+def attendance_earnings(status: Optional[str], daily_wage) -> float:
+    return ATTENDANCE_WEIGHT.get(status, 0) * (daily_wage or 0)
+
+
+def base_totals(user_id=None):
+    """One row per user with every rollup column recomputed from the base tables.
+
+    These are the aggregates /dashboard/ used to run on every load; each is
+    grouped by owner and outer-joined to ``users`` so users without rows get 0.
+    """
+    def scoped(stmt, owner):
+        return stmt.filter(owner == user_id) if user_id is not None else stmt
+
+    fields = scoped(select(Field.user_id, func.count(Field.id).label("field_count")), Field.user_id).group_by(Field.user_id).subquery()
+    yields = scoped(select(
+        Field.user_id,
+        func.sum(Yield.large).label("yield_large"),
+        func.sum(Yield.medium).label("yield_medium"),
+        func.sum(Yield.small).label("yield_small"),
+        func.sum(Yield.overlarge).label("yield_overlarge"),
+    ).select_from(Yield).join(Field), Field.user_id).group_by(Field.user_id).subquery()
+    expenses = scoped(select(
+        MoneyRecord.user_id, func.sum(MoneyRecord.amount).label("expenses")
+    ), MoneyRecord.user_id).group_by(MoneyRecord.user_id).subquery()
+    payments = scoped(select(
+        Payment.user_id, func.sum(Payment.amount).label("labour_payments")
+    ), Payment.user_id).group_by(Payment.user_id).subquery()
+    earnings = scoped(select(
+        LabourAttendance.user_id,
+        func.sum(case(
+            *[(LabourAttendance.status == status, Labourer.daily_wage * weight) for status, weight in ATTENDANCE_WEIGHT.items()],
+            else_=0
+        )).label("attendance_earnings"),
+    ).select_from(LabourAttendance).join(Labourer, LabourAttendance.labourer_id == Labourer.id),
+        LabourAttendance.user_id).group_by(LabourAttendance.user_id).subquery()
+    transports = scoped(select(
+        Field.user_id,
+        (func.coalesce(func.sum(Transportation.small_packets), 0)
+         + func.coalesce(func.sum(Transportation.medium_packets), 0)
+         + func.coalesce(func.sum(Transportation.large_packets), 0)
+         + func.coalesce(func.sum(Transportation.overlarge_packets), 0)).label("transported_packets"),
+    ).select_from(Transportation).join(Field), Field.user_id).group_by(Field.user_id).subquery()
+
+    sources = {
+        "field_count": fields, "yield_large": yields, "yield_medium": yields, "yield_small": yields,
+        "yield_overlarge": yields, "expenses": expenses, "labour_payments": payments,
+        "attendance_earnings": earnings, "transported_packets": transports,
+    }
+    stmt = select(User.id.label("user_id"), *[
+        func.coalesce(source.c[column], 0).label(column) for column, source in sources.items()
+    ]).select_from(User)
+    for source in (fields, yields, expenses, payments, earnings, transports):
+        stmt = stmt.outerjoin(source, source.c.user_id == User.id)
+    return scoped(stmt, User.id)
+
+
+def check_rollups(conn, user_id=None) -> list[dict]:
+    """Differences between ``user_rollups`` and the base tables; empty when consistent."""
+    expected = base_totals(user_id).subquery()
+    rows = conn.execute(select(expected, *[UserRollup.__table__.c[column].label(f"stored_{column}") for column in ROLLUP_COLUMNS])
+                        .outerjoin(UserRollup, UserRollup.user_id == expected.c.user_id)).mappings().all()
+    mismatches = []
+    for row in rows:
+        for column in ROLLUP_COLUMNS:
+            want, have = row[column] or 0, row[f"stored_{column}"] or 0
+            if abs(want - have) > TOLERANCE:
+                mismatches.append({"user_id": row["user_id"], "column": column, "expected": want, "stored": have})
+    return mismatches
+
+
+def rebuild_rollups(conn, user_id=None) -> int:
+    """Replace the rollups (all users, or one) with totals recomputed from the base tables."""
+    stmt = delete(UserRollup)
+    if user_id is not None:
+        stmt = stmt.where(UserRollup.user_id == user_id)
+    conn.execute(stmt)
+    result = conn.execute(insert(UserRollup).from_select(["user_id", *ROLLUP_COLUMNS], base_totals(user_id)))
+    return result.rowcount
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check or rebuild the per-user dashboard rollups.")
+    parser.add_argument("command", choices=["check", "rebuild"])
+    parser.add_argument("--user", type=int, help="only this user id")
+    args = parser.parse_args(argv)
+
+    from app.db import engine
+
+    if args.command == "rebuild":
+        with engine.begin() as conn:
+            count = rebuild_rollups(conn, args.user)
+        print(f"Rebuilt rollups for {count} user(s)")
+        return 0
+
+    with engine.connect() as conn:
+        mismatches = check_rollups(conn, args.user)
+    for mismatch in mismatches:
+        print(f"user {mismatch['user_id']}: {mismatch['column']} stored {mismatch['stored']} but base tables give {mismatch['expected']}")
+    print("Rollups consistent" if not mismatches else f"{len(mismatches)} mismatch(es); run `python -m app.utils.rollups rebuild`")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
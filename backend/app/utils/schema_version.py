@@ -0,0 +1,40 @@
+"""Startup check that the database is migrated to this build's schema.
+
+The app never issues DDL itself: migrations are applied out of band with
+``alembic upgrade head`` (once per deploy, not once per worker). At startup
+each worker compares the ``alembic_version`` row with the head revision(s) in
+``migrations/versions`` - one tiny SELECT - and refuses to serve against a
+schema it wasn't written for.
+"""
+import os
+from typing import Set
+
+from alembic.script import ScriptDirectory
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "migrations")
+
+
+class SchemaVersionError(RuntimeError):
+    pass
+
+
+def expected_revisions() -> Set[str]:
+    return set(ScriptDirectory(MIGRATIONS_DIR).get_heads())
+
+
+async def check_schema_version(engine):
+    """Raise SchemaVersionError unless the database is at the migrations' head revision."""
+    expected = expected_revisions()
+    async with engine.connect() as conn:
+        try:
+            current = set((await conn.execute(text("SELECT version_num FROM alembic_version"))).scalars().all())
+        except DBAPIError:
+            # No alembic_version table: never migrated
+            current = set()
+    if current != expected:
+        raise SchemaVersionError(
+            f"Database schema is at revision {', '.join(sorted(current)) or '<none>'} but this build expects "
+            f"{', '.join(sorted(expected))}. Run `alembic upgrade head` from the backend directory before starting the app."
+        )
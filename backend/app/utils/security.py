@@ -2,17 +2,20 @@ from passlib.context import CryptContext
 from datetime import datetime, timedelta
 import jwt
 from app.config import settings
+from app.utils.metrics import PASSWORD_HASH_DURATION
 
 # Password hashing context
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash."""
-    return pwd_context.verify(plain_password, hashed_password)
+    with PASSWORD_HASH_DURATION.time(operation="verify"):
+        return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     """Generate password hash."""
-    return pwd_context.hash(password)
+    with PASSWORD_HASH_DURATION.time(operation="hash"):
+        return pwd_context.hash(password)
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     """Create JWT access token."""
@@ -0,0 +1,145 @@
+"""In-memory cache in front of the OpenWeatherMap calls in routes/weather.py.
+
+Fields in one district are a few hundred metres apart, and weather doesn't
+differ at that scale. Coordinates are therefore snapped to a
+``WEATHER_CACHE_GRID``-degree grid (0.05° is about 5 km), and the upstream call
+is made for the cell's centre, so every field in a cell shares one entry.
+Each endpoint has its own TTL (``WEATHER_CACHE_TTL_*``):
+
+* fresh: served from memory;
+* stale, up to ``WEATHER_CACHE_MAX_STALE`` seconds past its TTL: served as is,
+  while one background call refreshes it;
+* missing or older: fetched while the caller waits.
+
+Concurrent requests for the same cell share one in-flight upstream call.
+Failures are never cached. Entries outlive their TTL until evicted, so
+``last_good()`` can stand in while upstream is down. A failed background refresh leaves the stale entry
+in place until it expires. The cache is per worker and bounded to
+``WEATHER_CACHE_MAX_ENTRIES`` (least recently used entries go first).
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from app.config import settings
+from app.utils import metrics
+from app.utils.circuit_breaker import CircuitOpenError
+
+logger = logging.getLogger("app.weather_cache")
+
+WEATHER_CACHE_REQUESTS = metrics.registry.counter(
+    "weather_cache_requests_total", "Weather lookups by endpoint and how the cache answered them", ("endpoint", "result"))
+WEATHER_CACHE_ENTRIES = metrics.registry.gauge(
+    "weather_cache_entries", "Cached weather responses on this worker")
+
+Key = Tuple[str, float, float]
+Fetch = Callable[[float, float], Awaitable[Any]]
+
+
+class CacheEntry:
+    __slots__ = ("value", "fetched_at")
+
+    def __init__(self, value: Any, fetched_at: float):
+        self.value = value
+        self.fetched_at = fetched_at
+
+    def age(self) -> float:
+        return time.monotonic() - self.fetched_at
+
+
+class WeatherCache:
+    def __init__(self, grid: float, ttls: Dict[str, float], max_stale: float, max_entries: int):
+        self.grid = grid
+        self.ttls = ttls
+        self.max_stale = max_stale
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Key, CacheEntry]" = OrderedDict()
+        self._inflight: Dict[Key, asyncio.Task] = {}
+        WEATHER_CACHE_ENTRIES.set_function(lambda: len(self._entries))
+
+    def snap(self, lat: float, lon: float) -> Tuple[float, float]:
+        """Centre of the grid cell containing (lat, lon)."""
+        if self.grid <= 0:
+            return lat, lon
+        return round(round(lat / self.grid) * self.grid, 6), round(round(lon / self.grid) * self.grid, 6)
+
+    async def get(self, endpoint: str, lat: float, lon: float, fetch: Fetch) -> Any:
+        """Cached response for the cell containing (lat, lon); ``fetch(lat, lon)`` is called with the cell centre."""
+        key = (endpoint, *self.snap(lat, lon))
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = entry.age()
+            ttl = self.ttls[endpoint]
+            if age < ttl:
+                self._entries.move_to_end(key)
+                WEATHER_CACHE_REQUESTS.inc(endpoint=endpoint, result="hit")
+                return entry.value
+            if age < ttl + self.max_stale:
+                self._entries.move_to_end(key)
+                if key not in self._inflight:
+                    self._start(key, fetch).add_done_callback(self._log_refresh_failure)
+                WEATHER_CACHE_REQUESTS.inc(endpoint=endpoint, result="stale")
+                return entry.value
+
+        task = self._inflight.get(key)
+        WEATHER_CACHE_REQUESTS.inc(endpoint=endpoint, result="miss" if task is None else "coalesced")
+        if task is None:
+            task = self._start(key, fetch)
+        # A caller that disconnects stops waiting; the shared call carries on for the others
+        return await asyncio.shield(task)
+
+    def last_good(self, endpoint: str, lat: float, lon: float) -> Optional[CacheEntry]:
+        """The cell's last successful response however old (until evicted), for when upstream is failing."""
+        return self._entries.get((endpoint, *self.snap(lat, lon)))
+
+    async def warm(self, endpoint: str, lat: float, lon: float, fetch: Fetch, min_age: float = 0.0) -> bool:
+        """Fetch the cell now unless its entry is younger than ``min_age`` seconds; True if it fetched."""
+        key = (endpoint, *self.snap(lat, lon))
+        entry = self._entries.get(key)
+        if entry is not None and entry.age() < min_age:
+            return False
+        task = self._inflight.get(key) or self._start(key, fetch)
+        await asyncio.shield(task)
+        return True
+
+    def _start(self, key: Key, fetch: Fetch) -> asyncio.Task:
+        task = asyncio.create_task(self._fetch(key, fetch))
+        self._inflight[key] = task
+        return task
+
+    async def _fetch(self, key: Key, fetch: Fetch) -> Any:
+        try:
+            value = await fetch(key[1], key[2])
+            self._store(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def _store(self, key: Key, value: Any):
+        self._entries[key] = CacheEntry(value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    @staticmethod
+    def _log_refresh_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None and not isinstance(task.exception(), CircuitOpenError):
+            logger.warning("Background weather refresh failed; serving the stale entry: %r", task.exception())
+
+    def clear(self):
+        self._entries.clear()
+
+
+weather_cache = WeatherCache(
+    grid=settings.WEATHER_CACHE_GRID,
+    ttls={
+        "current": settings.WEATHER_CACHE_TTL_CURRENT,
+        "forecast": settings.WEATHER_CACHE_TTL_FORECAST,
+        "forecast_compact": settings.WEATHER_CACHE_TTL_FORECAST,
+        "reverse_geocode": settings.WEATHER_CACHE_TTL_GEOCODE,
+    },
+    max_stale=settings.WEATHER_CACHE_MAX_STALE,
+    max_entries=settings.WEATHER_CACHE_MAX_ENTRIES,
+)
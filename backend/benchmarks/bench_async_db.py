@@ -0,0 +1,209 @@
+"""Before/after latency benchmark for the AsyncSession port.
+
+Seeds a throwaway SQLite database with a realistic harvest-season account and
+fires concurrent requests at the transportation, lot-number, dashboard and
+labour endpoints. The "before" run mounts copies of the old handlers
+(``async def`` routes doing blocking ``db.query(...)`` calls on the sync
+session); the "after" run uses the real routers on ``get_async_db``.
+
+A probe task sleeps 10 ms in a loop alongside the load and records how late it
+wakes up; that overshoot is the delay every other request on the worker (health
+checks, weather proxying, auth) pays while a handler blocks the event loop.
+
+Usage (from backend/):
+    python -m benchmarks.bench_async_db --concurrency 12 --requests 1000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import List
+
+_tmpdir = tempfile.mkdtemp(prefix="kisansetu-bench-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmpdir}/bench.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import APIRouter, Depends, FastAPI
+from sqlalchemy import func, case
+from sqlalchemy.orm import Session, joinedload
+
+from app.db import Base, engine, async_engine, SessionLocal, get_db
+from app.models import User, Field, LotNumber, Transportation, LabourGroup, Labourer, LabourAttendance, Payment, MoneyRecord, Yield
+from app.routes import transportation, lot_numbers, dashboard, labour
+from app.schemas.labour import LabourAttendanceResponse
+from app.schemas.lot_number import LotNumberResponse
+from app.schemas.transportation import TransportationResponse
+from app.utils.jwt import get_current_user
+from app.utils.security import create_access_token
+
+ENDPOINTS = ["/transportations/", "/lot-numbers/", "/dashboard/", "/labour/attendance/history"]
+
+
+def seed(fields=20, transports=5000, labourers=60, days=120):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        user = User(username="bench_farmer", password="x")
+        db.add(user)
+        db.flush()
+        field_rows = [Field(field_name=f"Field {i}", area=2.5, year=2025, user_id=user.id) for i in range(fields)]
+        db.add_all(field_rows)
+        db.flush()
+        lots = {}
+        today = date.today()
+        for i in range(transports):
+            f = field_rows[i % fields]
+            lot = f"LOT-{i % 40}"
+            db.add(Transportation(field_id=f.id, lot_number=lot, transport_date=today - timedelta(days=i % days),
+                                  small_packets=3, medium_packets=5, large_packets=2, overlarge_packets=1))
+            lots.setdefault(lot, f.field_name)
+        for lot, field_name in lots.items():
+            db.add(LotNumber(lot_number=lot, field_name=field_name, small_packets=0, medium_packets=0,
+                             large_packets=0, xlarge_packets=0, storage_date=today, user_id=user.id))
+        group = LabourGroup(group_name="Crew", user_id=user.id)
+        db.add(group)
+        db.flush()
+        workers = [Labourer(name=f"W{i}", village="V", daily_wage=400, group_id=group.id, user_id=user.id) for i in range(labourers)]
+        db.add_all(workers)
+        db.flush()
+        for d in range(days):
+            for w in workers:
+                db.add(LabourAttendance(labourer_id=w.id, attendance_date=today - timedelta(days=d),
+                                        status="full" if (w.id + d) % 3 else "half", user_id=user.id))
+        for w in workers:
+            db.add(Payment(labourer_id=w.id, amount=2000, payment_date=today, working_days=5, user_id=user.id))
+        for i in range(500):
+            db.add(MoneyRecord(paid_to="Supplier", amount=150, payment_date=today, payment_method="cash", user_id=user.id))
+            db.add(Yield(field_id=field_rows[i % fields].id, date=today, large=10, medium=12, small=5, overlarge=2))
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+
+def legacy_router():
+    """The pre-port handlers: async routes that block the loop on the sync session."""
+    router = APIRouter()
+
+    @router.get("/transportations/", response_model=List[TransportationResponse])
+    async def legacy_transportations(db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
+        return db.query(Transportation).options(joinedload(Transportation.field)).join(Field).filter(
+            Field.user_id == current_user["id"]).order_by(Transportation.transport_date.desc()).all()
+
+    @router.get("/lot-numbers/", response_model=List[LotNumberResponse])
+    async def legacy_lots(db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
+        return db.query(LotNumber).filter(LotNumber.user_id == current_user["id"]).order_by(LotNumber.storage_date.desc()).all()
+
+    @router.get("/dashboard/")
+    async def legacy_dashboard(db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
+        user_id = current_user["id"]
+        grades = (func.sum(Yield.large), func.sum(Yield.medium), func.sum(Yield.small), func.sum(Yield.overlarge))
+        packets = (func.sum(Transportation.small_packets), func.sum(Transportation.medium_packets),
+                   func.sum(Transportation.large_packets), func.sum(Transportation.overlarge_packets))
+        earnings = func.sum(case(
+            (LabourAttendance.status == "full", Labourer.daily_wage),
+            (LabourAttendance.status == "half", Labourer.daily_wage * 0.5),
+            else_=0,
+        ))
+        return {
+            "total_fields": db.query(func.count(Field.id)).filter(Field.user_id == user_id).scalar(),
+            "yield": list(db.query(*grades).join(Field).filter(Field.user_id == user_id).first()),
+            "payments": db.query(func.sum(Payment.amount)).filter(Payment.user_id == user_id).scalar(),
+            "expenses": db.query(func.sum(MoneyRecord.amount)).filter(MoneyRecord.user_id == user_id).scalar(),
+            "earnings": db.query(earnings).select_from(LabourAttendance).join(
+                Labourer, LabourAttendance.labourer_id == Labourer.id).filter(LabourAttendance.user_id == user_id).scalar(),
+            "transported": list(db.query(*packets).join(Field).filter(Field.user_id == user_id).first()),
+        }
+
+    @router.get("/labour/attendance/history", response_model=list[LabourAttendanceResponse])
+    async def legacy_attendance(db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
+        return db.query(LabourAttendance).join(Labourer).join(LabourGroup).filter(
+            LabourAttendance.user_id == current_user["id"], LabourGroup.user_id == current_user["id"]
+        ).options(joinedload(LabourAttendance.labourer)).order_by(
+            LabourAttendance.attendance_date.asc(), LabourAttendance.labourer_id.asc()).all()
+
+    return router
+
+
+def build_app(mode):
+    app = FastAPI()
+
+    if mode == "before":
+        app.include_router(legacy_router())
+    else:
+        app.include_router(transportation.router, prefix="/transportations")
+        app.include_router(lot_numbers.router, prefix="/lot-numbers")
+        app.include_router(dashboard.router, prefix="/dashboard")
+        app.include_router(labour.router, prefix="/labour")
+    return app
+
+
+def pct(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))] * 1000
+
+
+async def run(mode, token, concurrency, total):
+    app = build_app(mode)
+    latencies = {path: [] for path in ENDPOINTS}
+    loop_lag = []
+    errors = []
+    headers = {"Authorization": f"Bearer {token}"}
+    counter = iter(range(total))
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", headers=headers, timeout=120) as client:
+        async def worker():
+            for i in counter:
+                path = ENDPOINTS[i % len(ENDPOINTS)]
+                start = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    response.raise_for_status()
+                except Exception as e:
+                    # The legacy handlers can exhaust the sync pool: connections are only
+                    # released by teardown code that needs the very loop they are blocking.
+                    errors.append(f"{path}: {type(e).__name__}")
+                    continue
+                latencies[path].append(time.perf_counter() - start)
+
+        async def probe(stop):
+            while not stop.is_set():
+                start = time.perf_counter()
+                await asyncio.sleep(0.01)
+                loop_lag.append(time.perf_counter() - start - 0.01)
+
+        stop = asyncio.Event()
+        probe_task = asyncio.create_task(probe(stop))
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await probe_task
+    await async_engine.dispose()
+
+    print(f"\n== {mode}: {total} requests, concurrency {concurrency}, {total / elapsed:.0f} req/s, {len(errors)} errors")
+    print(f"{'endpoint':32} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for path, samples in list(latencies.items()) + [("event-loop lag", loop_lag)]:
+        if samples:
+            print(f"{path:32} {pct(samples, 0.50):8.1f} {pct(samples, 0.95):8.1f} {pct(samples, 0.99):8.1f} {max(samples) * 1000:8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=12)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--transports", type=int, default=5000)
+    args = parser.parse_args()
+
+    user_id = seed(transports=args.transports)
+    token = create_access_token({"sub": str(user_id)})
+    for mode in ("before", "after"):
+        asyncio.run(run(mode, token, args.concurrency, args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Latency of GET /dashboard/ and /dashboard/graphs: per-metric queries vs one statement.
+
+Seeds the same data as ``bench_indexes`` (a large farm among a few hundred
+small ones) at the latest revision, then times, for the large farm and with
+p50/p99: the original per-metric queries (six for the totals, four for the
+graphs), the same totals as one aggregate statement (``rollups.base_totals``,
+what the rollup check recomputes), the ``user_rollups`` primary-key lookup
+/dashboard/ now does, and the single ``graph_rows`` UNION ALL. The
+/dashboard/field-stats slice is timed both ways too: re-aggregated from the
+yields, transportations and tasks (``field_stats.base_cells``) and read from
+the ``field_month_stats`` cube.
+
+On an in-process SQLite file a round trip costs microseconds, so ``--rtt-ms``
+adds a fixed delay per statement to stand in for the network hop to a hosted
+PostgreSQL (a few ms between regions of the same cloud is typical).
+
+Usage (from backend/):
+    python -m benchmarks.bench_dashboard --requests 200 --rtt-ms 0 2
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.bench_indexes import alembic_config, seed
+from benchmarks.bench_sqlite_profile import pct
+
+from alembic import command
+from sqlalchemy import case, event, func, select, text
+
+from app.db import engine, async_engine, AsyncSessionLocal
+from app.models import Field, Yield, Task, Payment, LabourAttendance, Labourer, MoneyRecord, Transportation
+from app.routes.dashboard import get_dashboard_data, get_graph_data, get_field_stats
+from app.utils.rollups import base_totals, rebuild_rollups
+from app.utils.field_stats import base_cells, rebuild_field_stats
+
+
+async def legacy_dashboard(db, user_id):
+    """The per-metric queries /dashboard/ issued before the combined statement."""
+    await db.execute(select(func.count(Field.id)).filter(Field.user_id == user_id))
+    await db.execute(select(func.sum(Yield.large), func.sum(Yield.medium), func.sum(Yield.small), func.sum(Yield.overlarge))
+                     .select_from(Yield).join(Field).filter(Field.user_id == user_id))
+    await db.execute(select(func.sum(Payment.amount)).filter(Payment.user_id == user_id))
+    await db.execute(select(func.sum(MoneyRecord.amount)).filter(MoneyRecord.user_id == user_id))
+    await db.execute(select(func.sum(case(
+        (LabourAttendance.status == 'full', Labourer.daily_wage),
+        (LabourAttendance.status == 'half', Labourer.daily_wage * 0.5),
+        else_=0,
+    ))).select_from(LabourAttendance).join(Labourer, LabourAttendance.labourer_id == Labourer.id)
+        .filter(LabourAttendance.user_id == user_id))
+    await db.execute(select(func.sum(Transportation.small_packets), func.sum(Transportation.medium_packets),
+                            func.sum(Transportation.large_packets), func.sum(Transportation.overlarge_packets))
+                     .select_from(Transportation).join(Field).filter(Field.user_id == user_id))
+
+
+async def legacy_graphs(db, user_id):
+    """The queries /dashboard/graphs issued before the UNION ALL."""
+    await db.execute(select(func.sum(Yield.large), func.sum(Yield.medium), func.sum(Yield.small), func.sum(Yield.overlarge))
+                     .select_from(Yield).join(Field).filter(Field.user_id == user_id))
+    await db.execute(select(Field.field_name, func.sum(Yield.large), func.sum(Yield.medium), func.sum(Yield.small),
+                            func.sum(Yield.overlarge)).join(Yield).filter(Field.user_id == user_id).group_by(Field.id))
+    await db.execute(select(MoneyRecord.payment_method, func.sum(MoneyRecord.amount))
+                     .filter(MoneyRecord.user_id == user_id).group_by(MoneyRecord.payment_method))
+    await db.execute(select(Task.start_date, func.sum(Task.rate)).join(Field)
+                     .filter(Field.user_id == user_id).group_by(Task.start_date))
+
+
+async def aggregate_dashboard(db, user_id):
+    """All the totals recomputed from the base tables in one statement."""
+    (await db.execute(base_totals(user_id))).one()
+
+
+async def aggregate_field_stats(db, user_id):
+    """The cube's cells recomputed from the base tables."""
+    (await db.execute(base_cells(user_id))).all()
+
+
+async def run(name, handler, user_id, requests):
+    samples = []
+    statements = 0
+
+    def count(*args):
+        nonlocal statements
+        statements += 1
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+    try:
+        for _ in range(requests):
+            async with AsyncSessionLocal() as db:
+                started = time.perf_counter()
+                await handler(db, user_id)
+                samples.append(time.perf_counter() - started)
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", count)
+    print(f"{name:42} {statements / requests:6.0f} {pct(samples, 0.50):9.2f} {pct(samples, 0.99):9.2f}")
+
+
+async def main_async(args, user_id):
+    current_user = {"id": str(user_id)}
+    cases = [
+        ("GET /dashboard/ (per metric)", legacy_dashboard),
+        ("GET /dashboard/ (one aggregate)", aggregate_dashboard),
+        ("GET /dashboard/ (rollup lookup)", lambda db, uid: get_dashboard_data(db=db, current_user=current_user)),
+        ("GET /dashboard/graphs (per query)", legacy_graphs),
+        ("GET /dashboard/graphs (one statement)", lambda db, uid: get_graph_data(db=db, current_user=current_user)),
+        ("GET /dashboard/field-stats (base tables)", aggregate_field_stats),
+        ("GET /dashboard/field-stats (cube)", lambda db, uid: get_field_stats(
+            field_id=None, season=None, year=None, month=None, db=db, current_user=current_user)),
+    ]
+    for rtt_ms in args.rtt_ms:
+        def delay(*_):
+            time.sleep(rtt_ms / 1000)
+
+        if rtt_ms:
+            event.listen(async_engine.sync_engine, "before_cursor_execute", delay)
+        print(f"\n== {rtt_ms:g} ms per round trip, {args.requests} requests each")
+        print(f"{'endpoint':42} {'stmts':>6} {'p50 ms':>9} {'p99 ms':>9}")
+        for name, handler in cases:
+            await run(name, handler, user_id, args.requests)
+        if rtt_ms:
+            event.remove(async_engine.sync_engine, "before_cursor_execute", delay)
+    await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--farms", type=int, default=300, help="small accounts sharing the tables")
+    parser.add_argument("--attendance", type=int, default=60000, help="attendance rows for the large farm")
+    parser.add_argument("--transports", type=int, default=30000, help="transportation rows for the large farm")
+    parser.add_argument("--requests", type=int, default=200, help="timed calls per endpoint and variant")
+    parser.add_argument("--rtt-ms", type=float, nargs="+", default=[0, 2], help="simulated per-statement round trip(s)")
+    args = parser.parse_args()
+
+    command.upgrade(alembic_config(), "head")
+    user_id, field_id, group_id = seed(args.farms, args.attendance, args.transports)
+    with engine.begin() as conn:
+        # bench_indexes doesn't create tasks; give the labour trend something to group
+        conn.execute(Task.__table__.insert(), [
+            {"task_name": f"T{i}", "field_id": field_id, "group_id": group_id, "start_date": day, "end_date": day,
+             "payment_type": "daily", "rate": 400}
+            for i, day in enumerate(conn.execute(select(Yield.date).distinct().limit(120)).scalars())
+        ])
+        # Seeded straight into the tables, so build the rollups the routes would have maintained
+        rebuild_rollups(conn)
+        rebuild_field_stats(conn)
+        conn.execute(text("ANALYZE"))
+    engine.dispose()
+    asyncio.run(main_async(args, user_id))
+
+
+if __name__ == "__main__":
+    main()
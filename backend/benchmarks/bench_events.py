@@ -0,0 +1,214 @@
+"""Thousands of idle /events streams across several workers, then fan-out latency.
+
+Starts the stand-in broker and ``--workers`` uvicorn processes on one SQLite
+file (each its own port, as behind a load balancer), opens ``--connections``
+SSE streams for one user spread evenly over the workers, and leaves them idle
+for ``--idle`` seconds with a short heartbeat. It then records each worker's
+RSS and posts ``--writes`` money records to the first worker. For each write
+it measures how long after sending the request every stream, on every worker,
+received the event (it goes out at commit, so usually before the response).
+All streams must see every event: a missed event or a ``resync`` is reported
+as a failure. The client, broker and workers share the machine, so on a box
+with few cores the latency is mostly total CPU per delivery.
+
+Usage (from backend/):
+    python -m benchmarks.bench_events --connections 4000 --workers 2 --idle 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _BACKEND_DIR)
+
+from benchmarks.bench_sqlite_profile import pct
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+async def wait_healthy(port: int, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"GET /health HTTP/1.1\r\nHost: bench\r\nConnection: close\r\n\r\n")
+            if b"200" in await reader.readline():
+                writer.close()
+                return
+            writer.close()
+        except OSError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"worker on port {port} did not become healthy")
+
+
+class Stream:
+    """A raw-socket SSE client: far lighter than an HTTP client per connection, so one process can hold thousands."""
+
+    def __init__(self, port: int, token: str):
+        self.port = port
+        self.token = token
+        self.received = {}  # money record id -> perf_counter when it arrived
+        self.resyncs = 0
+        self.ready = asyncio.Event()
+
+    async def run(self):
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        writer.write((f"GET /events/ HTTP/1.1\r\nHost: bench\r\nAccept: text/event-stream\r\n"
+                      f"Authorization: Bearer {self.token}\r\n\r\n").encode())
+        status = await reader.readline()
+        if b" 200 " not in status:
+            raise RuntimeError(f"stream refused: {status!r}")
+        name = None
+        while line := await reader.readline():
+            line = line.rstrip(b"\r\n")
+            if line.startswith(b"event: "):
+                name = line[7:].decode()
+            elif line.startswith(b"data: ") and name:
+                if name == "ready":
+                    self.ready.set()
+                elif name == "money":
+                    self.received[json.loads(line[6:])["id"]] = time.perf_counter()
+                elif name == "resync":
+                    self.resyncs += 1
+                name = None
+
+
+async def post_money(port: int, token: str, i: int):
+    body = json.dumps({"paid_to": f"bench {i}", "amount": 10 + i, "payment_date": "2025-01-01",
+                       "payment_method": "cash", "notes": None}).encode()
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    sent = time.perf_counter()
+    writer.write((f"POST /money-records/ HTTP/1.1\r\nHost: bench\r\nAuthorization: Bearer {token}\r\n"
+                  f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n").encode() + body)
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    if b" 200 " not in head.split(b"\r\n", 1)[0]:
+        raise RuntimeError(f"write failed: {head[:200]!r}")
+    # Connection: close, so the body is whatever follows the headers (possibly chunked)
+    start, end = payload.find(b"{"), payload.rfind(b"}")
+    return json.loads(payload[start:end + 1])["id"], sent
+
+
+async def run_clients(args, ports, pids, token):
+    streams = [Stream(ports[i % len(ports)], token) for i in range(args.connections)]
+    started = time.perf_counter()
+    tasks = []
+    for i in range(0, len(streams), 200):
+        # Open in batches so the accept queues don't overflow
+        tasks += [asyncio.create_task(stream.run()) for stream in streams[i:i + 200]]
+        await asyncio.gather(*(stream.ready.wait() for stream in streams[i:i + 200]))
+    print(f"opened {len(streams)} streams over {len(ports)} worker(s) in {time.perf_counter() - started:.1f}s")
+
+    await asyncio.sleep(args.idle)
+    failed = [task for task in tasks if task.done()]
+    print(f"after {args.idle:g}s idle: {len(streams) - len(failed)} streams still open")
+    for port, pid in zip(ports, pids):
+        print(f"  worker :{port} RSS {rss_mb(pid):.0f} MB")
+
+    latencies = []
+    for i in range(args.writes):
+        record_id, sent = await post_money(ports[0], token, i)
+        deadline = time.monotonic() + 10
+        while any(record_id not in stream.received for stream in streams) and time.monotonic() < deadline:
+            await asyncio.sleep(0.005)
+        arrivals = [stream.received[record_id] - sent for stream in streams if record_id in stream.received]
+        missed = len(streams) - len(arrivals)
+        latencies.append((max(arrivals) if arrivals else float("nan"), pct(arrivals, 0.50), pct(arrivals, 0.99), missed))
+        await asyncio.sleep(args.interval)
+
+    print(f"\n{'write':>5} {'p50 ms':>8} {'p99 ms':>8} {'last ms':>8} {'missed':>7}")
+    for i, (last, p50, p99, missed) in enumerate(latencies):
+        print(f"{i:5d} {p50:8.1f} {p99:8.1f} {last * 1000:8.1f} {missed:7d}")
+    resyncs = sum(stream.resyncs for stream in streams)
+    missed_total = sum(row[3] for row in latencies)
+    print(f"\n{'OK' if not missed_total and not resyncs else 'FAILED'}: {missed_total} missed deliveries, {resyncs} resyncs")
+    for task in tasks:
+        task.cancel()
+    return 0 if not missed_total and not resyncs else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=4000, help="idle SSE streams to hold open")
+    parser.add_argument("--workers", type=int, default=2, help="uvicorn processes sharing the broker")
+    parser.add_argument("--idle", type=float, default=20, help="seconds to sit idle before writing")
+    parser.add_argument("--writes", type=int, default=10, help="money records posted after the idle period")
+    parser.add_argument("--interval", type=float, default=0.2, help="seconds between writes")
+    parser.add_argument("--prepare", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.prepare:
+        from benchmarks.bench_sqlite_profile import prepare
+        print(json.dumps(prepare()))
+        return 0
+
+    # Each stream is a socket on both ends
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = min(hard, args.connections * 2 + 1024)
+    if soft < wanted:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (wanted, hard))
+
+    tmpdir = tempfile.mkdtemp(prefix="kisansetu-bench-")
+    broker_port = free_port()
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{tmpdir}/bench.db",
+        JWT_SECRET=secrets.token_urlsafe(32),  # shared, so a token works on every worker
+        EVENTS_BROKER_URL=f"tcp://127.0.0.1:{broker_port}",
+        EVENTS_HEARTBEAT_SECONDS="5",
+        EVENTS_MAX_CONNECTIONS=str(args.connections),
+        LOOP_MONITOR_ENABLED="false",
+    )
+    output = subprocess.run([sys.executable, "-m", "benchmarks.bench_events", "--prepare"],
+                            cwd=_BACKEND_DIR, env=env, capture_output=True, text=True, check=True).stdout
+    user_id = json.loads(output.strip().splitlines()[-1])["user_id"]
+    os.environ.update(env)
+    from app.utils.security import create_access_token
+    token = create_access_token({"sub": str(user_id)})
+
+    processes = [subprocess.Popen([sys.executable, "-m", "app.utils.events", "broker", "--port", str(broker_port)],
+                                  cwd=_BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)]
+    ports = [free_port() for _ in range(args.workers)]
+    for port in ports:
+        processes.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning",
+             "--backlog", "4096", "--timeout-graceful-shutdown", "2"],
+            cwd=_BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+    try:
+        async def run():
+            await asyncio.gather(*(wait_healthy(port) for port in ports))
+            # Let the workers reach the broker before anything is published
+            await asyncio.sleep(1)
+            return await run_clients(args, ports, [p.pid for p in processes[1:]], token)
+        return asyncio.run(run())
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
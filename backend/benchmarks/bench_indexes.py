@@ -0,0 +1,190 @@
+"""Query plans and timings for the user-scoped index migration (0002).
+
+Builds a throwaway SQLite database at the baseline revision, seeds it with a
+few hundred small farms plus one large one (tens of thousands of attendance
+and transportation rows), and runs the query shapes used by ``app/routes`` for
+the large farm. Each query is shown with its ``EXPLAIN QUERY PLAN`` and median
+time, first on the baseline schema and again after ``alembic upgrade 0002``.
+
+Usage (from backend/):
+    python -m benchmarks.bench_indexes --farms 300 --attendance 60000 --transports 30000
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+_tmpdir = tempfile.mkdtemp(prefix="kisansetu-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_tmpdir}/bench.db"
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _BACKEND_DIR)
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import case, func, insert, select, text
+
+from app.db import engine
+from app.models import (User, Field, Yield, LotNumber, Transportation, LabourGroup, Labourer,
+                        LabourAttendance, Payment, MoneyRecord, Borrowing)
+
+
+def alembic_config():
+    config = Config(os.path.join(_BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(_BACKEND_DIR, "migrations"))
+    return config
+
+
+def seed(farms, attendance_rows, transport_rows):
+    """Insert ``farms`` small accounts and one large one; returns the large account's ids."""
+    today = date.today()
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"username": f"farmer{i}", "password": "x"} for i in range(farms + 1)])
+        user_ids = conn.execute(select(User.id).order_by(User.id)).scalars().all()
+        big_user = user_ids[-1]
+
+        conn.execute(insert(Field), [
+            {"field_name": f"F{u}-{i}", "area": 2.0, "year": 2025, "user_id": u}
+            for u in user_ids for i in range(12 if u == big_user else 3)
+        ])
+        fields = conn.execute(select(Field.id, Field.user_id)).all()
+        fields_by_user = {}
+        for field_id, user_id in fields:
+            fields_by_user.setdefault(user_id, []).append(field_id)
+
+        conn.execute(insert(LabourGroup), [{"group_name": "Crew", "user_id": u} for u in user_ids])
+        groups = dict(conn.execute(select(LabourGroup.user_id, LabourGroup.id)).all())
+        conn.execute(insert(Labourer), [
+            {"name": f"W{i}", "village": "V", "daily_wage": 400, "group_id": groups[u], "user_id": u}
+            for u in user_ids for i in range(60 if u == big_user else 8)
+        ])
+        labourers_by_user = {}
+        for labourer_id, user_id in conn.execute(select(Labourer.id, Labourer.user_id)).all():
+            labourers_by_user.setdefault(user_id, []).append(labourer_id)
+
+        def per_user(u, big, small):
+            return big if u == big_user else small
+
+        attendance, transports, payments, money, yields, borrowings, lots = [], [], [], [], [], [], []
+        for u in user_ids:
+            workers = labourers_by_user[u]
+            days = per_user(u, attendance_rows, 400) // len(workers)
+            for d in range(days):
+                for w in workers:
+                    attendance.append({"labourer_id": w, "attendance_date": today - timedelta(days=d),
+                                       "status": "full" if (w + d) % 3 else "half", "user_id": u})
+            user_fields = fields_by_user[u]
+            for i in range(per_user(u, transport_rows, 150)):
+                transports.append({"field_id": user_fields[i % len(user_fields)], "lot_number": f"LOT-{i % 80}",
+                                   "transport_date": today - timedelta(days=i % 365),
+                                   "small_packets": 3, "medium_packets": 5, "large_packets": 2, "overlarge_packets": 1})
+            for i in range(80 if u == big_user else 10):
+                lots.append({"lot_number": f"LOT-{i}", "field_name": "F", "small_packets": 0, "medium_packets": 0,
+                             "large_packets": 0, "xlarge_packets": 0, "storage_date": today, "user_id": u})
+            for i in range(per_user(u, 2000, 60)):
+                day = today - timedelta(days=i % 365)
+                payments.append({"labourer_id": workers[i % len(workers)], "amount": 2000, "payment_date": day,
+                                 "working_days": 5, "payment_type": "weekly", "user_id": u})
+                money.append({"paid_to": "Supplier", "amount": 150, "payment_date": day,
+                              "payment_method": "cash", "user_id": u})
+                yields.append({"field_id": user_fields[i % len(user_fields)], "date": day,
+                               "large": 10, "medium": 12, "small": 5, "overlarge": 2})
+                borrowings.append({"borrower_name": "B", "amount": 500, "borrow_date": day,
+                                   "status": "pending", "user_id": u})
+
+        for model, rows in ((LabourAttendance, attendance), (Transportation, transports), (Payment, payments),
+                            (MoneyRecord, money), (Yield, yields), (Borrowing, borrowings), (LotNumber, lots)):
+            conn.execute(insert(model), rows)
+    return big_user, fields_by_user[big_user][0], groups[big_user]
+
+
+def route_queries(user_id, field_id, group_id):
+    """The WHERE/ORDER BY shapes of the busiest routes, for the given account."""
+    today = date.today()
+    earnings = func.sum(case(
+        (LabourAttendance.status == "full", Labourer.daily_wage),
+        (LabourAttendance.status == "half", Labourer.daily_wage * 0.5),
+        else_=0,
+    ))
+    return [
+        ("GET /money-records/", select(MoneyRecord).filter(MoneyRecord.user_id == user_id)),
+        ("GET /borrowings/", select(Borrowing).filter(Borrowing.user_id == user_id)),
+        ("GET /transportations/", select(Transportation).join(Field).filter(
+            Field.user_id == user_id).order_by(Transportation.transport_date.desc())),
+        ("GET /transportations/field/{id}", select(Transportation).filter(
+            Transportation.field_id == field_id).order_by(Transportation.transport_date.desc())),
+        ("lot lookup (transport/lot writes)", select(LotNumber).filter(
+            LotNumber.lot_number == "LOT-42", LotNumber.user_id == user_id)),
+        ("GET /labour/attendance?attendance_date=", select(LabourAttendance).join(Labourer).join(LabourGroup).filter(
+            LabourAttendance.user_id == user_id, LabourAttendance.attendance_date == today - timedelta(days=3),
+            LabourGroup.user_id == user_id)),
+        ("GET /labour/attendance/history (30 days)", select(LabourAttendance).join(Labourer).join(LabourGroup).filter(
+            LabourAttendance.user_id == user_id, LabourGroup.user_id == user_id,
+            LabourAttendance.attendance_date >= today - timedelta(days=30),
+        ).order_by(LabourAttendance.attendance_date.asc(), LabourAttendance.labourer_id.asc())),
+        ("GET /labour/payments", select(Payment).filter(Payment.user_id == user_id).order_by(
+            Payment.payment_date.desc(), Payment.id.desc())),
+        ("GET /labour/labourers", select(Labourer).join(LabourGroup).filter(LabourGroup.user_id == user_id)),
+        ("GET /fields/{id}/yields", select(Yield).filter(Yield.field_id == field_id)),
+        ("dashboard: labour earnings", select(earnings).select_from(LabourAttendance).join(
+            Labourer, LabourAttendance.labourer_id == Labourer.id).filter(LabourAttendance.user_id == user_id)),
+        ("dashboard: yield totals", select(func.sum(Yield.large), func.sum(Yield.medium)).select_from(
+            Yield).join(Field).filter(Field.user_id == user_id)),
+        ("dashboard: expenses", select(func.sum(MoneyRecord.amount)).filter(MoneyRecord.user_id == user_id)),
+        ("delete labourer: attendance", select(func.count()).select_from(LabourAttendance).filter(
+            LabourAttendance.labourer_id.in_(select(Labourer.id).filter(Labourer.group_id == group_id)))),
+    ]
+
+
+def measure(queries, repeat):
+    results = {}
+    with engine.connect() as conn:
+        for name, stmt in queries:
+            compiled = stmt.compile(engine, compile_kwargs={"literal_binds": True})
+            plan = [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {compiled}"))]
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                conn.execute(stmt).all()
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = (plan, statistics.median(timings))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--farms", type=int, default=300, help="small accounts sharing the tables")
+    parser.add_argument("--attendance", type=int, default=60000, help="attendance rows for the large farm")
+    parser.add_argument("--transports", type=int, default=30000, help="transportation rows for the large farm")
+    parser.add_argument("--repeat", type=int, default=15)
+    args = parser.parse_args()
+
+    config = alembic_config()
+    command.upgrade(config, "0001")
+    started = time.perf_counter()
+    ids = seed(args.farms, args.attendance, args.transports)
+    print(f"Seeded {args.farms + 1} accounts in {time.perf_counter() - started:.1f}s")
+    queries = route_queries(*ids)
+
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    before = measure(queries, args.repeat)
+
+    command.upgrade(config, "0002")
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    after = measure(queries, args.repeat)
+
+    for name, _ in queries:
+        (plan_before, ms_before), (plan_after, ms_after) = before[name], after[name]
+        print(f"\n{name}: {ms_before:.2f} ms -> {ms_after:.2f} ms ({ms_before / max(ms_after, 1e-6):.1f}x)")
+        print("  before: " + "\n          ".join(plan_before))
+        print("  after:  " + "\n          ".join(plan_after))
+
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""Concurrent transportations into a few hot lots: throughput and lot drift.
+
+Loading day: many loaders post transportations into the same handful of lots
+at once, correct some (packet counts, or the lot) and delete a few. Each
+writer process runs ``--clients`` concurrent clients with its own event loop
+and connection pool, the way uvicorn workers share one database. Clients
+create (60%), update (25%) or delete (15%) their own transportations in
+``--lots`` lots named HOT-n.
+
+Afterwards every HOT lot is checked against its base rows:
+
+* its packet counts equal the sums of the transportations into it;
+* its movements (lot_movements) sum to its counts;
+* each field's contribution (lot_fields) equals that field's transportations;
+* no lot number exists twice.
+
+With the old read-then-``+=`` writes the counts drifted under this load. Any
+drift makes the run exit non-zero. ``--write-queue`` routes the writes
+through the SQLite writer queue.
+
+Usage (from backend/):
+    python -m benchmarks.bench_lot_concurrency --processes 4 --clients 8 --duration 15
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _BACKEND_DIR)
+
+from benchmarks.bench_sqlite_profile import pct, prepare
+
+OPERATIONS = ["create", "update", "delete"]
+
+CHECKS = {
+    "lot counts vs transportations": """
+        SELECT COUNT(*) FROM lot_numbers
+        LEFT JOIN (
+            SELECT fields.user_id, lot_number, SUM(small_packets) AS s, SUM(medium_packets) AS m,
+                   SUM(large_packets) AS l, SUM(overlarge_packets) AS x
+            FROM transportations JOIN fields ON fields.id = transportations.field_id
+            GROUP BY fields.user_id, lot_number
+        ) t ON t.user_id = lot_numbers.user_id AND t.lot_number = lot_numbers.lot_number
+        WHERE lot_numbers.lot_number LIKE :lots
+          AND (small_packets <> COALESCE(t.s, 0) OR medium_packets <> COALESCE(t.m, 0)
+               OR large_packets <> COALESCE(t.l, 0) OR xlarge_packets <> COALESCE(t.x, 0))
+    """,
+    "lot counts vs movements": """
+        SELECT COUNT(*) FROM lot_numbers
+        LEFT JOIN (
+            SELECT lot_id, SUM(small_packets) AS s, SUM(medium_packets) AS m,
+                   SUM(large_packets) AS l, SUM(xlarge_packets) AS x
+            FROM lot_movements GROUP BY lot_id
+        ) j ON j.lot_id = lot_numbers.id
+        WHERE lot_numbers.lot_number LIKE :lots
+          AND (small_packets <> COALESCE(j.s, 0) OR medium_packets <> COALESCE(j.m, 0)
+               OR large_packets <> COALESCE(j.l, 0) OR xlarge_packets <> COALESCE(j.x, 0))
+    """,
+    "field contributions vs transportations": """
+        SELECT COUNT(*) FROM lot_fields
+        JOIN lot_numbers ON lot_numbers.id = lot_fields.lot_id
+        LEFT JOIN (
+            SELECT field_id, lot_number, SUM(small_packets) AS s, SUM(medium_packets) AS m,
+                   SUM(large_packets) AS l, SUM(overlarge_packets) AS x
+            FROM transportations GROUP BY field_id, lot_number
+        ) t ON t.field_id = lot_fields.field_id AND t.lot_number = lot_numbers.lot_number
+        WHERE lot_numbers.lot_number LIKE :lots
+          AND (lot_fields.small_packets <> COALESCE(t.s, 0) OR lot_fields.medium_packets <> COALESCE(t.m, 0)
+               OR lot_fields.large_packets <> COALESCE(t.l, 0) OR lot_fields.xlarge_packets <> COALESCE(t.x, 0))
+    """,
+    "duplicate lot numbers": """
+        SELECT COUNT(*) FROM (
+            SELECT user_id, lot_number FROM lot_numbers GROUP BY user_id, lot_number HAVING COUNT(*) > 1
+        ) d
+    """,
+}
+
+
+async def run_writer(index, clients, duration, lots, ids):
+    import httpx
+    from fastapi import FastAPI
+
+    from app.db import async_engine, write_queue
+    from app.routes import transportation
+    from app.utils.security import create_access_token
+
+    app = FastAPI()
+    app.include_router(transportation.router, prefix="/transportations")
+
+    latencies = {op: [] for op in OPERATIONS}
+    errors = {op: 0 for op in OPERATIONS}
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(ids['user_id'])})}"}
+    field_ids = ids["field_ids"]
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                 headers=headers, timeout=120) as client:
+        async def client_loop(n):
+            rng = random.Random(index * 1000 + n)
+            mine = []
+
+            def packets():
+                return {"small_packets": rng.randint(0, 5), "medium_packets": rng.randint(1, 5),
+                        "large_packets": rng.randint(0, 5), "overlarge_packets": rng.randint(0, 2)}
+
+            while time.perf_counter() < deadline:
+                roll = rng.random()
+                op = "create" if roll < 0.6 or not mine else "update" if roll < 0.85 else "delete"
+                if op == "create":
+                    request = client.post("/transportations/", json={
+                        "field_id": rng.choice(field_ids), "lot_number": f"HOT-{rng.randrange(lots)}", **packets()})
+                elif op == "update":
+                    body = packets()
+                    if rng.random() < 0.3:
+                        body["lot_number"] = f"HOT-{rng.randrange(lots)}"
+                    request = client.put(f"/transportations/{rng.choice(mine)}", json=body)
+                else:
+                    request = client.delete(f"/transportations/{mine.pop(rng.randrange(len(mine)))}")
+                start = time.perf_counter()
+                try:
+                    response = await request
+                    response.raise_for_status()
+                except Exception:
+                    # "database is locked" past busy_timeout surfaces as a 500; the transaction rolled back
+                    errors[op] += 1
+                    continue
+                latencies[op].append(time.perf_counter() - start)
+                if op == "create":
+                    mine.append(response.json()["id"])
+
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(client_loop(n) for n in range(clients)))
+
+    if write_queue is not None:
+        write_queue.stop()
+    await async_engine.dispose()
+    return {"latencies": latencies, "errors": errors}
+
+
+def check(lots="HOT-%"):
+    """``CHECKS`` failure counts for the lots whose numbers match the LIKE pattern ``lots``."""
+    from sqlalchemy import text
+
+    from app.db import engine
+
+    params = {"lots": lots}
+    with engine.connect() as conn:
+        results = {name: conn.execute(text(sql), params).scalar() for name, sql in CHECKS.items()}
+        results["hot lots"] = conn.execute(text("SELECT COUNT(*) FROM lot_numbers WHERE lot_number LIKE :lots"),
+                                           params).scalar()
+        results["packets in hot lots"] = conn.execute(text(
+            "SELECT COALESCE(SUM(small_packets + medium_packets + large_packets + xlarge_packets), 0) "
+            "FROM lot_numbers WHERE lot_number LIKE :lots"), params).scalar()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=4, help="writer processes")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent clients per process")
+    parser.add_argument("--lots", type=int, default=3, help="hot lots the transportations go into")
+    parser.add_argument("--duration", type=float, default=15, help="seconds of load")
+    parser.add_argument("--write-queue", action="store_true", help="route writes through the SQLite writer queue")
+    parser.add_argument("--role", help=argparse.SUPPRESS)
+    parser.add_argument("--index", type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument("--ids", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.role == "prepare":
+        print(json.dumps(prepare()))
+        return
+    if args.role == "writer":
+        print(json.dumps(asyncio.run(run_writer(args.index, args.clients, args.duration, args.lots, json.loads(args.ids)))))
+        return
+    if args.role == "check":
+        print(json.dumps(check()))
+        return
+
+    tmpdir = tempfile.mkdtemp(prefix="kisansetu-bench-")
+    env = dict(os.environ, SQLITE_PROFILE="production", SQLITE_WRITE_QUEUE=str(args.write_queue).lower(),
+               DATABASE_URL=os.environ.get("BENCH_DATABASE_URL", f"sqlite:///{tmpdir}/bench.db"))
+    command = [sys.executable, "-m", "benchmarks.bench_lot_concurrency", "--lots", str(args.lots)]
+
+    def run_role(*extra):
+        stdout = subprocess.run(command + list(extra), cwd=_BACKEND_DIR, env=env,
+                                capture_output=True, text=True, check=True).stdout
+        return json.loads(stdout.strip().splitlines()[-1])
+
+    ids = run_role("--role", "prepare")
+    writers = [
+        subprocess.Popen(command + ["--role", "writer", "--index", str(n), "--clients", str(args.clients),
+                                    "--duration", str(args.duration), "--ids", json.dumps(ids)],
+                         cwd=_BACKEND_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        for n in range(args.processes)
+    ]
+    latencies, errors = {op: [] for op in OPERATIONS}, dict.fromkeys(OPERATIONS, 0)
+    for proc in writers:
+        stdout, _ = proc.communicate()
+        result = json.loads(stdout.strip().splitlines()[-1])
+        for op in OPERATIONS:
+            latencies[op].extend(result["latencies"][op])
+            errors[op] += result["errors"][op]
+    results = run_role("--role", "check")
+
+    total = sum(len(samples) for samples in latencies.values())
+    mode = "writer queue" if args.write_queue else "pooled connections"
+    print(f"\n== {args.processes} processes x {args.clients} clients into {args.lots} lots, {mode}, "
+          f"{args.duration:.0f}s: {total / args.duration:.1f} writes/s")
+    print(f"{'operation':10} {'req/s':>8} {'errors':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    for op in OPERATIONS:
+        samples = latencies[op]
+        print(f"{op:10} {len(samples) / args.duration:8.1f} {errors[op]:7d} {pct(samples, 0.50):8.1f} {pct(samples, 0.99):8.1f}")
+    print(f"\n{results['hot lots']} hot lots holding {results['packets in hot lots']} packets")
+    drift = 0
+    for name in CHECKS:
+        drift += results[name]
+        print(f"{name:40} {results[name]:5d} {'OK' if not results[name] else 'DRIFT'}")
+    return 1 if drift else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
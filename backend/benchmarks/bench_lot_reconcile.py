@@ -0,0 +1,141 @@
+"""Lot reconciliation over a large account: check and repair times, and memory.
+
+Seeds the benchmark farmer with ``--rows`` transportations (a million by
+default) spread over ``--lots`` lots and the seed's fields, plus what the
+writers keep alongside them: the lots, one movement per transportation and the
+field contributions. Then, with app/utils/lot_reconciliation.py:
+
+1. check: everything consistent;
+2. drifts every 50th lot's counts and every 50th field contribution, and
+   deletes every 500th lot, behind the reconciliation's back;
+3. check (finding them), repair, check again: consistent.
+
+Checks stream their differences, so Python's peak memory (tracemalloc) stays
+flat however many rows there are; the GROUP BYs run in the database. Runs
+against DATABASE_URL, migrated and seeded first.
+
+Usage (from backend/):
+    DATABASE_URL=sqlite:////tmp/bench.db SQLITE_PROFILE=production python -m benchmarks.bench_lot_reconcile
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from sqlalchemy import insert, text
+
+from benchmarks.bench_sqlite_profile import prepare
+
+from app.db import engine
+from app.models import Transportation
+from app.utils.lot_reconciliation import lot_differences, repair_lots
+
+BATCH = 10000
+
+
+LOTS = """
+INSERT INTO lot_numbers (user_id, lot_number, field_name, storage_date, small_packets, medium_packets,
+                         large_packets, xlarge_packets)
+SELECT fields.user_id, t.lot_number, MIN(fields.field_name), MIN(t.transport_date), SUM(t.small_packets),
+       SUM(t.medium_packets), SUM(t.large_packets), SUM(t.overlarge_packets)
+FROM transportations t JOIN fields ON fields.id = t.field_id
+WHERE t.lot_number LIKE 'REC-%'
+GROUP BY fields.user_id, t.lot_number
+"""
+
+MOVEMENTS = """
+INSERT INTO lot_movements (lot_id, user_id, kind, field_id, transportation_id, small_packets, medium_packets,
+                           large_packets, xlarge_packets)
+SELECT lot_numbers.id, fields.user_id, 'transported', t.field_id, t.id, t.small_packets, t.medium_packets,
+       t.large_packets, t.overlarge_packets
+FROM transportations t
+JOIN fields ON fields.id = t.field_id
+JOIN lot_numbers ON lot_numbers.user_id = fields.user_id AND lot_numbers.lot_number = t.lot_number
+WHERE t.lot_number LIKE 'REC-%'
+"""
+
+CONTRIBUTIONS = """
+INSERT INTO lot_fields (lot_id, field_id, small_packets, medium_packets, large_packets, xlarge_packets)
+SELECT lot_numbers.id, t.field_id, SUM(t.small_packets), SUM(t.medium_packets), SUM(t.large_packets),
+       SUM(t.overlarge_packets)
+FROM transportations t
+JOIN fields ON fields.id = t.field_id
+JOIN lot_numbers ON lot_numbers.user_id = fields.user_id AND lot_numbers.lot_number = t.lot_number
+WHERE t.lot_number LIKE 'REC-%'
+GROUP BY lot_numbers.id, t.field_id
+"""
+
+DRIFT = [
+    "UPDATE lot_numbers SET small_packets = small_packets + 3 WHERE lot_number LIKE 'REC-%' AND id % 50 = 0",
+    "UPDATE lot_fields SET large_packets = large_packets - 1 WHERE lot_id % 50 = 25",
+    "DELETE FROM lot_movements WHERE lot_id IN (SELECT id FROM lot_numbers WHERE lot_number LIKE 'REC-%' AND id % 500 = 7)",
+    "DELETE FROM lot_fields WHERE lot_id IN (SELECT id FROM lot_numbers WHERE lot_number LIKE 'REC-%' AND id % 500 = 7)",
+    "DELETE FROM lot_numbers WHERE lot_number LIKE 'REC-%' AND id % 500 = 7",
+]
+
+
+def seed_account(rows, lots, field_ids):
+    rng = random.Random(3)
+    start = date(2026, 1, 1)
+    with engine.begin() as conn:
+        for offset in range(0, rows, BATCH):
+            conn.execute(insert(Transportation), [{
+                "field_id": rng.choice(field_ids), "lot_number": f"REC-{rng.randrange(lots)}",
+                "transport_date": start + timedelta(days=rng.randrange(300)),
+                "small_packets": rng.randint(0, 20), "medium_packets": rng.randint(0, 20),
+                "large_packets": rng.randint(0, 20), "overlarge_packets": rng.randint(0, 5),
+            } for _ in range(min(BATCH, rows - offset))])
+        for statement in (LOTS, MOVEMENTS, CONTRIBUTIONS):
+            conn.execute(text(statement))
+
+
+def timed(label, fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{label:44} {seconds:7.2f}s  peak {peak / 1024:8.0f} KiB  {result}")
+    return result
+
+
+def check(user_id):
+    with engine.connect() as conn:
+        return sum(1 for _ in lot_differences(conn, user_id))
+
+
+def repair(user_id):
+    with engine.begin() as conn:
+        return repair_lots(conn, user_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="transportations in the account")
+    parser.add_argument("--lots", type=int, default=5000, help="lots they go into")
+    args = parser.parse_args()
+
+    ids = prepare()
+    user_id = ids["user_id"]
+    start = time.perf_counter()
+    seed_account(args.rows, args.lots, ids["field_ids"])
+    print(f"\nSeeded {args.rows} transportations and movements into {args.lots} lots "
+          f"in {time.perf_counter() - start:.1f}s\n")
+    with engine.begin() as conn:
+        # The bench seed writes its own lots and transportations directly; start from them reconciled
+        repair_lots(conn, user_id)
+
+    clean = timed("check", lambda: check(user_id))
+    with engine.begin() as conn:
+        for statement in DRIFT:
+            conn.execute(text(statement))
+    found = timed("check after drifting lots and contributions", lambda: check(user_id))
+    timed("repair", lambda: repair(user_id))
+    remaining = timed("check", lambda: check(user_id))
+    return 0 if clean == 0 and found and remaining == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,190 @@
+"""Concurrent read/write benchmark for the SQLite connection profile.
+
+Runs the same mixed workload against a fresh SQLite file once per
+``SQLITE_PROFILE`` ("default": rollback journal and SQLite's stock pragmas;
+"production": WAL, synchronous=NORMAL, larger cache, mmap, busy_timeout,
+in-memory temp store). Reader tasks hammer ``GET /transportations/`` and
+``GET /labour/attendance/history`` while writer tasks post transportations and
+whole-crew ``POST /labour/attendance/bulk`` updates - the harvest-day pattern
+of a few people entering data while everyone else refreshes their screens.
+
+Every reader and writer is a separate process with its own event loop and
+connection pool, the way uvicorn workers share one database file, so the
+numbers reflect lock contention rather than one event loop's CPU.
+
+Usage (from backend/):
+    python -m benchmarks.bench_sqlite_profile --readers 4 --writers 2 --duration 15
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _BACKEND_DIR)
+
+READ_PATHS = ["/transportations/", "/labour/attendance/history"]
+WRITE_PATHS = ["POST /transportations/", "POST /labour/attendance/bulk"]
+
+
+def pct(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))] * 1000 if samples else 0.0
+
+
+def seed(engine, transports=300, labourers=30, days=90):
+    from sqlalchemy import insert, select
+    from app.models import User, Field, LotNumber, Transportation, LabourGroup, Labourer, LabourAttendance
+
+    today = date.today()
+    with engine.begin() as conn:
+        user_id = conn.execute(insert(User).values(username="bench_farmer", password="x").returning(User.id)).scalar()
+        conn.execute(insert(Field), [{"field_name": f"Field {i}", "area": 2.5, "year": 2025, "user_id": user_id} for i in range(10)])
+        field_ids = conn.execute(select(Field.id)).scalars().all()
+        conn.execute(insert(LotNumber), [
+            {"lot_number": f"LOT-{i}", "field_name": "Field 0", "small_packets": 0, "medium_packets": 0,
+             "large_packets": 0, "xlarge_packets": 0, "storage_date": today, "user_id": user_id}
+            for i in range(40)
+        ])
+        conn.execute(insert(Transportation), [
+            {"field_id": field_ids[i % len(field_ids)], "lot_number": f"LOT-{i % 40}", "transport_date": today - timedelta(days=i % days),
+             "small_packets": 3, "medium_packets": 5, "large_packets": 2, "overlarge_packets": 1}
+            for i in range(transports)
+        ])
+        group_id = conn.execute(insert(LabourGroup).values(group_name="Crew", user_id=user_id).returning(LabourGroup.id)).scalar()
+        conn.execute(insert(Labourer), [
+            {"name": f"W{i}", "village": "V", "daily_wage": 400, "group_id": group_id, "user_id": user_id} for i in range(labourers)
+        ])
+        labourer_ids = conn.execute(select(Labourer.id)).scalars().all()
+        conn.execute(insert(LabourAttendance), [
+            {"labourer_id": w, "attendance_date": today - timedelta(days=d), "status": "full", "user_id": user_id}
+            for d in range(days) for w in labourer_ids
+        ])
+    return user_id, field_ids, labourer_ids
+
+
+def prepare():
+    """Migrate and seed the database; runs under the profile so WAL is set on the file."""
+    from alembic import command
+    from alembic.config import Config
+    from app.db import engine
+
+    config = Config(os.path.join(_BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(_BACKEND_DIR, "migrations"))
+    command.upgrade(config, "head")
+    user_id, field_ids, labourer_ids = seed(engine)
+    with engine.connect() as conn:
+        journal_mode = conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+    return {"user_id": user_id, "field_ids": field_ids, "labourer_ids": labourer_ids, "journal_mode": journal_mode}
+
+
+async def run_client(role, n, duration, ids):
+    """One reader or writer: its own process, event loop and connection pool, like a uvicorn worker."""
+    import httpx
+    from fastapi import FastAPI
+
+    from app.db import async_engine
+    from app.routes import transportation, labour
+    from app.utils.security import create_access_token
+
+    app = FastAPI()
+    app.include_router(transportation.router, prefix="/transportations")
+    app.include_router(labour.router, prefix="/labour")
+
+    paths = READ_PATHS if role == "reader" else WRITE_PATHS
+    latencies = {path: [] for path in paths}
+    errors = {path: 0 for path in paths}
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(ids['user_id'])})}"}
+    field_ids, labourer_ids = ids["field_ids"], ids["labourer_ids"]
+    since = (date.today() - timedelta(days=7)).isoformat()
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", headers=headers, timeout=120) as client:
+        async def timed(name, send):
+            start = time.perf_counter()
+            try:
+                response = await send()
+                response.raise_for_status()
+            except Exception:
+                # "database is locked" surfaces as a 500 from the route
+                errors[name] += 1
+                return
+            latencies[name].append(time.perf_counter() - start)
+
+        deadline = time.perf_counter() + duration
+        i = n
+        while time.perf_counter() < deadline:
+            name = paths[i % len(paths)]
+            if name == "/labour/attendance/history":
+                await timed(name, lambda: client.get(name, params={"start_date": since}))
+            elif name == "/transportations/":
+                await timed(name, lambda: client.get(name))
+            elif name == "POST /transportations/":
+                body = {"field_id": field_ids[i % len(field_ids)], "lot_number": f"LOT-{i % 40}",
+                        "small_packets": 1, "medium_packets": 2, "large_packets": 1, "overlarge_packets": 0}
+                await timed(name, lambda: client.post("/transportations/", json=body))
+            else:
+                body = {"attendance_date": (date.today() - timedelta(days=i % 120)).isoformat(),
+                        "records": [{"labourer_id": w, "status": "half" if (w + i) % 2 else "full"} for w in labourer_ids]}
+                await timed(name, lambda: client.post("/labour/attendance/bulk", json=body))
+            i += 1
+    await async_engine.dispose()
+    return {"latencies": latencies, "errors": errors}
+
+
+def run_profile(profile, readers, writers, duration):
+    tmpdir = tempfile.mkdtemp(prefix="kisansetu-bench-")
+    env = dict(os.environ, SQLITE_PROFILE=profile, DATABASE_URL=f"sqlite:///{tmpdir}/bench.db")
+    command = [sys.executable, "-m", "benchmarks.bench_sqlite_profile"]
+
+    def last_json(stdout):
+        return json.loads(stdout.strip().splitlines()[-1])
+
+    ids = last_json(subprocess.run(command + ["--role", "prepare"], cwd=_BACKEND_DIR, env=env,
+                                   capture_output=True, text=True, check=True).stdout)
+    ids_arg = json.dumps(ids)
+    clients = [
+        subprocess.Popen(command + ["--role", role, "--index", str(n), "--duration", str(duration), "--ids", ids_arg],
+                         cwd=_BACKEND_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        for role, count in (("reader", readers), ("writer", writers)) for n in range(count)
+    ]
+    latencies, errors = {}, {}
+    for proc in clients:
+        stdout, _ = proc.communicate()
+        result = last_json(stdout)
+        for path, samples in result["latencies"].items():
+            latencies.setdefault(path, []).extend(samples)
+            errors[path] = errors.get(path, 0) + result["errors"][path]
+
+    print(f"\n== {profile} (journal_mode={ids['journal_mode']}): {readers} reader and {writers} writer processes, {duration:.0f}s")
+    print(f"{'endpoint':32} {'req/s':>8} {'errors':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    for path in READ_PATHS + WRITE_PATHS:
+        samples = latencies.get(path, [])
+        print(f"{path:32} {len(samples) / duration:8.1f} {errors.get(path, 0):7d} {pct(samples, 0.50):8.1f} {pct(samples, 0.99):8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=4, help="reader processes")
+    parser.add_argument("--writers", type=int, default=2, help="writer processes")
+    parser.add_argument("--duration", type=float, default=15, help="seconds of load per profile")
+    parser.add_argument("--role", help=argparse.SUPPRESS)
+    parser.add_argument("--index", type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument("--ids", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.role == "prepare":
+        print(json.dumps(prepare()))
+    elif args.role:
+        print(json.dumps(asyncio.run(run_client(args.role, args.index, args.duration, json.loads(args.ids)))))
+    else:
+        for profile in ("default", "production"):
+            run_profile(profile, args.readers, args.writers, args.duration)
+
+
+if __name__ == "__main__":
+    main()
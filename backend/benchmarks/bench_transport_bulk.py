@@ -0,0 +1,107 @@
+"""Manifest ingest: POST /transportations/ row by row vs POST /transportations/bulk.
+
+A harvest day's truck manifest is a few hundred transportations into a
+handful of lots. Posted one at a time each row costs its own transaction (the
+ownership check, the insert, the lot, field and journal updates, the rollups
+and a commit); /transportations/bulk checks ownership once, sums each lot's
+packets in memory, upserts each lot once and inserts the rows and their
+movements with one executemany each, all in one commit.
+
+Each mode ingests ``--rows`` rows spread over ``--lots`` lots (one manifest of
+``--batch`` rows per bulk request) into its own lots, then the lots are checked
+against their transportations, movements and field contributions
+(``bench_lot_concurrency.CHECKS``), and the dashboard rollups and field stats
+against the base tables. Runs against DATABASE_URL, migrated and seeded first.
+
+Usage (from backend/):
+    DATABASE_URL=sqlite:////tmp/bench.db python -m benchmarks.bench_transport_bulk --rows 5000 --batch 500
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks.bench_lot_concurrency import CHECKS, check
+from benchmarks.bench_sqlite_profile import prepare
+
+
+def manifest(rng, field_ids, prefix, lots, rows):
+    return [{
+        "field_id": rng.choice(field_ids), "lot_number": f"{prefix}-{rng.randrange(lots)}",
+        "small_packets": rng.randint(0, 20), "medium_packets": rng.randint(1, 20),
+        "large_packets": rng.randint(0, 20), "overlarge_packets": rng.randint(0, 5),
+    } for _ in range(rows)]
+
+
+async def ingest(rows, batch, lots, ids):
+    import httpx
+    from fastapi import FastAPI
+
+    from app.db import async_engine
+    from app.routes import transportation
+    from app.utils.security import create_access_token
+
+    app = FastAPI()
+    app.include_router(transportation.router, prefix="/transportations")
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(ids['user_id'])})}"}
+    rng = random.Random(7)
+    timings = {}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                 headers=headers, timeout=300) as client:
+        single = manifest(rng, ids["field_ids"], "SINGLE", lots, rows)
+        start = time.perf_counter()
+        for row in single:
+            (await client.post("/transportations/", json=row)).raise_for_status()
+        timings["row by row"] = time.perf_counter() - start
+
+        bulk = manifest(rng, ids["field_ids"], "BULK", lots, rows)
+        start = time.perf_counter()
+        for offset in range(0, rows, batch):
+            response = await client.post("/transportations/bulk", json={"transportations": bulk[offset:offset + batch]})
+            response.raise_for_status()
+            assert response.json()["failed"] == 0, response.json()
+        timings[f"bulk of {batch}"] = time.perf_counter() - start
+
+    await async_engine.dispose()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000, help="transportations per mode")
+    parser.add_argument("--batch", type=int, default=500, help="rows per bulk request")
+    parser.add_argument("--lots", type=int, default=5, help="lots the rows go into")
+    args = parser.parse_args()
+
+    from app.db import engine
+    from app.utils.rollups import check_rollups, rebuild_rollups
+    from app.utils.field_stats import check_field_stats, rebuild_field_stats
+
+    ids = prepare()
+    with engine.begin() as conn:
+        # The seed inserts its rows directly; start from rollups that match them
+        rebuild_rollups(conn, ids["user_id"])
+        rebuild_field_stats(conn, ids["user_id"])
+    timings = asyncio.run(ingest(args.rows, args.batch, args.lots, ids))
+
+    print(f"\n== {args.rows} transportations into {args.lots} lots")
+    print(f"{'mode':16} {'seconds':>8} {'rows/s':>9}")
+    for mode, seconds in timings.items():
+        print(f"{mode:16} {seconds:8.2f} {args.rows / seconds:9.0f}")
+
+    drift = 0
+    for prefix in ("SINGLE", "BULK"):
+        results = check(f"{prefix}-%")
+        print(f"\n{prefix}: {results['hot lots']} lots holding {results['packets in hot lots']} packets")
+        for name in CHECKS:
+            drift += results[name]
+            print(f"{name:40} {results[name]:5d} {'OK' if not results[name] else 'DRIFT'}")
+    with engine.connect() as conn:
+        stale = len(check_rollups(conn, ids["user_id"])) + len(check_field_stats(conn, ids["user_id"]))
+    print(f"{'rollups and field stats':40} {stale:5d} {'OK' if not stale else 'DRIFT'}")
+    return 1 if drift or stale else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
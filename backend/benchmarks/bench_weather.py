@@ -0,0 +1,237 @@
+"""Weather proxy against a local stand-in for OpenWeatherMap.
+
+Starts a stub upstream that answers after ``--upstream-ms`` and counts its
+calls. It then fires bursts of ``--requests`` concurrent /weather/forecast
+requests at points scattered across ``--cells`` grid cells, as fields in a
+few districts would be:
+
+* ``uncached``: the cache is off, so every request goes upstream;
+* ``cold``: the cache is empty, so it should make one upstream call per cell,
+  with concurrent requests sharing it;
+* ``warm``: every request should be answered from memory;
+* ``stale``: past the TTL, requests should still be answered at once, with
+  one background refresh per cell.
+
+It ends by comparing the size of a full and a ``compact=true`` forecast.
+Latency percentiles and upstream call counts are printed for each phase. Any
+phase that made the wrong number of upstream calls is reported as a failure.
+
+Usage (from backend/):
+    python -m benchmarks.bench_weather --requests 500 --cells 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import struct
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _BACKEND_DIR)
+
+from benchmarks.bench_sqlite_profile import pct
+
+CONDITIONS = ["Clear", "Clouds", "Rain", "Clouds", "Clear"]
+
+
+def forecast_payload(lat: float, lon: float) -> dict:
+    """A 5-day/3-hour forecast shaped like OpenWeatherMap's (40 entries)."""
+    start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    rng = random.Random(f"{lat},{lon}")
+    entries = []
+    for i in range(40):
+        at = start + timedelta(hours=3 * i)
+        temp = 24 + 8 * rng.random()
+        condition = rng.choice(CONDITIONS)
+        entries.append({
+            "dt": int(at.timestamp()),
+            "main": {"temp": round(temp, 2), "feels_like": round(temp + 1, 2), "temp_min": round(temp - 1, 2),
+                     "temp_max": round(temp + 1, 2), "pressure": 1008, "sea_level": 1008, "grnd_level": 990,
+                     "humidity": rng.randint(40, 90), "temp_kf": 0},
+            "weather": [{"id": 800, "main": condition, "description": condition.lower(), "icon": "01d"}],
+            "clouds": {"all": rng.randint(0, 100)},
+            "wind": {"speed": round(5 * rng.random(), 2), "deg": rng.randint(0, 359), "gust": round(8 * rng.random(), 2)},
+            "visibility": 10000,
+            "pop": round(rng.random(), 2),
+            "sys": {"pod": "d" if 6 <= at.hour < 18 else "n"},
+            "dt_txt": at.strftime("%Y-%m-%d %H:%M:%S"),
+        })
+    return {"cod": "200", "message": 0, "cnt": len(entries), "list": entries,
+            "city": {"id": 1, "name": "Stub", "coord": {"lat": lat, "lon": lon}, "country": "IN",
+                     "timezone": 19800, "sunrise": 0, "sunset": 0}}
+
+
+def geocode_payload(place: str) -> list:
+    """A made-up but stable position in India for any place name; nothing for names containing "nowhere"."""
+    if "nowhere" in place.lower():
+        return []
+    rng = random.Random(place.lower())
+    return [{"name": place.split(",")[0].strip(), "lat": round(rng.uniform(10, 30), 4),
+             "lon": round(rng.uniform(72, 88), 4), "country": "IN"}]
+
+
+class StubUpstream:
+    """Answers the OpenWeatherMap paths the proxy uses, after a fixed delay.
+
+    Set ``fault`` to misbehave: "error" answers 500, "slow" answers after
+    ``slow_delay`` seconds, "reset" drops the connection without a response.
+    """
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.fault = None
+        self.slow_delay = 5.0
+        self.calls = Counter()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                lat, lon = float(query.get("lat", 0)), float(query.get("lon", 0))
+                stub.calls[url.path] += 1
+                if stub.fault == "error":
+                    self.send_error(500)
+                    return
+                if stub.fault == "reset":
+                    self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+                    self.close_connection = True
+                    return
+                time.sleep(stub.slow_delay if stub.fault == "slow" else stub.delay)
+                if url.path == "/data/2.5/forecast":
+                    payload = forecast_payload(lat, lon)
+                elif url.path == "/data/2.5/weather":
+                    payload = {"coord": {"lat": lat, "lon": lon}, "main": {"temp": 28.0}, "weather": [{"main": "Clear"}]}
+                elif url.path == "/geo/1.0/reverse":
+                    payload = [{"name": "Stub", "lat": lat, "lon": lon, "country": "IN"}]
+                elif url.path == "/geo/1.0/direct":
+                    payload = geocode_payload(query.get("q", ""))
+                else:
+                    self.send_error(404)
+                    return
+                body = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        # The proxy dropping idle keep-alive connections isn't worth a traceback
+        self.server.handle_error = lambda request, client_address: None
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+
+    def take_calls(self) -> int:
+        total = sum(self.calls.values())
+        self.calls.clear()
+        return total
+
+
+async def burst(client, points):
+    async def one(lat, lon):
+        started = time.perf_counter()
+        response = await client.get("/weather/forecast", params={"lat": lat, "lon": lon})
+        response.raise_for_status()
+        return time.perf_counter() - started
+
+    return await asyncio.gather(*(one(lat, lon) for lat, lon in points))
+
+
+async def run(args, stub):
+    import httpx
+    from fastapi import FastAPI
+
+    from app.config import settings
+    from app.routes import weather
+    from app.utils.security import create_access_token
+    from app.utils.weather_cache import weather_cache
+
+    app = FastAPI()
+    app.include_router(weather.router, prefix="/weather")
+    weather_cache.ttls["forecast"] = args.ttl
+    grid = weather_cache.grid
+    rng = random.Random(7)
+    centres = [(round(20 + i * 0.5, 6), round(78 + i * 0.5, 6)) for i in range(args.cells)]
+    # Well inside each centre's cell, so every point in a cell snaps to it
+    points = [(lat + rng.uniform(-0.4, 0.4) * grid, lon + rng.uniform(-0.4, 0.4) * grid)
+              for lat, lon in (centres[i % len(centres)] for i in range(args.requests))]
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': '1'})}"}
+    results = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                 headers=headers, timeout=60) as client:
+        async def phase(name, expected_calls, settle=0.0):
+            latencies = await burst(client, points)
+            await asyncio.sleep(settle)
+            calls = stub.take_calls()
+            results.append((name, pct(latencies, 0.50), pct(latencies, 0.99), calls, expected_calls))
+
+        settings.WEATHER_CACHE_ENABLED = False
+        await phase("uncached", args.requests)
+        settings.WEATHER_CACHE_ENABLED = True
+        await phase("cold", args.cells)
+        await phase("warm", 0)
+        await asyncio.sleep(args.ttl + 0.1)
+        # Give the background refreshes time to land before counting them
+        await phase("stale", args.cells, settle=args.upstream_ms / 1000 * 3 + 0.2)
+        await phase("refreshed", 0)
+
+        lat, lon = centres[0]
+        full = await client.get("/weather/forecast", params={"lat": lat, "lon": lon})
+        compact = await client.get("/weather/forecast", params={"lat": lat, "lon": lon, "compact": "true"})
+        stub.take_calls()
+
+    print(f"{'phase':<10} {'p50 ms':>8} {'p99 ms':>8} {'upstream':>9} {'expected':>9}")
+    failed = 0
+    for name, p50, p99, calls, expected in results:
+        ok = calls == expected
+        failed += not ok
+        print(f"{name:<10} {p50:8.1f} {p99:8.1f} {calls:9d} {expected:9d}{'' if ok else '  <-- FAILED'}")
+    print(f"\nforecast body: {len(full.content)} bytes full, {len(compact.content)} bytes with compact=true "
+          f"({len(compact.json()['days'])} days)")
+    print(f"{'OK' if not failed else 'FAILED'}: {args.requests} requests per phase over {args.cells} cells")
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500, help="concurrent requests per phase")
+    parser.add_argument("--cells", type=int, default=5, help="distinct grid cells the requests fall in")
+    parser.add_argument("--upstream-ms", type=float, default=150, help="stub upstream response time")
+    parser.add_argument("--ttl", type=float, default=10.0, help="forecast TTL for the run, seconds")
+    args = parser.parse_args()
+
+    stub = StubUpstream(args.upstream_ms / 1000)
+    stub.start()
+    os.environ.setdefault("WEATHER_API_KEY", "bench")
+    os.environ["OPENWEATHER_BASE_URL"] = stub.url
+    # The uncached phase queues on the connection pool; let it wait rather than fail
+    os.environ.setdefault("UPSTREAM_POOL_TIMEOUT", "60")
+    try:
+        return asyncio.run(run(args, stub))
+    finally:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""Weather proxy failure modes against the fault-injecting stub upstream.
+
+Uses the stub from bench_weather with a short forecast TTL and no stale
+window, so every phase's requests miss the cache and try upstream. Each phase
+sends a burst of ``--requests`` concurrent /weather/forecast calls spread over
+``--cells`` grid cells. Between phases the stub's fault is switched:
+
+    healthy -> error (500s) -> still open -> slow -> reset -> recovered -> closed
+
+What must hold:
+
+* every request answers within the deadline (plus a small margin);
+* while upstream is failing or slow, every cell fetched before is served its
+  last good forecast, flagged stale, never a 503;
+* a cell that was never fetched gets a quick 503 while the breaker is open;
+* the breaker opens on the failures, refuses calls while open, probes in
+  half-open, and closes again once the upstream has recovered.
+
+Usage (from backend/):
+    python -m benchmarks.bench_weather_faults --requests 200 --cells 8
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import Counter
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _BACKEND_DIR)
+
+from benchmarks.bench_sqlite_profile import pct
+from benchmarks.bench_weather import StubUpstream
+
+DEADLINE = 1.0
+OPEN_SECONDS = 2.0
+TTL = 0.3
+MARGIN = 0.3
+
+
+async def run(args, stub):
+    import httpx
+    from fastapi import FastAPI
+
+    from app.routes import weather
+    from app.utils.security import create_access_token
+    from app.utils.weather_cache import weather_cache
+
+    app = FastAPI()
+    app.include_router(weather.router, prefix="/weather")
+    weather_cache.ttls["forecast"] = TTL
+    weather_cache.max_stale = 0
+    breaker = weather.upstream_breaker
+    points = [(20 + (i % args.cells) * 0.5, 78 + (i % args.cells) * 0.5) for i in range(args.requests)]
+
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': '1'})}"}
+    rows, failures = [], []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                 headers=headers, timeout=60) as client:
+        async def one(lat, lon):
+            started = time.perf_counter()
+            response = await client.get("/weather/forecast", params={"lat": lat, "lon": lon})
+            elapsed = time.perf_counter() - started
+            if response.status_code == 200:
+                kind = "stale" if response.headers.get("X-Weather-Stale") else "fresh"
+            else:
+                kind = str(response.status_code)
+            return elapsed, kind
+
+        async def phase(name, fault, expect, expect_state, wait=TTL + 0.05, targets=points):
+            stub.fault = fault
+            await asyncio.sleep(wait)
+            results = await asyncio.gather(*(one(lat, lon) for lat, lon in targets))
+            latencies = [elapsed for elapsed, _ in results]
+            kinds = Counter(kind for _, kind in results)
+            rows.append((name, fault or "-", pct(latencies, 0.50), pct(latencies, 0.99), kinds, stub.take_calls(), breaker.state))
+            if max(latencies) > DEADLINE + MARGIN:
+                failures.append(f"{name}: slowest request took {max(latencies):.2f}s")
+            if set(kinds) != set(expect):
+                failures.append(f"{name}: expected only {expect}, got {dict(kinds)}")
+            if breaker.state != expect_state:
+                failures.append(f"{name}: breaker {breaker.state}, expected {expect_state}")
+
+        await phase("healthy", None, {"fresh"}, "closed")
+        await phase("error", "error", {"stale"}, "open")
+        await phase("open", "error", {"stale"}, "open")
+        await phase("cold cell", "error", {"503"}, "open", targets=[(-10.0, 30.0)] * 10)
+        # After each open period the half-open probes meet the next fault. While the slow
+        # probes are out, everything else is refused until they report back.
+        await phase("slow", "slow", {"stale"}, "half_open", wait=OPEN_SECONDS + 0.1)
+        await asyncio.sleep(stub.slow_delay)
+        if breaker.state != "open":
+            failures.append(f"slow: breaker {breaker.state} after the slow probes finished, expected open")
+        await phase("reset", "reset", {"stale"}, "open", wait=OPEN_SECONDS + 0.1)
+        # Probes succeed; cells that weren't probed still get their last good forecast
+        await phase("recovered", None, {"fresh", "stale"}, "closed", wait=OPEN_SECONDS + 0.1)
+        await phase("closed", None, {"fresh"}, "closed")
+
+    print(f"{'phase':<10} {'fault':<6} {'p50 ms':>8} {'p99 ms':>8} {'upstream':>9} {'breaker':>10}  responses")
+    for name, fault, p50, p99, kinds, calls, state in rows:
+        print(f"{name:<10} {fault:<6} {p50:8.1f} {p99:8.1f} {calls:9d} {state:>10}  {dict(kinds)}")
+    print()
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    if not failures:
+        print(f"OK: every request answered within {DEADLINE:g}s; warm cells were never refused")
+    return 1 if failures else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="concurrent requests per phase")
+    parser.add_argument("--cells", type=int, default=8, help="distinct grid cells the requests fall in")
+    args = parser.parse_args()
+
+    stub = StubUpstream(0.02)
+    stub.slow_delay = DEADLINE * 3
+    stub.start()
+    os.environ.update(
+        WEATHER_API_KEY=os.environ.get("WEATHER_API_KEY", "bench"),
+        OPENWEATHER_BASE_URL=stub.url,
+        WEATHER_DEADLINE_SECONDS=str(DEADLINE),
+        WEATHER_BREAKER_SLOW_SECONDS=str(DEADLINE),
+        WEATHER_BREAKER_OPEN_SECONDS=str(OPEN_SECONDS),
+        WEATHER_BREAKER_MIN_CALLS="5",
+        WEATHER_BREAKER_HALF_OPEN_CALLS="2",
+    )
+    try:
+        return asyncio.run(run(args, stub))
+    finally:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""Write throughput with and without the SQLite writer queue.
+
+Concurrent clients post transportations, whole-crew attendance updates and
+lot packet additions - the three endpoints routed through ``run_write`` -
+for a fixed time, once with ``SQLITE_WRITE_QUEUE=false`` (every request
+commits on its own pooled connection and competes for the database lock) and
+once with it on (one writer thread, SAVEPOINT per request, one commit per
+batch). Both runs use the production SQLite profile.
+
+Usage (from backend/):
+    python -m benchmarks.bench_write_queue --clients 16 --duration 15
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _BACKEND_DIR)
+
+from benchmarks.bench_sqlite_profile import pct, prepare
+
+WRITE_PATHS = ["POST /transportations/", "POST /labour/attendance/bulk", "POST /lot-numbers/{id}/add-packets"]
+
+
+async def run_writers(clients, duration):
+    import httpx
+    from fastapi import FastAPI
+    from sqlalchemy import select
+
+    from app.db import async_engine, engine, write_queue
+    from app.models import LotNumber
+    from app.routes import transportation, labour, lot_numbers
+    from app.utils.metrics import WRITE_QUEUE_BATCH_SIZE
+    from app.utils.security import create_access_token
+
+    ids = prepare()
+    with engine.connect() as conn:
+        lot_ids = conn.execute(select(LotNumber.id)).scalars().all()
+
+    app = FastAPI()
+    app.include_router(transportation.router, prefix="/transportations")
+    app.include_router(labour.router, prefix="/labour")
+    app.include_router(lot_numbers.router, prefix="/lot-numbers")
+
+    latencies = {path: [] for path in WRITE_PATHS}
+    errors = {path: 0 for path in WRITE_PATHS}
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(ids['user_id'])})}"}
+    field_ids, labourer_ids = ids["field_ids"], ids["labourer_ids"]
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", headers=headers, timeout=120) as client:
+        async def client_loop(n):
+            i = n
+            while time.perf_counter() < deadline:
+                name = WRITE_PATHS[i % len(WRITE_PATHS)]
+                if name == "POST /transportations/":
+                    request = client.post("/transportations/", json={
+                        "field_id": field_ids[i % len(field_ids)], "lot_number": f"LOT-{i % 40}",
+                        "small_packets": 1, "medium_packets": 2, "large_packets": 1, "overlarge_packets": 0})
+                elif name == "POST /labour/attendance/bulk":
+                    request = client.post("/labour/attendance/bulk", json={
+                        "attendance_date": (date.today() - timedelta(days=i % 120)).isoformat(),
+                        "records": [{"labourer_id": w, "status": "half" if (w + i) % 2 else "full"} for w in labourer_ids]})
+                else:
+                    request = client.post(f"/lot-numbers/{lot_ids[i % len(lot_ids)]}/add-packets", json={
+                        "small_packets": 1, "medium_packets": 0, "large_packets": 0, "xlarge_packets": 0})
+                start = time.perf_counter()
+                try:
+                    response = await request
+                    response.raise_for_status()
+                    latencies[name].append(time.perf_counter() - start)
+                except Exception:
+                    errors[name] += 1
+                i += 1
+
+        deadline = time.perf_counter() + duration
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(n) for n in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    if write_queue is not None:
+        write_queue.stop()
+    await async_engine.dispose()
+    batches = WRITE_QUEUE_BATCH_SIZE.dump().get("", [0, 0])
+    return {
+        "elapsed": elapsed,
+        "mean_batch": batches[-1] / max(sum(batches[:-1]), 1),
+        "endpoints": {
+            path: {"count": len(samples), "errors": errors[path], "p50": pct(samples, 0.50), "p99": pct(samples, 0.99)}
+            for path, samples in latencies.items()
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=16, help="concurrent writing clients")
+    parser.add_argument("--duration", type=float, default=15, help="seconds of load per run")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(run_writers(args.clients, args.duration))))
+        return
+
+    for queued in ("false", "true"):
+        tmpdir = tempfile.mkdtemp(prefix="kisansetu-bench-")
+        env = dict(os.environ, SQLITE_PROFILE="production", SQLITE_WRITE_QUEUE=queued,
+                   DATABASE_URL=f"sqlite:///{tmpdir}/bench.db")
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_write_queue", "--child",
+             "--clients", str(args.clients), "--duration", str(args.duration)],
+            cwd=_BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        total = sum(stats["count"] for stats in result["endpoints"].values())
+
+        label = "writer queue" if queued == "true" else "pooled connections"
+        extra = f", mean batch {result['mean_batch']:.1f}" if queued == "true" else ""
+        print(f"\n== {label}: {args.clients} clients, {total / result['elapsed']:.1f} writes/s{extra}")
+        print(f"{'endpoint':36} {'req/s':>8} {'errors':>7} {'p50 ms':>8} {'p99 ms':>8}")
+        for path, stats in result["endpoints"].items():
+            print(f"{path:36} {stats['count'] / result['elapsed']:8.1f} {stats['errors']:7d} {stats['p50']:8.1f} {stats['p99']:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
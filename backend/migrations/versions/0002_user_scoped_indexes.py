@@ -0,0 +1,66 @@
+"""user scoped indexes
+
+Every list/aggregate endpoint filters by the owner (``user_id``, or
+``field_id`` after the ownership check on ``fields``) and most then range over
+or sort by a date, so the composite indexes lead with the owner column and end
+with the date. ``python -m benchmarks.bench_indexes`` shows the plans.
+
+``if_not_exists`` because databases built by create_all() from the updated
+models already have them.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 06:33:10.380177
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (index name, table, columns) - query shapes from app/routes/*.py
+INDEXES = [
+    # GET /money-records/, dashboard expense totals
+    ("ix_money_records_user_id", "money_records", ["user_id"]),
+    # GET /borrowings/
+    ("ix_borrowings_user_id", "borrowings", ["user_id"]),
+    # GET /fields/, every "JOIN fields ... WHERE fields.user_id = ?" on the dashboard
+    ("ix_fields_user_id", "fields", ["user_id"]),
+    # GET /fields/{id}/yields, dashboard yield totals per field
+    ("ix_yields_field_id_date", "yields", ["field_id", "date"]),
+    # GET /transportations/ (ORDER BY transport_date DESC), /transportations/field/{id}
+    ("ix_transportations_field_id_transport_date", "transportations", ["field_id", "transport_date"]),
+    # "does this user already have lot X" on every lot and transportation write
+    ("ix_lot_numbers_user_id_lot_number", "lot_numbers", ["user_id", "lot_number"]),
+    # GET /labour/attendance?attendance_date=, /labour/attendance/history date ranges, dashboard earnings
+    ("ix_labour_attendance_user_id_attendance_date", "labour_attendance", ["user_id", "attendance_date"]),
+    # Deleting a labourer / group removes their attendance and payments
+    ("ix_labour_attendance_labourer_id", "labour_attendance", ["labourer_id"]),
+    ("ix_labour_payments_labourer_id", "labour_payments", ["labourer_id"]),
+    # GET /labour/payments (ORDER BY payment_date DESC), dashboard labour cost
+    ("ix_labour_payments_user_id_payment_date", "labour_payments", ["user_id", "payment_date"]),
+    # GET /labour/groups, /labour/labourers (JOIN labour_groups ... WHERE user_id = ?)
+    ("ix_labour_groups_user_id", "labour_groups", ["user_id"]),
+    ("ix_labourers_group_id", "labourers", ["group_id"]),
+    ("ix_tasks_group_id", "tasks", ["group_id"]),
+    # GET /labour/group-work?group_id=&start_date=&end_date=
+    ("ix_group_work_group_id_work_date", "group_work", ["group_id", "work_date"]),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,131 @@
+"""string dates to date
+
+money_records.payment_date, borrowings.borrow_date / expected_return_date /
+actual_return_date, yields.date and tasks.start_date / end_date were VARCHAR,
+so date filters compared strings and couldn't use a range scan reliably.
+Existing values are normalised to ISO dates first (the frontend has always
+sent YYYY-MM-DD, but older rows may carry a time part or DD/MM/YYYY), then
+the columns become DATE. Unparseable optional dates become NULL; an
+unparseable required date stops the migration and lists the rows to fix.
+
+The per-user indexes on money_records and borrowings gain the date column so
+the new start_date/end_date filters are index range scans.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 09:10:00.000000
+
+"""
+from datetime import date, datetime
+from typing import Optional, Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# table -> [(column, nullable)]
+DATE_COLUMNS = {
+    "money_records": [("payment_date", False)],
+    "borrowings": [("borrow_date", False), ("expected_return_date", True), ("actual_return_date", True)],
+    "yields": [("date", False)],
+    "tasks": [("start_date", False), ("end_date", False)],
+}
+
+_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%Y/%m/%d")
+
+
+def parse_date(value) -> Optional[date]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value).strip()
+    if not text:
+        return None
+    try:
+        # "2025-03-01T00:00:00", "2025-03-01 10:30:00+05:30"
+        return datetime.fromisoformat(text.replace("Z", "+00:00")).date()
+    except ValueError:
+        pass
+    for fmt in _FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def normalise(conn, table, column, nullable):
+    rows = conn.execute(sa.text(f"SELECT id, {column} FROM {table} WHERE {column} IS NOT NULL")).all()
+    updates, bad = [], []
+    for row_id, value in rows:
+        parsed = parse_date(value)
+        if parsed is None:
+            if nullable:
+                updates.append({"id": row_id, "value": None})
+            else:
+                bad.append((row_id, value))
+        elif value != parsed.isoformat():
+            updates.append({"id": row_id, "value": parsed.isoformat()})
+    if bad:
+        sample = ", ".join(f"id={row_id} {value!r}" for row_id, value in bad[:10])
+        raise RuntimeError(f"{table}.{column} has {len(bad)} values that are not dates ({sample}); fix them and rerun")
+    if updates:
+        conn.execute(sa.text(f"UPDATE {table} SET {column} = :value WHERE id = :id"), updates)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not context.is_offline_mode():
+        conn = op.get_bind()
+        for table, columns in DATE_COLUMNS.items():
+            for column, nullable in columns:
+                normalise(conn, table, column, nullable)
+
+    for table, columns in DATE_COLUMNS.items():
+        # SQLite rebuilds the table; reflecting the columns as Date already
+        # copies the (now ISO) text across as-is instead of CAST(... AS DATE),
+        # which SQLite would turn into the number 2025.
+        reflect_args = [sa.Column(column, sa.Date(), nullable=nullable) for column, nullable in columns]
+        with op.batch_alter_table(table, reflect_args=reflect_args) as batch_op:
+            for column, nullable in columns:
+                batch_op.alter_column(
+                    column,
+                    existing_type=sa.String(),
+                    type_=sa.Date(),
+                    existing_nullable=nullable,
+                    postgresql_using=f"{column}::date",
+                )
+
+    op.drop_index("ix_money_records_user_id", table_name="money_records")
+    op.create_index("ix_money_records_user_id_payment_date", "money_records", ["user_id", "payment_date"], unique=False)
+    op.drop_index("ix_borrowings_user_id", table_name="borrowings")
+    op.create_index("ix_borrowings_user_id_borrow_date", "borrowings", ["user_id", "borrow_date"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_borrowings_user_id_borrow_date", table_name="borrowings")
+    op.create_index("ix_borrowings_user_id", "borrowings", ["user_id"], unique=False)
+    op.drop_index("ix_money_records_user_id_payment_date", table_name="money_records")
+    op.create_index("ix_money_records_user_id", "money_records", ["user_id"], unique=False)
+
+    for table, columns in DATE_COLUMNS.items():
+        reflect_args = [sa.Column(column, sa.String(), nullable=nullable) for column, nullable in columns]
+        with op.batch_alter_table(table, reflect_args=reflect_args) as batch_op:
+            for column, nullable in columns:
+                batch_op.alter_column(
+                    column,
+                    existing_type=sa.Date(),
+                    type_=sa.String(),
+                    existing_nullable=nullable,
+                    postgresql_using=f"{column}::text",
+                )
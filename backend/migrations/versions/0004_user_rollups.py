@@ -0,0 +1,75 @@
+"""user rollups
+
+Per-user dashboard totals, kept current by the write routes (see
+app/utils/rollups.py). The backfill here is the same aggregation as
+``rollups.base_totals()``, written out in SQL so this revision doesn't change
+when the models do; ``python -m app.utils.rollups check`` verifies it.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 10:02:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL = """
+INSERT INTO user_rollups (user_id, field_count, yield_large, yield_medium, yield_small, yield_overlarge,
+                          expenses, labour_payments, attendance_earnings, transported_packets)
+SELECT u.id,
+       COALESCE(f.field_count, 0),
+       COALESCE(y.large, 0), COALESCE(y.medium, 0), COALESCE(y.small, 0), COALESCE(y.overlarge, 0),
+       COALESCE(m.expenses, 0),
+       COALESCE(p.payments, 0),
+       COALESCE(a.earnings, 0),
+       COALESCE(t.packets, 0)
+FROM users u
+LEFT JOIN (SELECT user_id, COUNT(id) AS field_count FROM fields GROUP BY user_id) f ON f.user_id = u.id
+LEFT JOIN (SELECT fields.user_id, SUM(large) AS large, SUM(medium) AS medium, SUM(small) AS small, SUM(overlarge) AS overlarge
+           FROM yields JOIN fields ON fields.id = yields.field_id GROUP BY fields.user_id) y ON y.user_id = u.id
+LEFT JOIN (SELECT user_id, SUM(amount) AS expenses FROM money_records GROUP BY user_id) m ON m.user_id = u.id
+LEFT JOIN (SELECT user_id, SUM(amount) AS payments FROM labour_payments GROUP BY user_id) p ON p.user_id = u.id
+LEFT JOIN (SELECT labour_attendance.user_id,
+                  SUM(CASE labour_attendance.status WHEN 'full' THEN labourers.daily_wage
+                                                    WHEN 'half' THEN labourers.daily_wage * 0.5 ELSE 0 END) AS earnings
+           FROM labour_attendance JOIN labourers ON labourers.id = labour_attendance.labourer_id
+           GROUP BY labour_attendance.user_id) a ON a.user_id = u.id
+LEFT JOIN (SELECT fields.user_id,
+                  COALESCE(SUM(small_packets), 0) + COALESCE(SUM(medium_packets), 0)
+                  + COALESCE(SUM(large_packets), 0) + COALESCE(SUM(overlarge_packets), 0) AS packets
+           FROM transportations JOIN fields ON fields.id = transportations.field_id GROUP BY fields.user_id) t ON t.user_id = u.id
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('user_rollups',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('field_count', sa.Integer(), nullable=False),
+    sa.Column('yield_large', sa.Float(), nullable=False),
+    sa.Column('yield_medium', sa.Float(), nullable=False),
+    sa.Column('yield_small', sa.Float(), nullable=False),
+    sa.Column('yield_overlarge', sa.Float(), nullable=False),
+    sa.Column('expenses', sa.Float(), nullable=False),
+    sa.Column('labour_payments', sa.Float(), nullable=False),
+    sa.Column('attendance_earnings', sa.Float(), nullable=False),
+    sa.Column('transported_packets', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.execute(BACKFILL)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('user_rollups')
@@ -0,0 +1,81 @@
+"""field month stats
+
+The per-field monthly stats cube behind /dashboard/field-stats, kept current
+by the write routes (see app/utils/field_stats.py). The backfill is
+``field_stats.base_cells()`` written out in SQL so this revision doesn't change
+when the models do; ``python -m app.utils.field_stats check`` verifies it.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 11:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL = """
+INSERT INTO field_month_stats (user_id, field_id, year, month, yield_large, yield_medium, yield_small,
+                               yield_overlarge, transported_packets, task_labour_cost)
+SELECT user_id, field_id, year, month, SUM(large), SUM(medium), SUM(small), SUM(overlarge), SUM(packets), SUM(cost)
+FROM (
+    SELECT fields.user_id, fields.id AS field_id, {year:yields.date} AS year, {month:yields.date} AS month,
+           large, medium, small, overlarge, 0 AS packets, 0 AS cost
+    FROM yields JOIN fields ON fields.id = yields.field_id
+    UNION ALL
+    SELECT fields.user_id, fields.id, {year:transport_date}, {month:transport_date}, 0, 0, 0, 0,
+           COALESCE(small_packets, 0) + COALESCE(medium_packets, 0) + COALESCE(large_packets, 0)
+           + COALESCE(overlarge_packets, 0), 0
+    FROM transportations JOIN fields ON fields.id = transportations.field_id
+    UNION ALL
+    SELECT fields.user_id, fields.id, {year:start_date}, {month:start_date}, 0, 0, 0, 0, 0, rate
+    FROM tasks JOIN fields ON fields.id = tasks.field_id
+) cells
+GROUP BY user_id, field_id, year, month
+"""
+
+
+def backfill_sql(dialect_name: str) -> str:
+    if dialect_name == "sqlite":
+        parts = {"year": "CAST(strftime('%Y', {}) AS INTEGER)", "month": "CAST(strftime('%m', {}) AS INTEGER)"}
+    else:
+        parts = {"year": "CAST(EXTRACT(YEAR FROM {}) AS INTEGER)", "month": "CAST(EXTRACT(MONTH FROM {}) AS INTEGER)"}
+    sql = BACKFILL
+    for name, template in parts.items():
+        for column in ("yields.date", "transport_date", "start_date"):
+            sql = sql.replace(f"{{{name}:{column}}}", template.format(column))
+    return sql
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('field_month_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('field_id', sa.Integer(), nullable=False),
+    sa.Column('year', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Integer(), nullable=False),
+    sa.Column('yield_large', sa.Float(), nullable=False),
+    sa.Column('yield_medium', sa.Float(), nullable=False),
+    sa.Column('yield_small', sa.Float(), nullable=False),
+    sa.Column('yield_overlarge', sa.Float(), nullable=False),
+    sa.Column('transported_packets', sa.Integer(), nullable=False),
+    sa.Column('task_labour_cost', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.ForeignKeyConstraint(['field_id'], ['fields.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'field_id', 'year', 'month')
+    )
+    op.execute(backfill_sql(op.get_context().dialect.name))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('field_month_stats')
@@ -0,0 +1,50 @@
+"""field coordinates
+
+Fields get latitude/longitude (entered, or geocoded from ``location`` on first
+use by /weather/fields or the pre-warm job), and forward-geocoding answers are
+kept in ``geocode_results`` so each place name is looked up once. Existing
+fields start without coordinates and are geocoded lazily.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 13:05:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('fields', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('latitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('longitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('geocoded_location', sa.String(), nullable=True))
+
+    op.create_table('geocode_results',
+    sa.Column('query', sa.String(), nullable=False),
+    sa.Column('latitude', sa.Float(), nullable=True),
+    sa.Column('longitude', sa.Float(), nullable=True),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('country', sa.String(), nullable=True),
+    sa.Column('fetched_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.PrimaryKeyConstraint('query')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('geocode_results')
+    with op.batch_alter_table('fields', schema=None) as batch_op:
+        batch_op.drop_column('geocoded_location')
+        batch_op.drop_column('longitude')
+        batch_op.drop_column('latitude')
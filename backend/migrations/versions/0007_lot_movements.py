@@ -0,0 +1,64 @@
+"""lot movements
+
+Packet changes to a lot are journaled in ``lot_movements``, one row each,
+instead of being appended to ``lot_numbers.notes``. Every existing lot gets an
+``opening`` movement with its current counts, so a lot's movements always sum
+to its counts. The history already written to ``notes`` is left there.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 15:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL = """
+INSERT INTO lot_movements (lot_id, user_id, kind, small_packets, medium_packets, large_packets, xlarge_packets,
+                           created_at)
+SELECT id, user_id, 'opening', COALESCE(small_packets, 0), COALESCE(medium_packets, 0),
+       COALESCE(large_packets, 0), COALESCE(xlarge_packets, 0), COALESCE(updated_at, created_at, CURRENT_TIMESTAMP)
+FROM lot_numbers
+WHERE COALESCE(small_packets, 0) <> 0 OR COALESCE(medium_packets, 0) <> 0
+   OR COALESCE(large_packets, 0) <> 0 OR COALESCE(xlarge_packets, 0) <> 0
+ORDER BY id
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('lot_movements',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('lot_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('field_id', sa.Integer(), nullable=True),
+    sa.Column('transportation_id', sa.Integer(), nullable=True),
+    sa.Column('small_packets', sa.Integer(), nullable=False),
+    sa.Column('medium_packets', sa.Integer(), nullable=False),
+    sa.Column('large_packets', sa.Integer(), nullable=False),
+    sa.Column('xlarge_packets', sa.Integer(), nullable=False),
+    sa.Column('note', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.ForeignKeyConstraint(['field_id'], ['fields.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['lot_id'], ['lot_numbers.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_lot_movements_lot_id_id', 'lot_movements', ['lot_id', 'id'], unique=False)
+    op.execute(BACKFILL)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_lot_movements_lot_id_id', table_name='lot_movements')
+    op.drop_table('lot_movements')
@@ -0,0 +1,87 @@
+"""lot fields
+
+Lots are linked to the fields their packets came from in ``lot_fields``,
+keyed by field id, instead of only through the comma-joined
+``lot_numbers.field_name`` label (which stays, for display). Each pair's
+per-grade contribution is the sum of the transportations from the field into
+the lot. Names in the existing labels that match one of the owner's fields are
+linked too, with no contribution, as hand-entered lots have no
+transportations.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CONTRIBUTIONS = """
+INSERT INTO lot_fields (lot_id, field_id, small_packets, medium_packets, large_packets, xlarge_packets)
+SELECT lot_numbers.id, fields.id, SUM(COALESCE(transportations.small_packets, 0)),
+       SUM(COALESCE(transportations.medium_packets, 0)), SUM(COALESCE(transportations.large_packets, 0)),
+       SUM(COALESCE(transportations.overlarge_packets, 0))
+FROM transportations
+JOIN fields ON fields.id = transportations.field_id
+JOIN lot_numbers ON lot_numbers.lot_number = transportations.lot_number AND lot_numbers.user_id = fields.user_id
+GROUP BY lot_numbers.id, fields.id
+"""
+
+BATCH = 1000
+
+
+def link_labelled_fields(conn) -> None:
+    """Link each lot to the owner's fields named in its label, where not linked by a transportation already."""
+    field_ids = {}
+    for field_id, user_id, name in conn.execute(sa.text("SELECT id, user_id, field_name FROM fields")):
+        if name:
+            field_ids.setdefault((user_id, name.strip()), []).append(field_id)
+    linked = set(map(tuple, conn.execute(sa.text("SELECT lot_id, field_id FROM lot_fields"))))
+    insert = sa.text("INSERT INTO lot_fields (lot_id, field_id, small_packets, medium_packets, large_packets, "
+                     "xlarge_packets) VALUES (:lot_id, :field_id, 0, 0, 0, 0)")
+    pending = []
+    lots = conn.execute(sa.text("SELECT id, user_id, field_name FROM lot_numbers")).fetchall()
+    for lot_id, user_id, label in lots:
+        for name in (label or "").split(","):
+            for field_id in field_ids.get((user_id, name.strip()), ()):
+                if (lot_id, field_id) not in linked:
+                    linked.add((lot_id, field_id))
+                    pending.append({"lot_id": lot_id, "field_id": field_id})
+        if len(pending) >= BATCH:
+            conn.execute(insert, pending)
+            pending = []
+    if pending:
+        conn.execute(insert, pending)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('lot_fields',
+    sa.Column('lot_id', sa.Integer(), nullable=False),
+    sa.Column('field_id', sa.Integer(), nullable=False),
+    sa.Column('small_packets', sa.Integer(), nullable=False),
+    sa.Column('medium_packets', sa.Integer(), nullable=False),
+    sa.Column('large_packets', sa.Integer(), nullable=False),
+    sa.Column('xlarge_packets', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['field_id'], ['fields.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['lot_id'], ['lot_numbers.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('lot_id', 'field_id')
+    )
+    op.create_index('ix_lot_fields_field_id', 'lot_fields', ['field_id'], unique=False)
+    op.execute(CONTRIBUTIONS)
+    link_labelled_fields(op.get_bind())
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_lot_fields_field_id', table_name='lot_fields')
+    op.drop_table('lot_fields')
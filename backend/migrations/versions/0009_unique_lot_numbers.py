@@ -0,0 +1,80 @@
+"""unique lot numbers
+
+A user's lot numbers become unique, so a transportation can create or top up
+its lot with one ``INSERT ... ON CONFLICT (user_id, lot_number) DO UPDATE``
+instead of a read followed by a separate insert or ``+=``. Two concurrent
+first transportations into a new lot used to be able to create it twice.
+Such duplicates are merged into the oldest row first: packet counts summed,
+movements and field links moved over, labels and notes joined. A field's
+contribution is not summed: 0008 joined transportations to lots by number, so
+every duplicate was already given the field's full total.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PACKETS = ("small_packets", "medium_packets", "large_packets", "xlarge_packets")
+
+
+def merge_duplicates(conn) -> None:
+    duplicates = conn.execute(sa.text(
+        "SELECT user_id, lot_number FROM lot_numbers GROUP BY user_id, lot_number HAVING COUNT(*) > 1"
+    )).fetchall()
+    for user_id, lot_number in duplicates:
+        lots = conn.execute(sa.text(
+            f"SELECT id, field_name, notes, {', '.join(PACKETS)} FROM lot_numbers "
+            "WHERE user_id = :user_id AND lot_number = :lot_number ORDER BY id"
+        ), {"user_id": user_id, "lot_number": lot_number}).fetchall()
+        keep, others = lots[0].id, [lot.id for lot in lots[1:]]
+        names = list(dict.fromkeys(name.strip() for lot in lots for name in (lot.field_name or "").split(",") if name.strip()))
+        notes = "\n".join(lot.notes for lot in lots if lot.notes) or None
+        totals = {column: sum(getattr(lot, column) or 0 for lot in lots) for column in PACKETS}
+        conn.execute(sa.text(
+            f"UPDATE lot_numbers SET field_name = :field_name, notes = :notes, "
+            f"{', '.join(f'{column} = :{column}' for column in PACKETS)} WHERE id = :id"
+        ), {"id": keep, "field_name": ", ".join(names), "notes": notes, **totals})
+
+        other_ids = sa.bindparam("others", expanding=True)
+        conn.execute(sa.text("UPDATE lot_movements SET lot_id = :keep WHERE lot_id IN :others").bindparams(other_ids),
+                     {"keep": keep, "others": others})
+        links = {}
+        for row in conn.execute(sa.text(
+            f"SELECT field_id, {', '.join(PACKETS)} FROM lot_fields WHERE lot_id = :keep OR lot_id IN :others"
+        ).bindparams(other_ids), {"keep": keep, "others": others}):
+            link = links.setdefault(row.field_id, dict.fromkeys(PACKETS, 0))
+            for column in PACKETS:
+                link[column] = max(link[column], getattr(row, column))
+        conn.execute(sa.text("DELETE FROM lot_fields WHERE lot_id = :keep OR lot_id IN :others").bindparams(other_ids),
+                     {"keep": keep, "others": others})
+        if links:
+            conn.execute(sa.text(
+                f"INSERT INTO lot_fields (lot_id, field_id, {', '.join(PACKETS)}) "
+                f"VALUES (:lot_id, :field_id, {', '.join(f':{column}' for column in PACKETS)})"
+            ), [{"lot_id": keep, "field_id": field_id, **link} for field_id, link in links.items()])
+        conn.execute(sa.text("DELETE FROM lot_numbers WHERE id IN :others").bindparams(other_ids), {"others": others})
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    merge_duplicates(op.get_bind())
+    op.drop_index('ix_lot_numbers_user_id_lot_number', table_name='lot_numbers')
+    op.create_index('uq_lot_numbers_user_id_lot_number', 'lot_numbers', ['user_id', 'lot_number'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_lot_numbers_user_id_lot_number', table_name='lot_numbers')
+    op.create_index('ix_lot_numbers_user_id_lot_number', 'lot_numbers', ['user_id', 'lot_number'], unique=False)
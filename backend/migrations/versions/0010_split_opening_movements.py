@@ -0,0 +1,79 @@
+"""split opening movements
+
+The ``opening`` movement written by 0007 holds a lot's whole count when the
+journal began: packets added by hand and packets transported in alike. Lot
+reconciliation (app/utils/lot_reconciliation.py) recomputes a lot as its
+transportations plus the stock entered by hand, so the transported share is
+moved out into an ``opening_transported`` movement, leaving ``opening`` as the
+hand-entered part. The share is the lot's transportations now less what the
+journal recorded them changing since, i.e. what they summed to at the time.
+A lot's movements still sum to its counts.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0010'
+down_revision: Union[str, None] = '0009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PACKETS = ("small_packets", "medium_packets", "large_packets", "xlarge_packets")
+TRANSPORT_COLUMNS = ("small_packets", "medium_packets", "large_packets", "overlarge_packets")
+
+# A lot merged by 0009 can have several; the first is the one split
+OPENINGS = "SELECT MIN(id) FROM lot_movements WHERE kind = 'opening' GROUP BY lot_id"
+
+SHARES = f"""
+INSERT INTO lot_movements (lot_id, user_id, kind, {', '.join(PACKETS)}, created_at)
+SELECT lot_id, user_id, 'opening_transported', {', '.join(PACKETS)}, created_at FROM (
+    SELECT o.lot_id, o.user_id, o.created_at,
+           {', '.join(f"COALESCE(t.{column}, 0) - COALESCE(j.{column}, 0) AS {column}" for column in PACKETS)}
+    FROM lot_movements o
+    JOIN lot_numbers ON lot_numbers.id = o.lot_id
+    LEFT JOIN (
+        SELECT fields.user_id, transportations.lot_number,
+               {', '.join(f"SUM(COALESCE(transportations.{source}, 0)) AS {column}"
+                          for source, column in zip(TRANSPORT_COLUMNS, PACKETS))}
+        FROM transportations JOIN fields ON fields.id = transportations.field_id
+        GROUP BY fields.user_id, transportations.lot_number
+    ) t ON t.user_id = lot_numbers.user_id AND t.lot_number = lot_numbers.lot_number
+    LEFT JOIN (
+        SELECT lot_id, {', '.join(f"SUM({column}) AS {column}" for column in PACKETS)}
+        FROM lot_movements
+        WHERE kind IN ('transported', 'transport_updated', 'transport_deleted', 'moved_in', 'moved_out')
+        GROUP BY lot_id
+    ) j ON j.lot_id = o.lot_id
+    WHERE o.id IN ({OPENINGS})
+) shares
+WHERE {' OR '.join(f"{column} <> 0" for column in PACKETS)}
+"""
+
+
+def move_shares(sign: str) -> str:
+    """Subtract (``-``) each lot's transported share from its opening movement, or add it back (``+``)."""
+    return f"""
+    UPDATE lot_movements SET {', '.join(
+        f"{column} = {column} {sign} COALESCE((SELECT s.{column} FROM lot_movements s "
+        f"WHERE s.lot_id = lot_movements.lot_id AND s.kind = 'opening_transported'), 0)" for column in PACKETS)}
+    WHERE id IN ({OPENINGS})
+    """
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(SHARES)
+    op.execute(move_shares("-"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(move_shares("+"))
+    op.execute("DELETE FROM lot_movements WHERE kind = 'opening_transported'")
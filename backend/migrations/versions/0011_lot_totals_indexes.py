@@ -0,0 +1,40 @@
+"""lot totals indexes
+
+Lot reconciliation sums transportations per (field, lot number) and movements
+per lot and kind. An index on each grouping that also carries the packet
+columns lets the GROUP BY walk it in order without reading the table or
+sorting; with only ``ix_transportations_field_id_transport_date`` and
+``ix_lot_movements_lot_id_id`` every row was a table lookup (and, for
+transportations, then a sort).
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-17 18:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0011'
+down_revision: Union[str, None] = '0010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_transportations_field_id_lot_number', 'transportations',
+                    ['field_id', 'lot_number', 'small_packets', 'medium_packets', 'large_packets', 'overlarge_packets'],
+                    unique=False)
+    op.create_index('ix_lot_movements_lot_id_kind', 'lot_movements',
+                    ['lot_id', 'kind', 'small_packets', 'medium_packets', 'large_packets', 'xlarge_packets'],
+                    unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_lot_movements_lot_id_kind', table_name='lot_movements')
+    op.drop_index('ix_transportations_field_id_lot_number', table_name='transportations')
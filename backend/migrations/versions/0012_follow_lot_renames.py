@@ -0,0 +1,52 @@
+"""follow lot renames
+
+Renaming a lot used to leave its transportations under the old number, and
+transportations find their lot by number, so lot reconciliation saw the lot's
+transported packets as belonging to a missing lot. The rename now carries
+through to the transportations; this points the ones renamed before that at
+the lot the journal last moved their packets into (the newest
+``transported``/``moved_in``/``transport_updated`` movement). Transportations
+older than the journal (0007) have no movements and are left as they are.
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0012'
+down_revision: Union[str, None] = '0011'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+FOLLOW_RENAMES = """
+UPDATE transportations SET lot_number = current_lots.lot_number
+FROM (
+    SELECT m.transportation_id, lot_numbers.lot_number
+    FROM lot_movements m
+    JOIN (
+        SELECT MAX(id) AS id FROM lot_movements
+        WHERE transportation_id IS NOT NULL AND kind IN ('transported', 'moved_in', 'transport_updated')
+        GROUP BY transportation_id
+    ) latest ON latest.id = m.id
+    JOIN lot_numbers ON lot_numbers.id = m.lot_id
+) current_lots
+WHERE current_lots.transportation_id = transportations.id
+  AND current_lots.lot_number <> transportations.lot_number
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(FOLLOW_RENAMES)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # The old numbers pointed at lots that no longer have them; nothing to restore
+    pass
@@ -0,0 +1,94 @@
+"""Shared fixtures: one migrated SQLite database for the run, the app, and a fresh farmer per test.
+
+Settings are read at import, so the environment is set before anything from
+``app`` is imported. Each test gets its own user (and fields), so tests don't
+see each other's rows and the database is never reset.
+"""
+import itertools
+import os
+import tempfile
+
+_TMP_DIR = tempfile.mkdtemp(prefix="kisansetu-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP_DIR, 'test.db')}"
+os.environ["ADMIN_TOKEN"] = "test-admin-token"
+os.environ["WEATHER_API_KEY"] = ""
+os.environ["LOOP_MONITOR_ENABLED"] = "false"
+os.environ.pop("READ_DATABASE_URL", None)
+os.environ.pop("METRICS_MULTIPROC_DIR", None)
+
+import pytest
+from fastapi.testclient import TestClient
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADMIN_HEADERS = {"X-Admin-Token": "test-admin-token"}
+_usernames = itertools.count()
+
+
+@pytest.fixture(scope="session")
+def client():
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(os.path.join(_BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(_BACKEND_DIR, "migrations"))
+    command.upgrade(config, "head")
+
+    from app.main import app
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def engine(client):
+    from app.db import engine
+    return engine
+
+
+class Farmer:
+    """A user with two fields, and an API client authenticated as them."""
+
+    def __init__(self, client, user_id):
+        from app.utils.security import create_access_token
+
+        self.client = client
+        self.id = user_id
+        self.headers = {"Authorization": f"Bearer {create_access_token({'sub': str(user_id)})}"}
+        self.field_ids = [self.post("/fields/", {"field_name": name, "area": 1.5, "year": 2026})["id"]
+                          for name in ("North", "South")]
+
+    def request(self, method, path, json=None, params=None, status=200):
+        response = self.client.request(method, path, json=json, params=params, headers=self.headers)
+        assert response.status_code == status, response.text
+        return response.json()
+
+    def get(self, path, params=None, status=200):
+        return self.request("GET", path, params=params, status=status)
+
+    def post(self, path, json=None, status=200):
+        return self.request("POST", path, json=json, status=status)
+
+    def put(self, path, json=None, status=200):
+        return self.request("PUT", path, json=json, status=status)
+
+    def delete(self, path, status=200):
+        return self.request("DELETE", path, status=status)
+
+    def transport(self, lot_number, field=0, small=0, medium=0, large=0, overlarge=0, **extra):
+        return self.post("/transportations/", {
+            "field_id": self.field_ids[field], "lot_number": lot_number, "small_packets": small,
+            "medium_packets": medium, "large_packets": large, "overlarge_packets": overlarge, **extra,
+        })
+
+    def lot(self, lot_number):
+        return next(lot for lot in self.get("/lot-numbers/") if lot["lot_number"] == lot_number)
+
+
+@pytest.fixture
+def farmer(client, engine):
+    from app.models import User
+
+    with engine.begin() as conn:
+        user_id = conn.execute(User.__table__.insert().values(
+            username=f"farmer_{next(_usernames)}", password="!"
+        )).inserted_primary_key[0]
+    return Farmer(client, user_id)
@@ -0,0 +1,39 @@
+from app.utils import circuit_breaker
+from app.utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+def half_open_breaker(monkeypatch, name):
+    """A breaker that opened on a failure and whose open period has passed, with a call still in flight."""
+    clock = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", lambda: clock[0])
+    breaker = CircuitBreaker(name, failure_rate=0.5, min_calls=1, window=60,
+                             open_seconds=30, half_open_calls=1)
+    in_flight = breaker.check()
+    breaker.record(breaker.check(), ok=False)
+    assert breaker.state == OPEN
+    clock[0] += 31
+    return breaker, in_flight
+
+
+def test_only_probes_close_a_half_open_breaker(monkeypatch):
+    breaker, in_flight = half_open_breaker(monkeypatch, "test-probe-success")
+    probe = breaker.allow()
+    assert breaker.state == HALF_OPEN and breaker.allow() is None
+
+    # The call let through before the breaker opened succeeds; it is no probe
+    breaker.record(in_flight, ok=True)
+    assert breaker.state == HALF_OPEN
+
+    breaker.record(probe, ok=True)
+    assert breaker.state == CLOSED
+
+
+def test_a_stale_failure_does_not_reopen_a_half_open_breaker(monkeypatch):
+    breaker, in_flight = half_open_breaker(monkeypatch, "test-probe-failure")
+    probe = breaker.allow()
+
+    breaker.record(in_flight, ok=False)
+    assert breaker.state == HALF_OPEN
+
+    breaker.record(probe, ok=False)
+    assert breaker.state == OPEN
@@ -0,0 +1,50 @@
+from contextlib import contextmanager
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+
+from app.utils.jwt import get_current_user
+from app.utils.security import create_access_token
+
+
+@contextmanager
+def bound_parameters():
+    """Collect every parameter value the async routes bind into SQL."""
+    from app.db import async_engine
+
+    values = []
+
+    def collect(conn, cursor, statement, parameters, context, executemany):
+        rows = parameters if executemany else [parameters]
+        for row in rows:
+            values.extend(row.values() if isinstance(row, dict) else row)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", collect)
+    try:
+        yield values
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", collect)
+
+
+def test_current_user_id_is_an_int():
+    assert get_current_user(create_access_token({"sub": "42"})) == {"id": 42}
+
+
+@pytest.mark.parametrize("sub", ["abc", "4.2", ""])
+def test_non_numeric_subject_is_rejected(sub):
+    with pytest.raises(HTTPException) as raised:
+        get_current_user(create_access_token({"sub": sub}))
+    assert raised.value.status_code == 401
+
+
+def test_async_routes_bind_the_user_id_as_an_int(farmer):
+    # SQLite coerces a string id silently; asyncpg rejects it for an Integer column
+    with bound_parameters() as values:
+        farmer.transport("A-1", small=2, medium=3)
+        farmer.get("/transportations/")
+        farmer.get("/lot-numbers/")
+        farmer.get("/labour/groups")
+        farmer.get("/dashboard/")
+    assert farmer.id in values
+    assert str(farmer.id) not in values
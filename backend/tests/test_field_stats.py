@@ -0,0 +1,53 @@
+from tests.conftest import ADMIN_HEADERS
+
+
+def assert_cube_matches_base_tables(farmer):
+    response = farmer.client.get("/admin/field-stats/check", params={"user_id": farmer.id}, headers=ADMIN_HEADERS)
+    assert response.json() == {"consistent": True, "mismatches": []}
+
+
+def cells(farmer, **filters):
+    return {(cell["field_id"], cell["month"]): cell for cell in farmer.get("/dashboard/field-stats", filters)["cells"]}
+
+
+def test_yield_cells_follow_create_update_delete(farmer):
+    north = farmer.field_ids[0]
+    entry = farmer.post(f"/fields/{north}/yields", {"date": "2026-04-10", "large": 6, "medium": 3, "small": 0,
+                                                     "overlarge": 0, "notes": None})
+    april = cells(farmer, year=2026)[(north, 4)]
+    assert (april["yield_large"], april["yield_total"]) == (6, 9)
+    assert april["per_hectare"]["yield"] == 9 / 1.5
+
+    # Moving the yield to May takes it out of April's cell and into May's
+    farmer.put(f"/fields/{north}/yields/{entry['id']}", {"date": "2026-05-02", "large": 2, "medium": 3, "small": 0,
+                                                          "overlarge": 0, "notes": None})
+    by_month = cells(farmer, year=2026)
+    assert by_month.get((north, 4), {"yield_total": 0})["yield_total"] == 0
+    assert by_month[(north, 5)]["yield_total"] == 5
+    assert_cube_matches_base_tables(farmer)
+
+
+def test_transport_cells_follow_field_and_month(farmer):
+    north, south = farmer.field_ids
+    first = farmer.transport("C-1", field=0, small=4, transport_date="2026-06-30")
+    farmer.transport("C-1", field=1, medium=2, transport_date="2026-07-01")
+    farmer.put(f"/transportations/{first['id']}", {"transport_date": "2026-07-15", "small_packets": 5})
+    by_cell = cells(farmer, year=2026)
+    assert by_cell.get((north, 6), {"transported_packets": 0})["transported_packets"] == 0
+    assert by_cell[(north, 7)]["transported_packets"] == 5
+    assert by_cell[(south, 7)]["transported_packets"] == 2
+
+    rollup = farmer.get("/dashboard/field-stats/rollup", {"group_by": "month", "year": 2026})["rows"]
+    assert {row["month"]: row["transported_packets"] for row in rollup}[7] == 7
+    total = farmer.get("/dashboard/field-stats/rollup")["rows"]
+    assert total[0]["transported_packets"] == 7
+
+    farmer.delete(f"/transportations/{first['id']}")
+    assert cells(farmer, year=2026, month=7)[(south, 7)]["transported_packets"] == 2
+    assert_cube_matches_base_tables(farmer)
+
+
+def test_slices_only_show_the_users_fields(farmer, client):
+    farmer.transport("C-2", small=1, transport_date="2026-08-01")
+    other_field = farmer.field_ids[0] + 10000
+    assert farmer.get("/dashboard/field-stats", {"field_id": other_field})["cells"] == []
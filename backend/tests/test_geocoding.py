@@ -0,0 +1,34 @@
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.models.geocode import GeocodeResult
+from app.utils.geocoding import parse_direct, record
+
+
+def test_record_upserts_answers_without_reading_them_first(engine):
+    with Session(engine) as session, session.begin():
+        # Stored meanwhile by another worker's request
+        session.add(GeocodeResult(query="agra test", latitude=None, longitude=None))
+
+    statements = []
+
+    def collect(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", collect)
+    try:
+        with Session(engine) as session, session.begin():
+            record(session, {
+                "agra test": parse_direct([{"lat": 27.18, "lon": 78.01, "name": "Agra", "country": "IN"}]),
+                "nowhere test": parse_direct([]),
+            }, {})
+    finally:
+        event.remove(engine, "before_cursor_execute", collect)
+    assert not any(statement.lstrip().upper().startswith("SELECT") for statement in statements)
+
+    with Session(engine) as session:
+        rows = {row.query: row for row in session.execute(select(GeocodeResult).where(
+            GeocodeResult.query.in_(["agra test", "nowhere test"])
+        )).scalars()}
+    assert (rows["agra test"].latitude, rows["agra test"].name) == (27.18, "Agra")
+    assert rows["nowhere test"].latitude is None
@@ -0,0 +1,25 @@
+def test_transports_link_fields_and_label_each_name_once(farmer):
+    farmer.transport("L-1", field=0, small=1)
+    farmer.transport("L-1", field=1, medium=2)
+    farmer.transport("L-1", field=0, large=3)
+    lot = farmer.lot("L-1")
+    assert lot["field_name"] == "North, South"
+    links = {link["field_id"]: link for link in farmer.get(f"/lot-numbers/{lot['id']}/fields")}
+    assert set(links) == set(farmer.field_ids)
+    assert (links[farmer.field_ids[0]]["small_packets"], links[farmer.field_ids[0]]["large_packets"]) == (1, 3)
+    assert links[farmer.field_ids[1]]["medium_packets"] == 2
+
+
+def test_label_naming_a_field_before_it_exists_is_not_repeated(farmer):
+    farmer.post("/lot-numbers/", {"lot_number": "L-2", "field_name": "North, East", "small_packets": 4})
+    east = farmer.post("/fields/", {"field_name": "East", "area": 1.0, "year": 2026})["id"]
+    farmer.post("/transportations/", {"field_id": east, "lot_number": "L-2", "small_packets": 1})
+    assert farmer.lot("L-2")["field_name"] == "North, East"
+
+
+def test_lots_by_field_uses_the_links(farmer):
+    farmer.transport("L-3", field=0, small=1)
+    farmer.transport("L-3", field=1, small=1)
+    farmer.transport("L-4", field=1, small=1)
+    south = {lot["lot_number"] for lot in farmer.get("/lot-numbers/field/South")}
+    assert south == {"L-3", "L-4"}
@@ -0,0 +1,62 @@
+def movements(farmer, lot_id, **params):
+    return farmer.get(f"/lot-numbers/{lot_id}/movements", params)
+
+
+def deltas(movement):
+    return (movement["small_packets"], movement["medium_packets"], movement["large_packets"],
+            movement["xlarge_packets"])
+
+
+def test_each_change_journals_one_movement(farmer):
+    hand = farmer.post("/lot-numbers/", {"lot_number": "J-1", "field_name": "North", "small_packets": 2})
+    farmer.post(f"/lot-numbers/{hand['id']}/add-packets", {"small_packets": 0, "medium_packets": 3,
+                                                           "large_packets": 0, "xlarge_packets": 0, "notes": "extra"})
+    farmer.put(f"/lot-numbers/{hand['id']}", {**farmer.lot("J-1"), "small_packets": 1, "medium_packets": 3})
+    sent = farmer.transport("J-1", field=1, large=4, overlarge=1, notes="truck 7")
+    farmer.put(f"/transportations/{sent['id']}", {"large_packets": 6})
+    farmer.put(f"/transportations/{sent['id']}", {"lot_number": "J-2"})
+    moved_back = farmer.transport("J-2", field=0, small=1)
+    farmer.delete(f"/transportations/{moved_back['id']}")
+
+    journal = list(reversed(movements(farmer, hand["id"])["items"]))  # newest first on the wire
+    assert [(m["kind"], deltas(m)) for m in journal] == [
+        ("created", (2, 0, 0, 0)),
+        ("added", (0, 3, 0, 0)),
+        ("adjusted", (-1, 0, 0, 0)),
+        ("transported", (0, 0, 4, 1)),
+        ("transport_updated", (0, 0, 2, 0)),
+        ("moved_out", (0, 0, -6, -1)),
+    ]
+    transported = journal[3]
+    assert (transported["transportation_id"], transported["field_id"]) == (sent["id"], farmer.field_ids[1])
+    assert transported["field_name"] == "South"
+    assert transported["note"] == "truck 7"
+
+    other = farmer.lot("J-2")
+    assert [(m["kind"], deltas(m)) for m in reversed(movements(farmer, other["id"])["items"])] == [
+        ("moved_in", (0, 0, 6, 1)),
+        ("transported", (1, 0, 0, 0)),
+        ("transport_deleted", (-1, 0, 0, 0)),
+    ]
+    # Summed, a lot's movements are its counts
+    lot = farmer.lot("J-1")
+    assert tuple(map(sum, zip(*(deltas(m) for m in journal)))) == (
+        lot["small_packets"], lot["medium_packets"], lot["large_packets"], lot["xlarge_packets"])
+
+
+def test_movements_page_newest_first(farmer):
+    for n in range(5):
+        farmer.transport("J-3", small=n + 1)
+    lot_id = farmer.lot("J-3")["id"]
+    first = movements(farmer, lot_id, limit=2)
+    assert [m["small_packets"] for m in first["items"]] == [5, 4]
+    second = movements(farmer, lot_id, limit=2, before=first["next_before"])
+    assert [m["small_packets"] for m in second["items"]] == [3, 2]
+    last = movements(farmer, lot_id, limit=2, before=second["next_before"])
+    assert [m["small_packets"] for m in last["items"]] == [1]
+    assert last["next_before"] is None
+
+
+def test_lot_listing_leaves_out_notes(farmer):
+    farmer.transport("J-4", small=1)
+    assert "notes" not in farmer.lot("J-4")
@@ -0,0 +1,53 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import event
+
+
+def test_sqlite_writes_take_the_lock_before_reading(farmer):
+    from app.db import async_engine, write_queue
+
+    engine = write_queue.engine if write_queue is not None else async_engine.sync_engine
+    statements = []
+
+    def collect(conn, cursor, statement, parameters, context, executemany):
+        statements.append(" ".join(statement.split()[:2]).upper())
+
+    event.listen(engine, "before_cursor_execute", collect)
+    try:
+        farmer.transport("P-1", small=1)
+    finally:
+        event.remove(engine, "before_cursor_execute", collect)
+    # The field ownership check runs after the lock is taken, inside the write transaction
+    assert statements[0] == "BEGIN IMMEDIATE"
+    assert any(statement.startswith("SELECT") for statement in statements[1:])
+
+
+def test_concurrent_transports_into_one_lot_are_all_counted(farmer):
+    farmer.transport("P-2", small=1)  # the lot exists; the rest all update it
+
+    def post(n):
+        return farmer.client.post("/transportations/", headers=farmer.headers, json={
+            "field_id": farmer.field_ids[n % 2], "lot_number": "P-2", "small_packets": 1, "medium_packets": 2,
+        }).status_code
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        statuses = list(pool.map(post, range(40)))
+    assert statuses == [200] * 40
+    lot = farmer.lot("P-2")
+    assert (lot["small_packets"], lot["medium_packets"]) == (41, 80)
+    movements = farmer.get(f"/lot-numbers/{lot['id']}/movements", params={"limit": 100})["items"]
+    assert sum(m["small_packets"] for m in movements) == 41
+    links = farmer.get(f"/lot-numbers/{lot['id']}/fields")
+    assert sum(link["medium_packets"] for link in links) == 80
+
+
+def test_moving_a_transport_moves_its_packets_between_lots(farmer):
+    moved = farmer.transport("P-3", small=5, large=2)
+    farmer.transport("P-3", small=1)
+    farmer.put(f"/transportations/{moved['id']}", {"lot_number": "P-4", "small_packets": 4})
+    old, new = farmer.lot("P-3"), farmer.lot("P-4")
+    assert (old["small_packets"], old["large_packets"]) == (1, 0)
+    assert (new["small_packets"], new["large_packets"]) == (4, 2)
+    farmer.delete(f"/transportations/{moved['id']}")
+    new = farmer.lot("P-4")
+    assert (new["small_packets"], new["large_packets"]) == (0, 0)
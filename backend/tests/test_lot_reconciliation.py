@@ -0,0 +1,99 @@
+from sqlalchemy import text
+
+from tests.conftest import ADMIN_HEADERS
+
+
+def check(farmer):
+    response = farmer.client.get("/admin/lots/check", params={"user_id": farmer.id}, headers=ADMIN_HEADERS)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def repair(farmer):
+    response = farmer.client.post("/admin/lots/repair", params={"user_id": farmer.id}, headers=ADMIN_HEADERS)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def stock(farmer):
+    farmer.transport("R-1", field=0, small=3, medium=2)
+    moved = farmer.transport("R-1", field=1, large=4)
+    farmer.transport("R-2", field=1, overlarge=1)
+    farmer.put(f"/transportations/{moved['id']}", {"lot_number": "R-2"})
+    lot = farmer.lot("R-1")
+    farmer.post(f"/lot-numbers/{lot['id']}/add-packets", {"small_packets": 5})
+    return lot
+
+
+def test_api_writes_leave_lots_consistent(farmer):
+    lot = stock(farmer)
+    farmer.post("/lot-numbers/", {"lot_number": "R-3", "field_name": "North", "medium_packets": 7})
+    farmer.put(f"/lot-numbers/{lot['id']}", {**farmer.lot("R-1"), "field_name": "North", "medium_packets": 9})
+    assert check(farmer) == {"consistent": True, "count": 0, "differences": []}
+    assert repair(farmer) == {"lots_created": 0, "lots_corrected": 0, "movements": 0, "field_links": 0}
+
+
+def test_renamed_lot_stays_consistent(farmer):
+    lot = stock(farmer)
+    farmer.put(f"/lot-numbers/{lot['id']}", {**farmer.lot("R-1"), "lot_number": "R-1B"})
+    assert check(farmer)["consistent"]
+    assert repair(farmer) == {"lots_created": 0, "lots_corrected": 0, "movements": 0, "field_links": 0}
+    renamed = farmer.lot("R-1B")
+    assert (renamed["small_packets"], renamed["medium_packets"]) == (8, 2)
+    assert {row["lot_number"] for row in farmer.get("/transportations/")} == {"R-1B", "R-2"}
+    assert "R-1" not in {lot["lot_number"] for lot in farmer.get("/lot-numbers/")}
+
+
+def test_rename_onto_a_number_in_use_is_rejected(farmer, engine):
+    lot = stock(farmer)
+    body = farmer.lot("R-1")
+    farmer.put(f"/lot-numbers/{lot['id']}", {**body, "lot_number": "R-2"}, status=400)
+    # A transportation left behind by a deleted lot still holds its number
+    farmer.transport("R-9", small=1)
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM lot_numbers WHERE user_id = :user AND lot_number = 'R-9'"), {"user": farmer.id})
+    farmer.put(f"/lot-numbers/{lot['id']}", {**body, "lot_number": "R-9"}, status=400)
+    assert farmer.lot("R-1")["small_packets"] == 8
+
+
+def test_repair_fixes_drifted_and_missing_lots(farmer, engine):
+    stock(farmer)
+    with engine.begin() as conn:
+        params = {"user": farmer.id}
+        conn.execute(text("UPDATE lot_numbers SET small_packets = small_packets + 2 "
+                          "WHERE user_id = :user AND lot_number = 'R-1'"), params)
+        conn.execute(text("UPDATE lot_fields SET large_packets = 0 WHERE lot_id = "
+                          "(SELECT id FROM lot_numbers WHERE user_id = :user AND lot_number = 'R-2')"), params)
+        conn.execute(text("DELETE FROM lot_movements WHERE lot_id = "
+                          "(SELECT id FROM lot_numbers WHERE user_id = :user AND lot_number = 'R-2')"), params)
+        conn.execute(text("DELETE FROM lot_fields WHERE lot_id = "
+                          "(SELECT id FROM lot_numbers WHERE user_id = :user AND lot_number = 'R-2')"), params)
+        conn.execute(text("DELETE FROM lot_numbers WHERE user_id = :user AND lot_number = 'R-2'"), params)
+
+    found = check(farmer)
+    assert not found["consistent"]
+    differences = {(d["table"], d["lot_number"], d["column"]): d for d in found["differences"]}
+    assert differences[("lot_numbers", "R-1", "small_packets")]["expected"] == 8
+    assert differences[("lot_numbers", "R-2", "large_packets")]["lot_id"] is None  # missing
+
+    repaired = repair(farmer)
+    assert repaired["lots_created"] == 1
+    assert repaired["lots_corrected"] >= 2
+    assert check(farmer)["consistent"]
+    assert repair(farmer) == {"lots_created": 0, "lots_corrected": 0, "movements": 0, "field_links": 0}
+
+    drifted, recreated = farmer.lot("R-1"), farmer.lot("R-2")
+    assert drifted["small_packets"] == 8
+    assert (recreated["large_packets"], recreated["xlarge_packets"]) == (4, 1)
+    movements = farmer.get(f"/lot-numbers/{drifted['id']}/movements")["items"]
+    assert "reconciled" in {movement["kind"] for movement in movements}
+    assert sum(movement["small_packets"] for movement in movements) == 8
+
+
+def test_check_only_reports_the_given_user(farmer, engine):
+    stock(farmer)
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE lot_numbers SET small_packets = 99 WHERE user_id = :user"), {"user": farmer.id})
+    other = farmer.client.get("/admin/lots/check", params={"user_id": farmer.id + 1000}, headers=ADMIN_HEADERS)
+    assert other.json()["consistent"]
+    assert check(farmer)["count"] == 2
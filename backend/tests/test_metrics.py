@@ -0,0 +1,48 @@
+import json
+import os
+import subprocess
+import sys
+
+from app.utils.metrics import Registry
+
+
+def write_worker(directory, pid, requests):
+    path = os.path.join(directory, f"metrics_{pid}_1.json")
+    with open(path, "w") as f:
+        json.dump({"pid": pid, "metrics": {"requests_total": {"": requests}}}, f)
+    return path
+
+
+def test_scrape_merges_live_workers_and_deletes_dead_ones(tmp_path):
+    registry = Registry()
+    registry.counter("requests_total", "Requests").inc(1)
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    live = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        dead_file = write_worker(tmp_path, dead.pid, 100)
+        live_file = write_worker(tmp_path, live.pid, 10)
+        for _ in range(2):  # stale counters never come back on later scrapes
+            assert registry.collect(str(tmp_path))["requests_total"] == {"": 11}
+        assert not os.path.exists(dead_file)
+        assert os.path.exists(live_file)
+    finally:
+        live.kill()
+        live.wait()
+
+
+def test_file_left_under_a_reused_pid_is_pruned(tmp_path):
+    registry = Registry()
+    stale = write_worker(tmp_path, os.getpid(), 5)  # same pid, another start time
+    assert registry.prune(str(tmp_path)) == []
+    assert not os.path.exists(stale)
+
+
+def test_worker_removes_its_file_at_shutdown(tmp_path):
+    registry = Registry()
+    registry.counter("requests_total", "Requests").inc(3)
+    registry.flush(str(tmp_path))
+    assert len(os.listdir(tmp_path)) == 1
+    registry.remove(str(tmp_path))
+    registry.remove(str(tmp_path))
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+
+from sqlalchemy import create_engine, text
+
+from app.utils.lot_reconciliation import check_lots
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def migrate(url, revision):
+    subprocess.run([sys.executable, "-m", "alembic", "upgrade", revision], cwd=BACKEND_DIR, check=True,
+                   env={**os.environ, "DATABASE_URL": url}, capture_output=True)
+
+
+def test_duplicate_lots_merge_consistently(tmp_path):
+    url = f"sqlite:///{tmp_path / 'duplicates.db'}"
+    migrate(url, "0006")
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, username, password) VALUES (1, 'dup', 'x')"))
+        conn.execute(text("INSERT INTO fields (id, field_name, area, year, user_id) VALUES "
+                          "(1, 'North', 1.5, 2026, 1), (2, 'South', 1.5, 2026, 1), (3, 'East', 1.5, 2026, 1)"))
+        conn.execute(text(
+            "INSERT INTO transportations (field_id, lot_number, transport_date, small_packets, medium_packets, "
+            "large_packets, overlarge_packets) VALUES "
+            "(1, 'D-1', '2026-03-01', 3, 0, 0, 0), (2, 'D-1', '2026-03-01', 0, 4, 0, 0), "
+            "(1, 'D-1', '2026-03-02', 0, 0, 2, 0)"
+        ))
+        # Two racing first transportations each created the lot; later ones topped up the older row
+        conn.execute(text(
+            "INSERT INTO lot_numbers (id, lot_number, field_name, small_packets, medium_packets, large_packets, "
+            "xlarge_packets, storage_date, user_id) VALUES "
+            "(1, 'D-1', 'North', 3, 0, 2, 0, '2026-03-01', 1), (2, 'D-1', 'South, East', 0, 4, 0, 0, '2026-03-01', 1)"
+        ))
+    migrate(url, "head")
+
+    with engine.connect() as conn:
+        assert check_lots(conn) == (0, [])
+        links = conn.execute(text(
+            "SELECT lot_id, field_id, small_packets, medium_packets, large_packets, xlarge_packets "
+            "FROM lot_fields ORDER BY field_id"
+        )).fetchall()
+    assert [tuple(link) for link in links] == [(1, 1, 3, 0, 2, 0), (1, 2, 0, 4, 0, 0), (1, 3, 0, 0, 0, 0)]
+    engine.dispose()
@@ -0,0 +1,92 @@
+from tests.conftest import ADMIN_HEADERS
+
+
+def assert_rollups_match_base_tables(farmer):
+    response = farmer.client.get("/admin/rollups/check", params={"user_id": farmer.id}, headers=ADMIN_HEADERS)
+    assert response.json() == {"consistent": True, "mismatches": []}
+
+
+def dashboard(farmer):
+    return farmer.get("/dashboard/")
+
+
+def test_new_user_starts_from_zero(client, farmer):
+    totals = dashboard(farmer)
+    assert totals["total_fields"] == 2
+    assert (totals["total_yield"], totals["total_transported"], totals["total_expenses"]) == (0, 0, 0)
+
+
+def test_money_records_on_create_update_delete(farmer):
+    record = farmer.post("/money-records/", {"paid_to": "Seeds", "amount": 150.0, "payment_date": "2026-03-01",
+                                             "payment_method": "cash", "notes": None})
+    assert dashboard(farmer)["total_expenses"] == 150.0
+    farmer.put(f"/money-records/{record['id']}", {"paid_to": "Seeds", "amount": 90.5, "payment_date": "2026-03-01",
+                                                  "payment_method": "cash", "notes": None})
+    assert dashboard(farmer)["total_expenses"] == 90.5
+    assert_rollups_match_base_tables(farmer)
+    farmer.delete(f"/money-records/{record['id']}")
+    assert dashboard(farmer)["total_expenses"] == 0
+    assert_rollups_match_base_tables(farmer)
+
+
+def test_yields_and_fields(farmer):
+    field_id = farmer.field_ids[0]
+    entry = farmer.post(f"/fields/{field_id}/yields", {"date": "2026-04-01", "large": 10, "medium": 5, "small": 2,
+                                                        "overlarge": 1, "notes": None})
+    totals = dashboard(farmer)
+    assert totals["total_yield"] == 18
+    assert totals["potato_types"] == {"large": 10, "medium": 5, "small": 2, "overlarge": 1}
+    farmer.put(f"/fields/{field_id}/yields/{entry['id']}", {"date": "2026-04-01", "large": 4, "medium": 5, "small": 2,
+                                                             "overlarge": 1, "notes": None})
+    assert dashboard(farmer)["potato_types"]["large"] == 4
+    assert_rollups_match_base_tables(farmer)
+    # Deleting the field takes its yields out of the totals with it
+    farmer.delete(f"/fields/{field_id}")
+    totals = dashboard(farmer)
+    assert (totals["total_fields"], totals["total_yield"]) == (1, 0)
+    assert_rollups_match_base_tables(farmer)
+
+
+def test_field_with_transportations_cannot_be_deleted(farmer):
+    sent = farmer.transport("D-2", field=1, small=3)
+    farmer.delete(f"/fields/{farmer.field_ids[1]}", status=400)
+    assert dashboard(farmer)["total_transported"] == 3
+    farmer.delete(f"/transportations/{sent['id']}")
+    farmer.delete(f"/fields/{farmer.field_ids[1]}")
+    assert dashboard(farmer)["total_fields"] == 1
+    assert_rollups_match_base_tables(farmer)
+
+
+def test_transportations_on_create_update_delete(farmer):
+    first = farmer.transport("D-1", small=2, medium=3)
+    farmer.transport("D-1", field=1, overlarge=4)
+    assert dashboard(farmer)["total_transported"] == 9
+    farmer.put(f"/transportations/{first['id']}", {"small_packets": 10})
+    assert dashboard(farmer)["total_transported"] == 17
+    farmer.delete(f"/transportations/{first['id']}")
+    assert dashboard(farmer)["total_transported"] == 4
+    assert_rollups_match_base_tables(farmer)
+
+
+def test_labour_payments_and_attendance(farmer):
+    group = farmer.post("/labour/groups", {"group_name": "Crew"})
+    labourer = farmer.post("/labour/labourers", {"name": "Ravi", "village": "Agra", "daily_wage": 400.0,
+                                                 "group_id": group["id"]})
+    payment = farmer.post("/labour/payments", {"labourer_id": labourer["id"], "amount": 800.0,
+                                               "payment_date": "2026-05-02", "working_days": 2})
+    farmer.post("/labour/attendance", {"labourer_id": labourer["id"], "attendance_date": "2026-05-01",
+                                       "status": "full"})
+    farmer.post("/labour/attendance", {"labourer_id": labourer["id"], "attendance_date": "2026-05-02",
+                                       "status": "half"})
+    totals = dashboard(farmer)
+    assert totals["total_labour_cost"] == 800.0
+    assert totals["total_earnings"] == 600.0
+    # A wage change re-prices the days already worked
+    farmer.put(f"/labour/labourers/{labourer['id']}", {"daily_wage": 500.0})
+    assert dashboard(farmer)["total_earnings"] == 750.0
+    farmer.delete(f"/labour/payments/{payment['id']}")
+    assert dashboard(farmer)["total_labour_cost"] == 0
+    assert_rollups_match_base_tables(farmer)
+    farmer.delete(f"/labour/labourers/{labourer['id']}")
+    assert dashboard(farmer)["total_earnings"] == 0
+    assert_rollups_match_base_tables(farmer)
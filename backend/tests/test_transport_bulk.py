@@ -0,0 +1,68 @@
+from tests.conftest import ADMIN_HEADERS
+
+
+def row(field_id, lot_number, **packets):
+    return {"field_id": field_id, "lot_number": lot_number, **packets}
+
+
+def test_partial_failure_reports_each_row_in_order(farmer):
+    north, south = farmer.field_ids
+    manifest = [
+        row(north, "B-1", small_packets=2, notes="first"),
+        row(north, "B-1", medium_packets=0),                   # no packets
+        row(south, "B-2", large_packets=3, transport_date="2026-02-03"),
+        row(north + 100000, "B-1", small_packets=1),             # not the farmer's field
+        row(north, "B-1", small_packets=2, notes="first"),     # same values as the first row
+        row(north, "B-2", overlarge_packets=1),
+    ]
+    response = farmer.post("/transportations/bulk", {"transportations": manifest})
+    assert (response["created"], response["failed"]) == (4, 2)
+    results = response["results"]
+    assert [result["index"] for result in results] == list(range(6))
+    assert [result["error"] is None for result in results] == [True, False, True, False, True, True]
+    assert results[1]["error"].startswith("At least one packet type")
+    assert results[3]["error"] == "Field not found"
+
+    # Every created id is the row at its index
+    for index in (0, 2, 4, 5):
+        created = farmer.get(f"/transportations/{results[index]['id']}")
+        sent = manifest[index]
+        assert (created["field_id"], created["lot_number"]) == (sent["field_id"], sent["lot_number"])
+        for column in ("small_packets", "medium_packets", "large_packets", "overlarge_packets"):
+            assert created[column] == sent.get(column, 0)
+    assert farmer.get(f"/transportations/{results[2]['id']}")["transport_date"] == "2026-02-03"
+    assert len({results[index]["id"] for index in (0, 2, 4, 5)}) == 4
+
+
+def test_bulk_rows_count_like_single_posts(farmer):
+    north, south = farmer.field_ids
+    farmer.transport("B-3", small=1)
+    farmer.post("/transportations/bulk", {"transportations": [
+        row(north, "B-3", small_packets=2), row(south, "B-3", medium_packets=5),
+        row(south, "B-4", large_packets=7),
+    ]})
+    lot = farmer.lot("B-3")
+    assert (lot["small_packets"], lot["medium_packets"]) == (3, 5)
+    assert lot["field_name"] == "North, South"
+    assert farmer.lot("B-4")["large_packets"] == 7
+    assert farmer.get("/dashboard/")["total_transported"] == 15
+    journal = farmer.get(f"/lot-numbers/{lot['id']}/movements")["items"]
+    assert [m["kind"] for m in journal] == ["transported"] * 3
+    for path in ("/admin/lots/check", "/admin/rollups/check", "/admin/field-stats/check"):
+        assert farmer.client.get(path, params={"user_id": farmer.id}, headers=ADMIN_HEADERS).json()["consistent"]
+
+
+def test_manifest_with_no_valid_rows_creates_nothing(farmer):
+    north = farmer.field_ids[0]
+    response = farmer.post("/transportations/bulk", {"transportations": [row(north, "B-5", small_packets=0)]})
+    assert (response["created"], response["failed"]) == (0, 1)
+    assert "B-5" not in {lot["lot_number"] for lot in farmer.get("/lot-numbers/")}
+
+
+def test_oversized_manifest_is_rejected(farmer):
+    from app.routes.transportation import BULK_MAX_ROWS
+
+    north = farmer.field_ids[0]
+    manifest = [row(north, "B-6", small_packets=1)] * (BULK_MAX_ROWS + 1)
+    farmer.post("/transportations/bulk", {"transportations": manifest}, status=400)
+    assert farmer.get("/transportations/") == []
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, event, select
+
+from app.db import SQLiteWriteQueue, _begin_immediate
+
+metadata = MetaData()
+rows = Table("rows", metadata, Column("id", Integer, primary_key=True), Column("value", Integer, nullable=False))
+
+
+@pytest.fixture
+def writer_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'queue.db'}",
+                           connect_args={"check_same_thread": False, "isolation_level": None})
+    event.listen(engine, "begin", _begin_immediate)
+    metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def insert(value):
+    def job(session):
+        if value < 0:
+            raise ValueError(f"bad value {value}")
+        session.execute(rows.insert().values(value=value))
+        return value * 10
+    return job
+
+
+def test_failing_job_rolls_back_alone(writer_engine):
+    commits = []
+    event.listen(writer_engine, "commit", lambda conn: commits.append(1))
+    write_queue = SQLiteWriteQueue(writer_engine, max_batch=64, linger=0.05)
+
+    async def submit_all():
+        return await asyncio.gather(*(write_queue.submit(insert(value)) for value in (1, 2, -3, 4)),
+                                    return_exceptions=True)
+
+    try:
+        results = asyncio.run(submit_all())
+    finally:
+        write_queue.stop()
+    assert results[:2] == [10, 20] and results[3] == 40
+    assert isinstance(results[2], ValueError)
+    with writer_engine.connect() as conn:
+        assert sorted(conn.execute(select(rows.c.value)).scalars()) == [1, 2, 4]
+    assert len(commits) == 1  # the four jobs were committed together
+
+
+def test_batches_are_capped(writer_engine):
+    commits = []
+    event.listen(writer_engine, "commit", lambda conn: commits.append(1))
+    write_queue = SQLiteWriteQueue(writer_engine, max_batch=3, linger=0.05)
+
+    async def submit_all():
+        return await asyncio.gather(*(write_queue.submit(insert(value)) for value in range(7)))
+
+    try:
+        assert asyncio.run(submit_all()) == [value * 10 for value in range(7)]
+    finally:
+        write_queue.stop()
+    assert len(commits) == 3
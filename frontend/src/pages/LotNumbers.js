@@ -116,6 +116,17 @@ const LotNumbers = () => {
         }
     };
 
+    // Listings leave out notes, so fetch the whole lot before editing it
+    const startEditing = async (lot) => {
+        try {
+            const response = await api.get(`/lot-numbers/${lot.id}`);
+            setEditingLot(response.data);
+        } catch (error) {
+            console.error('Error fetching lot number:', error);
+            setError(t('error'));
+        }
+    };
+
     const handleEdit = async (e) => {
         e.preventDefault();
         setLoading(true);
@@ -257,15 +268,14 @@ const LotNumbers = () => {
                 lot.large_packets || 0,
                 lot.xlarge_packets || 0,
                 (lot.small_packets || 0) + (lot.medium_packets || 0) + (lot.large_packets || 0) + (lot.xlarge_packets || 0),
-                formatDate(lot.storage_date),
-                lot.notes || '-'
+                formatDate(lot.storage_date)
             ]);
 
             autoTable(doc, {
                 startY: 160,
                 head: [[
                     'Lot Number', 'Field Name', 'Small', 'Medium', 'Large',
-                    'X-Large', 'Total', 'Storage Date', 'Notes'
+                    'X-Large', 'Total', 'Storage Date'
                 ]],
                 body: tableData
             });
@@ -684,13 +694,10 @@ const LotNumbers = () => {
                                                 <p className="text-sm text-earth-500">{t('storedOn')}: {formatDate(lot.storage_date)}</p>
                                             </div>
                                         </div>
-                                        {lot.notes && (
-                                            <p className="mt-2 text-sm text-gray-600 break-words">{t('notes')}: {lot.notes}</p>
-                                        )}
                                     </div>
                                     <div className="flex gap-2 self-end sm:self-center ml-0 sm:ml-4">
                                         <button
-                                            onClick={() => setEditingLot(lot)}
+                                            onClick={() => startEditing(lot)}
                                             className="btn btn-secondary btn-sm"
                                         >
                                             {t('edit')}
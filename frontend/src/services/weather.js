@@ -40,11 +40,12 @@ export const fetchWeatherData = async (location = null) => {
 
         const currentWeather = currentWeatherResponse.data;
 
-        // 3. Fetch forecast using backend proxy
+        // 3. Fetch forecast using backend proxy (daily summaries, not the 3-hourly entries)
         const forecastResponse = await api.get('/weather/forecast', {
             params: {
                 lat: coords.latitude,
-                lon: coords.longitude
+                lon: coords.longitude,
+                compact: true
             }
         });
 
@@ -95,43 +96,18 @@ const processWeatherData = (currentWeather, forecastData, locationName) => {
         return 'Partly Cloudy';
     };
 
-    const dailyForecasts = {};
-    const baseDate = new Date();
-
-    forecastData.list.forEach(item => {
-        const date = new Date(item.dt * 1000).toISOString().split('T')[0];
-
-        if (!dailyForecasts[date]) {
-            dailyForecasts[date] = { temps: [], humidity: [], wind: [], cond: [] };
-        }
-
-        dailyForecasts[date].temps.push(item.main.temp);
-        dailyForecasts[date].humidity.push(item.main.humidity);
-        dailyForecasts[date].wind.push(item.wind.speed * 3.6);
-        dailyForecasts[date].cond.push(mapCondition(item.weather[0].main, item.weather[0].description));
-    });
-
-    const forecast = [];
-
-    for (let i = 0; i < 7; i++) {
-        const d = new Date(baseDate);
-        d.setDate(d.getDate() + i);
-        const key = d.toISOString().split('T')[0];
-
-        const day = dailyForecasts[key];
-        if (!day) continue;
-
-        forecast.push({
-            date: key,
-            day: d.toLocaleDateString('en-US', { weekday: 'long' }),
-            temp_max: Math.round(Math.max(...day.temps)),
-            temp_min: Math.round(Math.min(...day.temps)),
-            humidity: Math.round(day.humidity.reduce((a, b) => a + b, 0) / day.humidity.length),
-            wind_speed: Math.round(day.wind.reduce((a, b) => a + b, 0) / day.wind.length),
-            condition: day.cond[0],
-            description: day.cond[0]
-        });
-    }
+    // The backend already reduced the forecast to one summary per day
+    const forecast = forecastData.days.slice(0, 7).map(day => ({
+        date: day.date,
+        day: day.day,
+        temp_max: day.temp_max,
+        temp_min: day.temp_min,
+        humidity: day.humidity,
+        wind_speed: day.wind_speed,
+        rain_probability: day.rain_probability,
+        condition: day.condition,
+        description: day.condition
+    }));
 
     return {
         current: {